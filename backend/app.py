@@ -1,12 +1,51 @@
-from flask import Flask, request, jsonify
+from flask import (
+    Blueprint, Flask, current_app, g, has_app_context, request, jsonify, make_response,
+    stream_with_context
+)
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
 from flask_cors import CORS
-from datetime import datetime
+import click
+from sqlalchemy import Select, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+from datetime import MAXYEAR, MINYEAR, date, datetime, timedelta, timezone
+from functools import wraps
+import asyncio
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
 import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from gardens import GardenRegistry, garden_database_exists, garden_database_uri, is_valid_garden_id
+from forecast import weekly_forecast
+from metrics import COUNT_BUCKETS, SIZE_BUCKETS, MetricsRegistry
+from serialization import COMPRESSIBLE_MIMETYPES, FastJSONProvider, compress, json_line, negotiate_encoding
+from spatial import OccupancyIndex, fits_in_garden
+from notifications import BackgroundScheduler, SlackWebhookSender, batched, send_with_retry
+from retention import parse_policy, versions_to_thin
+from version_storage import (
+    decode_payload, diff_states, encode_delta, encode_keyframe, largest_grid,
+    map_state_cells, state_cells, state_from_grids, state_grids
+)
 
-# Configuration du logger
+# Configuration du logger (niveau réglable, INFO par défaut : les messages de
+# debug utilisent un formatage différé et ne coûtent rien quand ils sont filtrés)
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.environ.get('POTAGER_LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler('backend.log'),
@@ -15,44 +54,176 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialisation de Flask
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///potager.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Configuration par défaut, surchargée par create_app(config)
+DEFAULT_CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': os.environ.get('POTAGER_DATABASE_URI', 'sqlite:///potager.db'),
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    # Potagers multiples : une base SQLite par potager, désigné par l'en-tête
+    # X-Garden ou le paramètre ?garden=. Modèle d'URL avec {garden}, par exemple
+    # "sqlite:///gardens/{garden}.db" (None = un seul potager). Le potager
+    # "default" reste dans SQLALCHEMY_DATABASE_URI.
+    'GARDEN_DATABASE_URI': os.environ.get('POTAGER_GARDEN_DATABASE_URI'),
+    # Nombre de bases de potagers gardées ouvertes (les moins récentes sont fermées)
+    'GARDEN_ENGINE_CACHE_SIZE': 32,
+    # Catalogue des cultures partagé par tous les potagers (None = base principale)
+    'CATALOGUE_DATABASE_URI': os.environ.get('POTAGER_CATALOGUE_DATABASE_URI'),
+    # Pool de connexions SQLite (par processus)
+    'SQLITE_POOL_SIZE': 5,
+    'SQLITE_MAX_OVERFLOW': 10,
+    # Attente maximale (ms) d'un verrou d'écriture avant erreur
+    'SQLITE_BUSY_TIMEOUT': 5000,
+    # Cache de lecture en mémoire (catalogue des cultures, popularité)
+    'READ_CACHE_SIZE': 128,
+    'READ_CACHE_TTL': 300,
+    # Nombre maximum de versions dans une chaîne (une image complète puis des deltas)
+    'VERSION_KEYFRAME_INTERVAL': 20,
+    # Rétention des versions (voir retention.py) : paliers (granularité, âge
+    # maximum en jours), du plus récent au plus ancien ; None ou [] = tout garder
+    'VERSION_RETENTION': [('all', 1), ('day', 30), ('week', 365), ('month', None)],
+    # Les versions nommées sont gardées comme les versions épinglées
+    'VERSION_RETENTION_KEEP_NAMED': True,
+    # Compactage (suppression des versions éclaircies puis VACUUM incrémental) :
+    # intervalle en secondes, ou expression cron (prioritaire)
+    'VERSION_COMPACTION_INTERVAL': 24 * 3600,
+    'VERSION_COMPACTION_CRON': None,
+    # Lancer le compactage dans le processus web (un seul worker)
+    'VERSION_COMPACTION_IN_PROCESS': False,
+    # Notifications Slack des échéances à venir
+    'NOTIFICATIONS_SLACK_WEBHOOK': os.environ.get('SLACK_WEBHOOK_URL'),
+    # Planification : intervalle en secondes, ou expression cron (prioritaire), ex. "0 8 * * *"
+    'NOTIFICATIONS_INTERVAL': 3600,
+    'NOTIFICATIONS_CRON': None,
+    'NOTIFICATIONS_HORIZON_DAYS': 15,
+    'NOTIFICATIONS_BATCH_SIZE': 20,
+    'NOTIFICATIONS_SEND_RETRIES': 4,
+    # Nombre de cycles en échec avant abandon d'une notification
+    'NOTIFICATIONS_MAX_ATTEMPTS': 5,
+    # Lancer le planificateur dans le processus web (un seul worker)
+    'NOTIFICATIONS_IN_PROCESS': False,
+    # Instrumentation (/metrics) et journalisation des requêtes lentes (None = désactivée)
+    'METRICS_ENABLED': True,
+    'SLOW_REQUEST_THRESHOLD_MS': None,
+    # Flux d'événements (/events) : nombre d'événements conservés pour la reprise,
+    # délai de scrutation de la base (écritures des autres processus), intervalle
+    # des messages de maintien et durée maximale d'une connexion SSE (secondes)
+    'EVENTS_RETENTION': 10000,
+    'EVENTS_POLL_INTERVAL': 1.0,
+    'EVENTS_HEARTBEAT': 15,
+    'EVENTS_STREAM_MAX_SECONDS': 300,
+    # Taille maximale du potager (cases) ; le placement des parcelles est
+    # vérifié par l'index spatial (spatial.py), sans comparaison deux à deux
+    'POTAGER_MAX_SIZE': 1000,
+    # Taille maximale d'une parcelle (lignes et colonnes)
+    'PARCELLE_MAX_SIZE': 500,
+    # Au-delà de ce nombre de cases, les grilles sont renvoyées en forme creuse
+    # par défaut (?grid=dense ou ?grid=sparse pour choisir explicitement)
+    'DENSE_GRID_MAX_CELLS': 400,
+    # Compression gzip/brotli des réponses à partir de cette taille (octets ; None = désactivée)
+    'COMPRESSION_MIN_SIZE': 1024,
+    'COMPRESSION_GZIP_LEVEL': 6,
+    'COMPRESSION_BROTLI_QUALITY': 5,
+    # Rotation : une même famille ne doit pas revenir dans une case avant ce nombre de saisons
+    'ROTATION_SEASONS': 3,
+}
+
+# Les routes sont déclarées sur ce blueprint et enregistrées par create_app()
+bp = Blueprint('potager', __name__, cli_group=None)
+
+# Potager utilisé quand la requête n'en désigne pas
+DEFAULT_GARDEN = 'default'
+# Clé du catalogue partagé (cultures et notifications) dans SQLALCHEMY_BINDS
+CATALOGUE_BIND = 'catalogue'
+
+# Session qui envoie les tables du catalogue vers la base du catalogue et
+# toutes les autres vers la base du potager de la requête en cours
+class RoutingSession(FlaskSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        engine = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if engine is self._db.engines.get(CATALOGUE_BIND) or (mapper is None and selects_from_catalogue(clause)):
+            return catalogue_engine()
+        return garden_engine()
+
+# Requête de colonnes (select sans entité ORM) sur une table du catalogue ;
+# les tables sont lues dans la clause des colonnes, sans compiler la requête
+def selects_from_catalogue(clause):
+    return isinstance(clause, Select) and any(
+        getattr(table, 'metadata', None) is not None and table.metadata.info.get('bind_key') == CATALOGUE_BIND
+        for table in clause.columns_clause_froms
+    )
+
+# Initialisation de la base de données (liée à l'application dans create_app)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
-# Activer CORS
-CORS(app)
+# Dates des cultures : AAAA-MM-JJ dans l'API, type Date en base
+def parse_date(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
 
-# Initialisation de la base de données
-db = SQLAlchemy(app)
+def format_date(value):
+    return value.isoformat() if value else None
 
 
 # Modèle de la table Culture
 class Culture(db.Model):
     __tablename__ = 'culture'
+    __bind_key__ = CATALOGUE_BIND
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(50), nullable=False)
-    date_semis = db.Column(db.String(10), nullable=False)
+    date_semis = db.Column(db.Date, nullable=False, index=True)
     type_culture = db.Column(db.String(20), nullable=False)
-    date_repiquage = db.Column(db.String(10), nullable=True)
-    date_recolte = db.Column(db.String(10), nullable=True)
+    date_repiquage = db.Column(db.Date, nullable=True)
+    date_recolte = db.Column(db.Date, nullable=True)
     commentaire = db.Column(db.String(255), nullable=True)
     couleur = db.Column(db.String(7), nullable=False)
-    emoji = db.Column(db.String(10), nullable=True)
+    # Indexé pour la jointure avec les cases des parcelles (popularité)
+    emoji = db.Column(db.String(10), nullable=True, index=True)
     temp_emoji = db.Column(db.String(10), nullable=True)
+    # Famille botanique (rotation des cultures) ; à défaut, la culture elle-même
+    famille = db.Column(db.String(50), nullable=True)
+
+    # Fin de la période de culture (récolte, sinon repiquage, sinon semis),
+    # indexée pour les requêtes du calendrier. AUTOINCREMENT : l'identifiant
+    # d'une culture supprimée n'est jamais réattribué, les cases des versions
+    # et de l'historique qui le gardent ne désignent pas une autre culture.
+    __table_args__ = (
+        db.Index('ix_culture_date_fin', db.func.coalesce(date_recolte, date_repiquage, date_semis)),
+        {'sqlite_autoincrement': True},
+    )
+
+    @classmethod
+    def date_fin(cls):
+        return db.func.coalesce(cls.date_recolte, cls.date_repiquage, cls.date_semis)
+
+    # Colonnes de to_dict() pour column_dicts() : les dates sont lues telles que
+    # SQLite les stocke (AAAA-MM-JJ), sans conversion en objets date
+    @classmethod
+    def dict_columns(cls):
+        return [
+            db.type_coerce(column, db.String).label(column.key) if isinstance(column.type, db.Date) else column
+            for column in cls.__table__.columns
+        ]
 
     def to_dict(self):
         return {
             'id': self.id,
             'nom': self.nom,
-            'date_semis': self.date_semis,
+            'date_semis': format_date(self.date_semis),
             'type_culture': self.type_culture,
-            'date_repiquage': self.date_repiquage,
-            'date_recolte': self.date_recolte,
+            'date_repiquage': format_date(self.date_repiquage),
+            'date_recolte': format_date(self.date_recolte),
             'commentaire': self.commentaire,
             'couleur': self.couleur,
             'emoji': self.emoji,
-            'temp_emoji': self.temp_emoji
+            'temp_emoji': self.temp_emoji,
+            'famille': self.famille
         }
 
 # Modèle pour l'organisation du potager (parcelles)
@@ -72,20 +243,33 @@ class ParcelleConfig(db.Model):
             'cols': self.cols
         }
 
+# Contenu d'une case : la culture plantée (culture_id), ou le texte d'origine
+# (culture_emoji) s'il ne correspond à aucune culture du catalogue. Le catalogue
+# pouvant être dans une autre base, culture_id n'est pas une clé étrangère ;
+# il est résolu en mémoire (voir CultureCatalog).
 class Parcelle(db.Model):
     __tablename__ = 'parcelle'
     id = db.Column(db.Integer, primary_key=True)
     parcelle_config_id = db.Column(db.Integer, db.ForeignKey('parcelle_config.id'), nullable=False)
     row = db.Column(db.Integer, nullable=False)
     col = db.Column(db.Integer, nullable=False)
+    culture_id = db.Column(db.Integer, nullable=True)
     culture_emoji = db.Column(db.String(10), nullable=True)
 
+    # Une seule ligne par case ; sert aussi aux recherches par parcelle.
+    # Les comptages par culture (popularité, prévisions) parcourent l'index des cultures.
+    __table_args__ = (
+        db.Index('ix_parcelle_cell', 'parcelle_config_id', 'row', 'col', unique=True),
+        db.Index('ix_parcelle_culture', 'culture_id', 'culture_emoji'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
             'parcelle_config_id': self.parcelle_config_id,
             'row': self.row,
             'col': self.col,
+            'culture_id': self.culture_id,
             'culture_emoji': self.culture_emoji
         }
 
@@ -93,7 +277,7 @@ class Parcelle(db.Model):
 class ParcellePosition(db.Model):
     __tablename__ = 'parcelle_position'
     id = db.Column(db.Integer, primary_key=True)
-    parcelle_config_id = db.Column(db.Integer, db.ForeignKey('parcelle_config.id'), nullable=False)
+    parcelle_config_id = db.Column(db.Integer, db.ForeignKey('parcelle_config.id'), nullable=False, index=True)
     position_x = db.Column(db.Integer, nullable=False)
     position_y = db.Column(db.Integer, nullable=False)
 
@@ -106,27 +290,83 @@ class ParcellePosition(db.Model):
         }
 
 # Modèle pour les versions du potager
+# Le contenu est stocké compressé dans `payload` (voir version_storage.py) :
+# une image complète toutes les VERSION_KEYFRAME_INTERVAL versions, des deltas
+# par rapport à la version précédente entre les deux.
 class Version(db.Model):
     __tablename__ = 'version'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=True)
-    parcelles = db.Column(db.PickleType, nullable=False)
-    parcelle_positions = db.Column(db.PickleType, nullable=False)
-    parcelle_cultures = db.Column(db.PickleType, nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    is_current = db.Column(db.Boolean, default=True)
+    # Chargé à la demande : les listes de versions ne lisent jamais le contenu
+    payload = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    # Image complète dont dépend ce delta (NULL pour une image complète)
+    keyframe_id = db.Column(db.Integer, db.ForeignKey('version.id'), nullable=True, index=True)
+    # Position dans la chaîne (0 pour une image complète)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    # Horodatage UTC fixé côté Python pour que tous les enregistrements aient le
+    # même format texte (microsecondes comprises) et se comparent correctement
+    created_at = db.Column(db.DateTime, default=utcnow)
+    # Version épinglée : jamais supprimée par la rétention (voir compact_versions)
+    pinned = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
-    def to_dict(self):
+    __table_args__ = (
+        db.Index('ix_version_created_at_id', 'created_at', 'id'),
+    )
+
+    def to_summary_dict(self):
         return {
             'id': self.id,
             'name': self.name,
-            'parcelles': self.parcelles,
-            'parcelle_positions': self.parcelle_positions,
-            'parcelle_cultures': self.parcelle_cultures,
             'created_at': self.created_at,
-            'is_current': self.is_current
+            'is_current': self.id == current_version_id(),
+            'pinned': self.pinned
         }
 
+    # encoding : 'dense' (grilles à plat) ou 'sparse' ([ligne, colonne, emoji] des cases plantées)
+    def to_dict(self, state=None, encoding='dense'):
+        if state is None:
+            state = load_version_state(self)
+        state = map_state_cells(state, culture_catalog().label)
+        return {
+            'id': self.id,
+            'name': self.name,
+            'parcelles': state['parcelles'],
+            'parcelle_positions': state['parcelle_positions'],
+            'parcelle_cultures': state_grids(state) if encoding == 'dense' else state_cells(state),
+            'created_at': self.created_at,
+            'is_current': self.id == current_version_id(),
+            'pinned': self.pinned
+        }
+
+# Version courante du potager : une seule ligne (id = 1), réécrite à chaque
+# enregistrement ou restauration sans toucher aux autres versions
+class CurrentVersion(db.Model):
+    __tablename__ = 'current_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version_id = db.Column(db.Integer, db.ForeignKey('version.id'), nullable=True)
+
+# Historique des cases, en ajout seul : une ligne chaque fois qu'une version
+# enregistre un contenu de case différent de la version précédente (culture_id,
+# ou texte d'origine comme pour Parcelle ; ni l'un ni l'autre = case vidée). Les index servent les frises par case et par parcelle et
+# les contrôles de rotation par période, sans décoder les versions.
+class CellHistory(db.Model):
+    __tablename__ = 'cell_history'
+    id = db.Column(db.Integer, primary_key=True)
+    version_id = db.Column(db.Integer, db.ForeignKey('version.id'), nullable=False, index=True)
+    # Pas de clé étrangère : l'historique survit à la suppression de la parcelle
+    parcelle_config_id = db.Column(db.Integer, nullable=False)
+    row = db.Column(db.Integer, nullable=False)
+    col = db.Column(db.Integer, nullable=False)
+    culture_id = db.Column(db.Integer, nullable=True)
+    culture_emoji = db.Column(db.String(10), nullable=False, default='')
+    recorded_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_cell_history_cell', 'parcelle_config_id', 'row', 'col', 'recorded_at'),
+        db.Index('ix_cell_history_parcelle', 'parcelle_config_id', 'recorded_at'),
+        db.Index('ix_cell_history_recorded_at', 'recorded_at'),
+    )
+
 # Après les autres modèles, avant les routes
 class PotagerConfig(db.Model):
     __tablename__ = 'potager_config'
@@ -140,34 +380,842 @@ class PotagerConfig(db.Model):
             'cols': self.cols
         }
 
+# Notifications d'échéances (semis, repiquage, récolte) déjà planifiées ou envoyées.
+# L'unicité (culture, type, date) évite les doublons entre cycles et entre processus.
+class Notification(db.Model):
+    __tablename__ = 'notification'
+    __bind_key__ = CATALOGUE_BIND
+    id = db.Column(db.Integer, primary_key=True)
+    culture_id = db.Column(db.Integer, db.ForeignKey('culture.id'), nullable=False)
+    event_type = db.Column(db.String(20), nullable=False)
+    event_date = db.Column(db.Date, nullable=False)
+    # pending, sending, sent, failed ou obsolete (date de la culture modifiée)
+    status = db.Column(db.String(10), nullable=False, default='pending', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('culture_id', 'event_type', 'event_date', name='uq_notification_event'),
+    )
+
+# Journal des modifications diffusé aux clients (/events).
+# L'identifiant sert de numéro de séquence : AUTOINCREMENT garantit qu'il
+# n'est jamais réutilisé, même après la purge des plus anciens.
+class EventJournal:
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=utcnow)
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def to_dict(self):
+        return {
+            'seq': self.id,
+            'type': self.kind,
+            'data': json.loads(self.payload),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+# Journal propre à chaque potager
+class GardenEvent(EventJournal, db.Model):
+    __tablename__ = 'garden_event'
+
+# Journal du catalogue partagé, dans la base du catalogue : chaque modification
+# de culture et son événement sont validés ensemble, et les clients de tous les
+# potagers le suivent
+class CatalogueEvent(EventJournal, db.Model):
+    __tablename__ = 'catalogue_event'
+    __bind_key__ = CATALOGUE_BIND
+
+# Types d'événements publiés dans le journal du catalogue
+CATALOGUE_EVENT_KINDS = frozenset({'culture', 'cultures'})
+
+# Compteur de génération par table, incrémenté à chaque commit qui modifie la table.
+# Stocké en base pour rester cohérent entre plusieurs processus.
+class TableGeneration(db.Model):
+    __tablename__ = 'table_generation'
+    table_name = db.Column(db.String(50), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+# Tables du catalogue partagé ; les autres appartiennent à la base de chaque potager
+CATALOGUE_TABLES = frozenset({Culture.__tablename__, Notification.__tablename__, CatalogueEvent.__tablename__})
+
+# Potager de la requête en cours (choisi par select_garden), sinon le potager par défaut
+def current_garden():
+    return g.get('garden') or current_app.extensions['potager']['default_garden']
+
+def garden_engine():
+    return current_garden().engine or db.engines[None]
+
+# Sans base dédiée, le catalogue est dans la base principale et partage son
+# moteur : une même transaction n'y ouvre jamais deux connexions en écriture
+def catalogue_engine():
+    if current_app.config['CATALOGUE_DATABASE_URI']:
+        return db.engines[CATALOGUE_BIND]
+    return db.engines[None]
+
+# Regrouper des tables par base : chacune a sa propre table des générations
+def tables_by_engine(tables):
+    groups = {}
+    for table in tables:
+        engine = catalogue_engine() if table in CATALOGUE_TABLES else garden_engine()
+        groups.setdefault(engine, set()).add(table)
+    return groups.items()
+
+# Générations (table_name, generation, updated_at) des tables, lues dans leurs bases
+def read_table_generations(tables):
+    rows = []
+    for engine, names in tables_by_engine(tables):
+        rows.extend(db.session.execute(
+            db.select(TableGeneration.table_name, TableGeneration.generation, TableGeneration.updated_at)
+            .where(TableGeneration.table_name.in_(names)),
+            bind_arguments={'bind': engine}
+        ))
+    return rows
+
+# Noter les tables modifiées par le flush (ajouts, modifications, suppressions)
+@event.listens_for(Session, 'after_flush')
+def track_flushed_tables(session, flush_context):
+    changed = session.info.setdefault('changed_tables', set())
+    for obj in session.new | session.dirty | session.deleted:
+        changed.add(obj.__table__.name)
+
+# Noter les tables modifiées par les requêtes groupées (insert/update/delete ORM)
+@event.listens_for(Session, 'do_orm_execute')
+def track_bulk_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        changed = orm_execute_state.session.info.setdefault('changed_tables', set())
+        for mapper in orm_execute_state.all_mappers:
+            changed.add(mapper.local_table.name)
+
+# Incrémenter les générations dans la même transaction que les modifications
+@event.listens_for(Session, 'before_commit')
+def bump_table_generations(session):
+    session.flush()
+    changed = session.info.pop('changed_tables', None)
+    if not changed:
+        return
+    # Conservées jusqu'à after_commit pour invalider les caches locaux
+    session.info['committed_tables'] = changed
+    now = utcnow()
+    for engine, names in tables_by_engine(changed - {TableGeneration.__tablename__}):
+        connection = session.connection(bind_arguments={'bind': engine})
+        for table_name in sorted(names):
+            connection.execute(db.text(
+                "INSERT INTO table_generation (table_name, generation, updated_at) "
+                "VALUES (:table_name, 1, :now) "
+                "ON CONFLICT(table_name) DO UPDATE SET generation = generation + 1, updated_at = :now"
+            ), {'table_name': table_name, 'now': now})
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changed_tables(session):
+    session.info.pop('changed_tables', None)
+    session.info.pop('committed_tables', None)
+    session.info.pop('spatial_changes', None)
+
+# Cache de lecture en mémoire (LRU borné avec expiration). Chaque entrée garde
+# les générations des tables dont elle dépend, lues avant son calcul : elle
+# n'est servie que si elles n'ont pas changé depuis, y compris par un autre
+# processus. Les commits locaux la suppriment aussitôt ; l'expiration ne sert
+# qu'à libérer la mémoire des entrées qui ne sont plus lues.
+class ReadCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # generations : {table: génération} des tables de l'entrée, lues avant l'appel
+    def get_or_compute(self, key, tables, compute, generations):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now and entry[3] == generations:
+                self._entries.move_to_end(key)
+                return entry[2]
+        value = compute()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, frozenset(tables), value, generations)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate_tables(self, tables):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] & tables]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Cache de lecture propre à chaque application (créé par create_app), partagé
+# par les potagers : les tables d'un potager y sont préfixées par son nom,
+# celles du catalogue valent pour tous
+def get_read_cache():
+    return current_app.extensions['potager']['read_cache']
+
+def qualify_table(table):
+    return table if table in CATALOGUE_TABLES else f"{current_garden().name}:{table}"
+
+def qualify_tables(tables):
+    return {qualify_table(table) for table in tables}
+
+# Générations courantes des tables (clés qualifiées comme dans le cache). Celles
+# déjà lues pendant la requête (par @conditional) sont réutilisées jusqu'au
+# prochain commit de ce processus ; les autres sont lues en base.
+def current_generations(tables):
+    known = g.setdefault('table_generations', {})
+    missing = [table for table in tables if qualify_table(table) not in known]
+    if missing:
+        known.update(
+            (qualify_table(table), generation) for table, generation in load_table_generations(missing).items()
+        )
+    return {qualify_table(table): known[qualify_table(table)] for table in tables}
+
+# Caches propres à chaque potager
+def get_version_state_cache():
+    return current_garden().version_states
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_read_cache(session):
+    committed = session.info.pop('committed_tables', None)
+    spatial_changes = session.info.pop('spatial_changes', [])
+    if committed and has_app_context():
+        g.pop('table_generations', None)
+        get_read_cache().invalidate_tables(qualify_tables(committed))
+        if GardenEvent.__tablename__ in committed:
+            get_event_notifier().notify()
+        # Les flux de tous les potagers ouverts dans ce processus suivent le catalogue
+        if CatalogueEvent.__tablename__ in committed:
+            potager = current_app.extensions['potager']
+            for garden in (potager['default_garden'], *potager['gardens'].open_gardens()):
+                garden.events.notify()
+        if committed & SPATIAL_TABLES:
+            get_spatial_cache().committed(committed & SPATIAL_TABLES, spatial_changes)
+
+# Index spatial des emprises des parcelles, propre à chaque processus.
+# Il est associé aux générations des tables qu'il reflète : les commits de ce
+# processus le mettent à jour sur place (voir stage_spatial_change), toute
+# autre modification (autre processus, restauration, import) le fait
+# reconstruire à la prochaine lecture, en une requête.
+SPATIAL_TABLES = {'parcelle_config', 'parcelle_position'}
+
+class SpatialIndexCache:
+    def __init__(self):
+        self.index = None
+        self.generations = None
+        # Réentrant : le commit d'une route qui tient le verrou met l'index à jour
+        self.lock = threading.RLock()
+
+    def committed(self, tables, changes):
+        with self.lock:
+            if self.index is None:
+                return
+            if not changes:
+                self.index = None
+                return
+            for change in changes:
+                change(self.index)
+            for table in tables:
+                self.generations[table] = self.generations.get(table, 0) + 1
+
+def get_spatial_cache():
+    return current_garden().spatial
+
+def load_table_generations(tables):
+    generations = dict.fromkeys(tables, 0)
+    generations.update((row.table_name, row.generation) for row in read_table_generations(tables))
+    return generations
+
+# Prendre le verrou d'écriture de la base du potager (BEGIN IMMEDIATE) s'il
+# n'est pas déjà tenu : les autres processus attendent jusqu'au commit
+def lock_garden_for_write():
+    connection = db.session.connection(bind_arguments={'mapper': ParcellePosition})
+    if connection.dialect.name == 'sqlite' and not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+# Index à jour, utilisé sous verrou : les vérifications, l'écriture et le
+# commit d'un placement se font dans le bloc pour ne pas se croiser entre threads.
+# Avec `write`, le verrou d'écriture de la base est pris avant de lire l'état :
+# entre workers aussi, la vérification et le commit ne se croisent pas.
+@contextmanager
+def spatial_index(write=False):
+    if write:
+        lock_garden_for_write()
+    cache = get_spatial_cache()
+    generations = load_table_generations(SPATIAL_TABLES)
+    with cache.lock:
+        if cache.index is None or cache.generations != generations:
+            index = OccupancyIndex()
+            for parcelle_id, x, y, rows, cols in db.session.query(
+                ParcellePosition.parcelle_config_id, ParcellePosition.position_x, ParcellePosition.position_y,
+                ParcelleConfig.rows, ParcelleConfig.cols
+            ).join(ParcelleConfig, ParcelleConfig.id == ParcellePosition.parcelle_config_id):
+                index.place(parcelle_id, x, y, rows, cols)
+            cache.index, cache.generations = index, generations
+        yield cache.index
+
+# Modification de l'index à appliquer une fois la transaction validée
+def stage_spatial_change(change):
+    db.session.info.setdefault('spatial_changes', []).append(change)
+
+def get_potager_dimensions():
+    config = PotagerConfig.query.first()
+    return (config.rows, config.cols) if config else (10, 10)
+
+# Vérifier qu'une parcelle de rows x cols peut être placée en (x, y) ;
+# renvoie None ou la réponse d'erreur
+def check_placement(index, parcelle_id, x, y, rows, cols):
+    if not isinstance(x, int) or not isinstance(y, int):
+        return jsonify({"error": "Position invalide"}), 400
+    garden_rows, garden_cols = get_potager_dimensions()
+    if not fits_in_garden(x, y, rows, cols, garden_rows, garden_cols):
+        return jsonify({"error": "La parcelle dépasse du potager"}), 400
+    conflicts = index.overlaps(x, y, rows, cols, ignore=parcelle_id)
+    if conflicts:
+        return jsonify({"error": "La parcelle chevauche d'autres parcelles", "conflicts": conflicts}), 409
+    return None
+
+# Réponse JSON mise en cache déjà sérialisée : une lecture devient une recherche dans un dict
+def cached_json_response(key, tables, compute):
+    generations = current_generations(tables)
+    body = get_read_cache().get_or_compute(
+        (current_garden().name, key), generations.keys(), lambda: current_app.json.dumps(compute()), generations
+    )
+    return current_app.response_class(body, mimetype='application/json')
+
+# Lignes de colonnes en dictionnaires, sans construire d'objets ORM : pour les
+# listes volumineuses, les valeurs lues vont directement au sérialiseur JSON
+def column_dicts(statement):
+    result = db.session.execute(statement)
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+# Cultures indexées en mémoire, pour résoudre le contenu des cases. Une
+# référence de case est l'identifiant d'une culture (entier), le texte
+# d'origine s'il ne correspond à aucune culture, ou None pour une case vide.
+class CultureCatalog:
+    def __init__(self, cultures):
+        self.by_id = {culture.id: culture for culture in cultures}
+        # Emoji partagé par plusieurs cultures : la plus ancienne l'emporte
+        self.by_emoji = {}
+        for culture in sorted(cultures, key=lambda culture: culture.id):
+            if culture.emoji:
+                self.by_emoji.setdefault(culture.emoji, culture.id)
+        # Libellé des cases renvoyé au frontend : "emoji,id,nom"
+        self.labels = {
+            culture.id: f"{culture.emoji or ''},{culture.id},{culture.nom}" for culture in cultures
+        }
+
+    # Référence d'une valeur reçue : identifiant, "emoji,id,nom" (planificateur)
+    # ou emoji seul. Un libellé dont la culture n'existe plus reste du texte.
+    # `ids` traduit les identifiants cités (import d'une sauvegarde dont le
+    # catalogue a été fusionné) ; un identifiant absent de `ids` est ignoré.
+    def reference(self, value, ids=None):
+        if not value:
+            return None
+        if isinstance(value, int):
+            return ids.get(value) if ids is not None else value
+        emoji, _, rest = value.partition(',')
+        culture_id = rest.split(',', 1)[0].strip()
+        if culture_id.isdigit():
+            culture_id = int(culture_id) if ids is None else ids.get(int(culture_id))
+            return culture_id if culture_id in self.by_id else value
+        return self.by_emoji.get(emoji, value)
+
+    def known(self, reference):
+        return reference is None or reference in self.by_id
+
+    # Identifiant qui ne désigne aucune culture (le texte non résolu est accepté)
+    def missing(self, reference):
+        return isinstance(reference, int) and reference not in self.by_id
+
+    def culture(self, reference):
+        return self.by_id.get(reference) if isinstance(reference, int) else None
+
+    # Libellé d'une case ('' pour une case vide ou une culture supprimée)
+    def label(self, reference):
+        if isinstance(reference, int):
+            return self.labels.get(reference, '')
+        return reference or ''
+
+    def cell_label(self, culture_id, culture_emoji):
+        if culture_id is not None:
+            return self.labels.get(culture_id, '')
+        return culture_emoji or ''
+
+def load_culture_catalog():
+    return CultureCatalog(db.session.execute(db.select(
+        Culture.id, Culture.nom, Culture.emoji, Culture.famille,
+        Culture.date_semis, Culture.date_repiquage, Culture.date_recolte
+    )).all())
+
+# Catalogue en cache, commun à tous les potagers. refresh=True le relit (une
+# référence inconnue peut désigner une culture créée par un autre processus).
+# Ne pas l'utiliser dans une transaction qui modifie les cultures sans les
+# avoir validées : load_culture_catalog() lit alors l'état en cours.
+def culture_catalog(refresh=False):
+    cache = get_read_cache()
+    if refresh:
+        g.pop('table_generations', None)
+        cache.invalidate_tables({Culture.__tablename__})
+    generations = current_generations({Culture.__tablename__})
+    return cache.get_or_compute(
+        (None, 'culture_catalog'), generations.keys(), load_culture_catalog, generations
+    )
+
+def cell_reference(culture_id, culture_emoji):
+    return culture_id if culture_id is not None else (culture_emoji or None)
+
+# Colonnes d'une case (Parcelle) pour une référence
+def cell_columns(reference):
+    if isinstance(reference, int):
+        return {'culture_id': reference, 'culture_emoji': None}
+    return {'culture_id': None, 'culture_emoji': reference or None}
+
+# Contenu demandé pour une case : culture_id, sinon culture_emoji ("emoji,id,nom"
+# ou emoji seul). Un culture_emoji vide vide la case. Lève ValueError si
+# culture_id n'est pas un entier.
+def requested_cell_value(data):
+    if 'culture_emoji' in data and not data['culture_emoji']:
+        return None
+    culture_id = data.get('culture_id')
+    if culture_id is not None and culture_id != '':
+        if isinstance(culture_id, bool) or not str(culture_id).strip().isdigit():
+            raise ValueError(f"culture_id invalide : {culture_id}")
+        return int(culture_id)
+    return data.get('culture_emoji') or None
+
+# Références des contenus demandés, avec le catalogue qui les a résolues : il
+# est relu une fois si l'une d'elles n'y figure pas
+def write_references(values):
+    catalog = culture_catalog()
+    references = [catalog.reference(value) for value in values]
+    if not all(catalog.known(reference) for reference in references):
+        catalog = culture_catalog(refresh=True)
+        references = [catalog.reference(value) for value in values]
+    return catalog, references
+
+# Réveil des flux d'événements du processus dès qu'un commit publie un
+# événement ; les écritures des autres processus sont vues par scrutation
+class EventNotifier:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._counter = 0
+
+    @property
+    def counter(self):
+        return self._counter
+
+    def notify(self):
+        with self._condition:
+            self._counter += 1
+            self._condition.notify_all()
+
+    # Attendre une notification postérieure à `seen` ; renvoie le compteur courant
+    def wait(self, seen, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._counter != seen, timeout)
+            return self._counter
+
+def get_event_notifier():
+    return current_garden().events
+
+# État en mémoire d'un potager : moteur de sa base et caches propres au processus
+class GardenState:
+    def __init__(self, name, engine=None):
+        self.name = name
+        # None pour le potager par défaut (moteur principal de Flask-SQLAlchemy)
+        self.engine = engine
+        self.version_states = {}
+        self.events = EventNotifier()
+        self.spatial = SpatialIndexCache()
+
+# Ouvrir la base d'un potager ; avec `create`, elle est créée au schéma courant
+# si besoin, sinon LookupError si elle n'existe pas
+def open_garden(app, garden_id, create=False):
+    url = garden_database_uri(app.config['GARDEN_DATABASE_URI'], garden_id, app.instance_path, create)
+    if not create and not garden_database_exists(url):
+        raise LookupError(f"Potager inconnu : {garden_id}")
+    engine = create_engine(url, **sqlite_engine_options(app, url))
+    configure_engine(app, engine)
+    with engine.begin() as connection:
+        fresh = not db.inspect(connection).get_table_names()
+        db.metadata.create_all(connection)
+        if fresh:
+            connection.exec_driver_sql(f"PRAGMA user_version = {len(SCHEMA_MIGRATIONS)}")
+    logger.info("Potager %s ouvert (%s)", garden_id, url)
+    return GardenState(garden_id, engine)
+
+# Fermer les connexions inactives d'un potager sorti du registre ; les
+# requêtes en cours gardent la leur jusqu'à la fin
+def close_garden(garden):
+    garden.engine.dispose()
+
+# Potager désigné par son identifiant : ValueError s'il est invalide,
+# LookupError s'il n'existe pas (sauf avec `create`) ou si les potagers
+# multiples ne sont pas configurés
+def find_garden(garden_id, create=False):
+    if not garden_id or garden_id == DEFAULT_GARDEN:
+        return current_app.extensions['potager']['default_garden']
+    if not is_valid_garden_id(garden_id):
+        raise ValueError(f"Identifiant de potager invalide : {garden_id}")
+    if not current_app.config['GARDEN_DATABASE_URI']:
+        raise LookupError(f"Potager inconnu : {garden_id}")
+    return current_app.extensions['potager']['gardens'].get(garden_id, create)
+
+# Routes qui ne portent sur aucun potager : X-Garden ou ?garden= y sont ignorés
+# (l'interface les envoie à chaque appel, y compris pour créer le potager affiché)
+GARDENLESS_ENDPOINTS = {'potager.create_garden_route'}
+
+@bp.before_app_request
+def select_garden():
+    if request.endpoint in GARDENLESS_ENDPOINTS:
+        return
+    try:
+        g.garden = find_garden(request.headers.get('X-Garden') or request.args.get('garden'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+
+# Créer un potager (seul moyen, avec la commande create-garden, d'ajouter une
+# base) : 201 s'il est créé, 200 s'il existait déjà
+def create_garden(garden_id):
+    if not garden_id:
+        raise ValueError("Identifiant de potager requis")
+    try:
+        find_garden(garden_id)
+        return False
+    except LookupError:
+        find_garden(garden_id, create=True)
+        return True
+
+@bp.route('/gardens', methods=['POST'])
+def create_garden_route():
+    garden_id = (request.get_json(silent=True) or {}).get('id')
+    try:
+        created = create_garden(garden_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"id": garden_id}), 201 if created else 200
+
+# Ajouter un événement à la transaction en cours : il n'est diffusé qu'une
+# fois les modifications validées, et disparaît avec elles en cas d'annulation.
+# Les événements du catalogue vont dans son journal, commun à tous les potagers.
+def publish_event(kind, data):
+    journal = CatalogueEvent if kind in CATALOGUE_EVENT_KINDS else GardenEvent
+    db.session.add(journal(kind=kind, payload=json.dumps(data, ensure_ascii=False, default=str)))
+    db.session.execute(
+        db.delete(journal).where(
+            journal.id <= db.select(db.func.max(journal.id)).scalar_subquery()
+            - current_app.config['EVENTS_RETENTION']
+        )
+    )
+
+# Instrumentation : latence, taille des réponses et requêtes SQL par route,
+# exposées au format Prometheus sur /metrics (métriques propres à chaque processus)
+def create_request_metrics():
+    registry = MetricsRegistry()
+    labels = ('method', 'route')
+    return {
+        'registry': registry,
+        'requests': registry.counter(
+            'potager_http_requests_total', "Requêtes HTTP traitées", labels + ('status',)),
+        'latency': registry.histogram(
+            'potager_http_request_duration_seconds', "Durée des requêtes HTTP", labels),
+        'size': registry.histogram(
+            'potager_http_response_size_bytes', "Taille des réponses HTTP", labels, SIZE_BUCKETS),
+        'queries': registry.histogram(
+            'potager_db_queries_per_request', "Requêtes SQL par requête HTTP", labels, COUNT_BUCKETS),
+        'sql_time': registry.histogram(
+            'potager_db_seconds_per_request', "Temps passé en SQL par requête HTTP", labels),
+        'slow': registry.counter(
+            'potager_http_slow_requests_total', "Requêtes au-delà du seuil de lenteur", labels),
+    }
+
+def get_request_metrics():
+    return current_app.extensions['potager']['metrics']
+
+# Le début de la requête est gardé sur son contexte d'exécution : une requête
+# en échec (sans after_cursor_execute) ne laisse rien sur la connexion
+def record_query_start(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.potager_query_started = time.perf_counter()
+
+def record_query_end(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'potager_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if has_app_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_time += elapsed
+
+@bp.before_app_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_time = 0.0
+
+@bp.after_app_request
+def record_request_metrics(response):
+    if 'request_started' not in g or not current_app.config['METRICS_ENABLED']:
+        return response
+    duration = time.perf_counter() - g.request_started
+    route = request.url_rule.rule if request.url_rule else '<inconnue>'
+    labels = (request.method, route)
+    # Ne pas consommer les réponses en flux (SSE, exports) pour mesurer leur taille
+    size = None if response.is_streamed else response.calculate_content_length()
+
+    metrics = get_request_metrics()
+    metrics['requests'].inc(*labels, response.status_code)
+    metrics['latency'].observe(duration, *labels)
+    metrics['queries'].observe(g.sql_queries, *labels)
+    metrics['sql_time'].observe(g.sql_time, *labels)
+    if size is not None:
+        metrics['size'].observe(size, *labels)
+
+    threshold = current_app.config['SLOW_REQUEST_THRESHOLD_MS']
+    if threshold is not None and duration * 1000 >= threshold:
+        metrics['slow'].inc(*labels)
+        logger.warning(
+            "requete_lente method=%s route=%s status=%s duree_ms=%.1f sql=%d sql_ms=%.1f taille=%s",
+            request.method, route, response.status_code, duration * 1000,
+            g.sql_queries, g.sql_time * 1000, size
+        )
+    return response
+
+# Compression négociée (brotli si disponible, sinon gzip) des réponses au-delà
+# de COMPRESSION_MIN_SIZE. Enregistrée après record_request_metrics, elle
+# s'exécute avant : les métriques mesurent la taille réellement envoyée.
+@bp.after_app_request
+def compress_response(response):
+    config = current_app.config
+    if (config['COMPRESSION_MIN_SIZE'] is None or response.is_streamed or response.direct_passthrough
+            or response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None or response.calculate_content_length() < config['COMPRESSION_MIN_SIZE']:
+        return response
+    response.set_data(compress(
+        response.get_data(), encoding, config['COMPRESSION_GZIP_LEVEL'], config['COMPRESSION_BROTLI_QUALITY']
+    ))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return current_app.response_class(
+        get_request_metrics()['registry'].render(),
+        mimetype='text/plain; version=0.0.4'
+    )
+
+# Réponses conditionnelles (ETag / Last-Modified) pour les routes de lecture :
+# une requête dont le If-None-Match correspond reçoit un 304 après une seule
+# lecture de la table des générations, sans exécuter la route.
+def conditional(*tables):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            generations = read_table_generations(tables)
+            by_table = {row.table_name: row.generation for row in generations}
+            # Réutilisées par le cache de lecture pendant la requête
+            g.setdefault('table_generations', {}).update(
+                (qualify_table(table), by_table.get(table, 0)) for table in tables
+            )
+            key = '|'.join(
+                [current_garden().name, request.path, request.query_string.decode('latin-1')]
+                + [f"{table}:{by_table.get(table, 0)}" for table in tables]
+            )
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+            last_modified = max((row.updated_at for row in generations), default=None)
+            if last_modified is not None:
+                # Les dates HTTP sont à la seconde : arrondir à la seconde
+                # supérieure, pour qu'une modification faite dans la même
+                # seconde qu'une réponse déjà servie ne soit pas masquée
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+                if last_modified.microsecond:
+                    last_modified = last_modified.replace(microsecond=0) + timedelta(seconds=1)
+
+            # If-None-Match a priorité ; If-Modified-Since n'est honoré que si la
+            # seconde de la dernière modification est écoulée (sinon une autre
+            # modification peut encore tomber dans la même seconde)
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (
+                    last_modified is not None
+                    and request.if_modified_since is not None
+                    and last_modified <= request.if_modified_since
+                    and last_modified <= datetime.now(timezone.utc)
+                )
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # ETag faible : la même ressource peut être servie compressée ou non
+            response.set_etag(etag, weak=True)
+            response.vary.add('X-Garden')
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+# Décoder plusieurs versions en lisant leurs chaînes en une seule requête.
+# Le dernier état enregistré reste en cache pour calculer le delta suivant.
+def load_version_states(versions):
+    wanted = {version.id for version in versions}
+    cache = get_version_state_cache()
+    states = {version_id: cache[version_id] for version_id in wanted if version_id in cache}
+    missing = [version for version in versions if version.id not in states]
+    if not missing:
+        return states
+
+    keyframe_ids = {version.keyframe_id or version.id for version in missing}
+    last_wanted = {}
+    for version in missing:
+        chain = version.keyframe_id or version.id
+        last_wanted[chain] = max(last_wanted.get(chain, 0), version.id)
+
+    rows = db.session.query(Version.id, Version.keyframe_id, Version.payload).filter(
+        db.or_(Version.id.in_(keyframe_ids), Version.keyframe_id.in_(keyframe_ids))
+    ).order_by(Version.id).all()
+
+    chain_states = {}
+    for version_id, keyframe_id, payload in rows:
+        chain = keyframe_id or version_id
+        if version_id > last_wanted[chain]:
+            continue
+        state = decode_payload(payload, chain_states.get(chain))
+        chain_states[chain] = state
+        if version_id in wanted:
+            states[version_id] = state
+    return states
+
+def load_version_state(version):
+    return load_version_states([version])[version.id]
+
+# Lignes d'historique d'une version : cases dont le contenu diffère de la
+# version précédente, pour les seules parcelles présentes dans la version
+# (une version partielle ne vide pas les autres parcelles)
+def cell_history_rows(version_id, recorded_at, previous, state):
+    present = set(state['parcelle_cultures'])
+    if previous is None:
+        previous = {'parcelles': [], 'parcelle_positions': {}, 'parcelle_cultures': {}}
+    else:
+        previous = {
+            'parcelles': [
+                parcelle for parcelle in previous['parcelles']
+                if isinstance(parcelle, dict) and str(parcelle.get('id')) in present
+            ],
+            'parcelle_positions': {},
+            'parcelle_cultures': {
+                parcelle_id: grid for parcelle_id, grid in previous['parcelle_cultures'].items()
+                if parcelle_id in present
+            }
+        }
+    current = {'parcelles': state['parcelles'], 'parcelle_positions': {}, 'parcelle_cultures': state['parcelle_cultures']}
+    return [
+        {
+            'version_id': version_id, 'parcelle_config_id': int(parcelle_id), 'row': row, 'col': col,
+            'culture_id': after if isinstance(after, int) else None,
+            'culture_emoji': after if isinstance(after, str) else '', 'recorded_at': recorded_at
+        }
+        for parcelle_id, entry in diff_states(previous, current).items() if parcelle_id.isdigit()
+        for row, col, before, after in entry.get('cells', [])
+    ]
+
+# Identifiant de la version courante (None s'il n'y en a pas)
+def current_version_id():
+    return db.session.execute(
+        db.select(CurrentVersion.version_id).where(CurrentVersion.id == 1)
+    ).scalar()
+
+# Désigner la version courante : une seule ligne écrite, quel que soit le nombre de versions
+def set_current_version(version_id):
+    db.session.execute(db.insert(CurrentVersion).prefix_with('OR REPLACE'), {'id': 1, 'version_id': version_id})
+
+# Enregistrer un nouvel état du potager comme version courante
+def save_version(name, state, pinned=False):
+    latest = Version.query.order_by(Version.id.desc()).first()
+    previous_state = load_version_state(latest) if latest is not None else None
+
+    if latest is None or latest.depth + 1 >= current_app.config['VERSION_KEYFRAME_INTERVAL']:
+        new_version = Version(name=name, payload=encode_keyframe(state), depth=0, pinned=pinned)
+    else:
+        new_version = Version(
+            name=name,
+            payload=encode_delta(previous_state, state),
+            keyframe_id=latest.keyframe_id or latest.id,
+            depth=latest.depth + 1,
+            pinned=pinned
+        )
+
+    db.session.add(new_version)
+    db.session.flush()
+    set_current_version(new_version.id)
+    rows = cell_history_rows(new_version.id, new_version.created_at, previous_state, state)
+    if rows:
+        db.session.execute(db.insert(CellHistory), rows)
+    publish_event('version', {'id': new_version.id, 'name': name})
+    db.session.commit()
+
+    # Ne garder en cache que l'état de la dernière version validée
+    cache = get_version_state_cache()
+    cache.clear()
+    cache[new_version.id] = state
+    return new_version
+
 # Route pour récupérer toutes les cultures
-@app.route('/cultures', methods=['GET'])
+@bp.route('/cultures', methods=['GET'])
+@conditional('culture')
 def get_cultures():
-    cultures = Culture.query.all()
-    return jsonify([culture.to_dict() for culture in cultures])
+    return cached_json_response(
+        'cultures', {'culture'},
+        lambda: column_dicts(db.select(*Culture.dict_columns()))
+    )
 
 # Route pour ajouter une culture
-@app.route('/cultures', methods=['POST'])
+@bp.route('/cultures', methods=['POST'])
 def add_culture():
     try:
         data = request.get_json()
-        logger.info(f"Tentative d'ajout d'une culture : {data}")
+        logger.debug("Tentative d'ajout d'une culture : %s", data)
         
         # Déterminer l'emoji de température en fonction du type de culture
         temp_emoji = '❄️' if data['type_culture'] == 'pleine terre' else '��️'
         
         new_culture = Culture(
             nom=data['nom'],
-            date_semis=data['date_semis'],
+            date_semis=parse_date(data['date_semis']),
             type_culture=data['type_culture'],
-            date_repiquage=data.get('date_repiquage'),
-            date_recolte=data.get('date_recolte'),
+            date_repiquage=parse_date(data.get('date_repiquage')),
+            date_recolte=parse_date(data.get('date_recolte')),
             commentaire=data.get('commentaire'),
             emoji=data.get('emoji'),
             couleur=data.get('couleur', '#ffffff'),
+            famille=data.get('famille'),
             temp_emoji=temp_emoji
         )
         db.session.add(new_culture)
+        db.session.flush()
+        publish_event('culture', {'action': 'created', 'culture': new_culture.to_dict()})
         db.session.commit()
         return jsonify({"message": "Culture ajoutée avec succès !"}), 201
 
@@ -176,106 +1224,289 @@ def add_culture():
         return jsonify({"error": str(e)}), 500
 
 # Route pour supprimer une culture par ID
-@app.route('/cultures/<int:id>', methods=['DELETE'])
+@bp.route('/cultures/<int:id>', methods=['DELETE'])
 def delete_culture(id):
     culture = Culture.query.get_or_404(id)
+    # Les cases et l'historique du potager courant gardent le libellé de la
+    # culture supprimée. Les versions enregistrées et les autres potagers ne
+    # gardent que son identifiant, jamais réattribué (AUTOINCREMENT) : leurs
+    # cases apparaissent vides, sans être attribuées à une autre culture.
+    label = CultureCatalog([culture]).label(culture.id)
+    for model in (Parcelle, CellHistory):
+        db.session.execute(
+            db.update(model).where(model.culture_id == id).values(culture_id=None, culture_emoji=label)
+        )
     db.session.delete(culture)
+    publish_event('culture', {'action': 'deleted', 'id': id})
     db.session.commit()
     return jsonify({"message": "Culture supprimée avec succès !"}), 200
 
 # Route pour récupérer les parcelles sauvegardées
-@app.route('/parcelles', methods=['GET'])
+@bp.route('/parcelles', methods=['GET'])
+@conditional('parcelle_config')
 def get_all_parcelles():
-    parcelles_config = ParcelleConfig.query.all()
-    return jsonify([p.to_dict() for p in parcelles_config])
+    return jsonify(column_dicts(db.select(*ParcelleConfig.__table__.columns)))
 
 # Route pour mettre à jour une parcelle
-@app.route('/parcelles', methods=['POST'])
+@bp.route('/parcelles', methods=['POST'])
 def update_parcelle():
     data = request.get_json()
+    try:
+        catalog, (reference,) = write_references([requested_cell_value(data)])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if catalog.missing(reference):
+        return jsonify({"error": f"Culture inconnue : {reference}"}), 400
+
     parcelle = Parcelle.query.filter_by(
         parcelle_config_id=data['parcelle_id'],
         row=data['row'],
         col=data['col']
     ).first()
 
-    # Si une parcelle existe déjà à cet emplacement et qu'on reçoit un emoji vide,
+    # Contenu identique : rien à écrire ni à diffuser (comme les cases
+    # 'unchanged' de la route groupée)
+    current = cell_reference(parcelle.culture_id, parcelle.culture_emoji) if parcelle else None
+    if current == reference:
+        return jsonify({"message": "Parcelle mise à jour avec succès"})
+
+    # Si une parcelle existe déjà à cet emplacement et qu'on reçoit un contenu vide,
     # on supprime la culture de cette case
-    if parcelle and data.get('culture_emoji') == '':
+    if parcelle and reference is None:
         db.session.delete(parcelle)
-    # Si une parcelle existe, on met à jour son emoji
+    # Si une parcelle existe, on met à jour sa culture
     elif parcelle:
-        parcelle.culture_emoji = data['culture_emoji']
-    # Si aucune parcelle n'existe et qu'on a un emoji, on en crée une nouvelle
-    elif data.get('culture_emoji'):
+        for column, value in cell_columns(reference).items():
+            setattr(parcelle, column, value)
+    # Si aucune parcelle n'existe et qu'on a une culture, on en crée une nouvelle
+    elif reference is not None:
         parcelle = Parcelle(
             parcelle_config_id=data['parcelle_id'],
             row=data['row'],
             col=data['col'],
-            culture_emoji=data['culture_emoji']
+            **cell_columns(reference)
         )
         db.session.add(parcelle)
 
+    publish_event('cells', {
+        'parcelle_id': data['parcelle_id'],
+        'cells': [[data['row'], data['col'], catalog.label(reference)]]
+    })
     db.session.commit()
     return jsonify({"message": "Parcelle mise à jour avec succès"})
 
+# Route pour mettre à jour plusieurs cases en une seule transaction
+# Corps attendu : {"cells": [{"parcelle_id", "row", "col", "culture_id" ou "culture_emoji"}, ...]}
+@bp.route('/parcelles/batch', methods=['POST'])
+def update_parcelles_batch():
+    try:
+        data = request.get_json()
+        cells = data.get('cells') if isinstance(data, dict) else None
+        if not isinstance(cells, list):
+            return jsonify({"error": "Liste 'cells' manquante"}), 400
+
+        parcelle_ids = {cell.get('parcelle_id') for cell in cells if isinstance(cell, dict)}
+        configs = {
+            config.id: config
+            for config in ParcelleConfig.query.filter(ParcelleConfig.id.in_(parcelle_ids)).all()
+        }
+
+        # Charger en une requête toutes les cases existantes des parcelles concernées
+        existing = {
+            (p.parcelle_config_id, p.row, p.col): p.id
+            for p in db.session.query(
+                Parcelle.id, Parcelle.parcelle_config_id, Parcelle.row, Parcelle.col
+            ).filter(Parcelle.parcelle_config_id.in_(configs.keys())).all()
+        }
+
+        # Contenu demandé pour chaque case, résolu en une fois
+        values = []
+        for cell in cells:
+            try:
+                values.append(requested_cell_value(cell) if isinstance(cell, dict) else None)
+            except ValueError as e:
+                values.append(e)
+        catalog, references = write_references([
+            None if isinstance(value, ValueError) else value for value in values
+        ])
+
+        # Calculer l'état final de chaque case (la dernière mutation l'emporte)
+        results = []
+        final = {}
+        for index, cell in enumerate(cells):
+            if not isinstance(cell, dict):
+                results.append({'index': index, 'status': 'error', 'error': "Case invalide"})
+                continue
+            parcelle_id, row, col = cell.get('parcelle_id'), cell.get('row'), cell.get('col')
+            result = {'index': index, 'parcelle_id': parcelle_id, 'row': row, 'col': col}
+            config = configs.get(parcelle_id)
+            reference = references[index]
+            if config is None:
+                result.update(status='error', error="Parcelle non trouvée")
+            elif not isinstance(row, int) or not isinstance(col, int) \
+                    or not (0 <= row < config.rows and 0 <= col < config.cols):
+                result.update(status='error', error="Case hors de la parcelle")
+            elif isinstance(values[index], ValueError):
+                result.update(status='error', error=str(values[index]))
+            elif catalog.missing(reference):
+                result.update(status='error', error=f"Culture inconnue : {reference}")
+            else:
+                final[(parcelle_id, row, col)] = (reference, result)
+            results.append(result)
+
+        to_insert, to_update, to_delete = [], [], []
+        for key, (reference, result) in final.items():
+            parcelle_pk = existing.get(key)
+            if parcelle_pk and reference is None:
+                to_delete.append(parcelle_pk)
+                result['status'] = 'deleted'
+            elif parcelle_pk:
+                to_update.append({'id': parcelle_pk, **cell_columns(reference)})
+                result['status'] = 'updated'
+            elif reference is not None:
+                to_insert.append({
+                    'parcelle_config_id': key[0], 'row': key[1], 'col': key[2],
+                    **cell_columns(reference)
+                })
+                result['status'] = 'created'
+            else:
+                result['status'] = 'unchanged'
+
+        # Les mutations écrasées par une mutation ultérieure de la même case
+        for result in results:
+            result.setdefault('status', 'superseded')
+
+        if to_delete:
+            Parcelle.query.filter(Parcelle.id.in_(to_delete)).delete(synchronize_session=False)
+        if to_update:
+            db.session.execute(db.update(Parcelle), to_update)
+        if to_insert:
+            db.session.execute(db.insert(Parcelle), to_insert)
+
+        # Un événement par parcelle : [ligne, colonne, libellé] ('' = case vidée)
+        changed_cells = {}
+        for (parcelle_id, row, col), (reference, result) in final.items():
+            if result['status'] != 'unchanged':
+                changed_cells.setdefault(parcelle_id, []).append([row, col, catalog.label(reference)])
+        for parcelle_id, cells_data in changed_cells.items():
+            publish_event('cells', {'parcelle_id': parcelle_id, 'cells': cells_data})
+        db.session.commit()
+
+        return jsonify({
+            "message": "Parcelles mises à jour avec succès",
+            "created": len(to_insert),
+            "updated": len(to_update),
+            "deleted": len(to_delete),
+            "results": results
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de la mise à jour groupée des parcelles : {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 # Route pour créer une parcelle
-@app.route('/parcelles/create', methods=['POST'])
+@bp.route('/parcelles/create', methods=['POST'])
 def create_parcelle():
     data = request.get_json()
     
     if not data.get('nom'):
         return jsonify({"error": "Le nom est requis"}), 400
         
-    rows = max(1, min(data.get('rows', 1), 20))
-    cols = max(1, min(data.get('cols', 1), 20))
+    max_size = current_app.config['PARCELLE_MAX_SIZE']
+    rows = max(1, min(data.get('rows', 1), max_size))
+    cols = max(1, min(data.get('cols', 1), max_size))
     
     new_parcelle_config = ParcelleConfig(
         nom=data['nom'],
         rows=rows,
         cols=cols
     )
-    db.session.add(new_parcelle_config)
-    db.session.commit()
+
+    # Placer la parcelle à la position demandée, sinon au premier emplacement libre
+    with spatial_index(write=True) as index:
+        if 'x' in data or 'y' in data:
+            x, y = data.get('x', 0), data.get('y', 0)
+            error = check_placement(index, None, x, y, rows, cols)
+            if error:
+                return error
+            slot = (x, y)
+        else:
+            slot = index.find_free_slot(rows, cols, *get_potager_dimensions())
+
+        db.session.add(new_parcelle_config)
+        db.session.flush()
+        result = new_parcelle_config.to_dict()
+        result['position'] = None
+        if slot is not None:
+            x, y = slot
+            db.session.add(ParcellePosition(parcelle_config_id=new_parcelle_config.id, position_x=x, position_y=y))
+            footprint = (new_parcelle_config.id, x, y, rows, cols)
+            stage_spatial_change(lambda index: index.place(*footprint))
+            result['position'] = {'x': x, 'y': y}
+        publish_event('parcelle', {'action': 'created', 'parcelle': result})
+        db.session.commit()
     
-    return jsonify(new_parcelle_config.to_dict())
+    return jsonify(result)
 
-# Route pour récupérer une parcelle
-@app.route('/parcelles/<int:id>', methods=['GET'])
+# Route pour récupérer une parcelle, ou une fenêtre de ses cases :
+#   GET /parcelles/<id>?r0=&c0=&r1=&c1=   lignes [r0, r1), colonnes [c0, c1)
+# La fenêtre est lue par une recherche par intervalle sur ix_parcelle_cell.
+@bp.route('/parcelles/<int:id>', methods=['GET'])
+@conditional('parcelle_config', 'parcelle', 'culture')
 def get_parcelle(id):
+    parcelle_config = ParcelleConfig.query.get_or_404(id)
     try:
-        parcelle_config = ParcelleConfig.query.get_or_404(id)
-        parcelles = Parcelle.query.filter_by(parcelle_config_id=id).all()
-        
-        # Créer une grille vide
-        grid = [''] * (parcelle_config.rows * parcelle_config.cols)
-        
-        # Remplir la grille avec les cultures existantes
-        for p in parcelles:
-            index = p.row * parcelle_config.cols + p.col
-            if 0 <= index < len(grid):
-                # S'assurer que l'emoji est une chaîne UTF-8 valide
-                emoji = p.culture_emoji if p.culture_emoji else ''
-                grid[index] = emoji
-                print(f"Ajout de l'emoji {emoji} (type: {type(emoji)}) à l'index {index}")
+        r0 = max(0, request.args.get('r0', 0, type=int))
+        c0 = max(0, request.args.get('c0', 0, type=int))
+        r1 = min(parcelle_config.rows, request.args.get('r1', parcelle_config.rows, type=int))
+        c1 = min(parcelle_config.cols, request.args.get('c1', parcelle_config.cols, type=int))
+        if r0 >= r1 or c0 >= c1:
+            return jsonify({"error": "Fenêtre vide ou invalide"}), 400
+        encoding = grid_encoding((r1 - r0) * (c1 - c0))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        query = db.session.query(Parcelle.row, Parcelle.col, Parcelle.culture_id, Parcelle.culture_emoji).filter(
+            Parcelle.parcelle_config_id == id
+        )
+        windowed = (r0, c0, r1, c1) != (0, 0, parcelle_config.rows, parcelle_config.cols)
+        if windowed:
+            query = query.filter(
+                Parcelle.row >= r0, Parcelle.row < r1, Parcelle.col >= c0, Parcelle.col < c1
+            )
+        catalog = culture_catalog()
+        cells = [
+            (row, col, catalog.cell_label(culture_id, culture_emoji))
+            for row, col, culture_id, culture_emoji in query
+        ]
+        logger.debug("parcelle_chargee id=%s cases=%d", id, len(cells))
         
         response_data = {
             'id': parcelle_config.id,
             'nom': parcelle_config.nom,
             'rows': parcelle_config.rows,
             'cols': parcelle_config.cols,
-            'grid': grid
         }
+        if windowed:
+            response_data['window'] = {'r0': r0, 'c0': c0, 'r1': r1, 'c1': c1}
+        # Cases relatives à la fenêtre en forme dense, absolues en forme creuse
+        if encoding == 'dense':
+            response_data['grid'] = build_grid(
+                r1 - r0, c1 - c0, [(row - r0, col - c0, emoji) for row, col, emoji in cells]
+            )
+        else:
+            response_data['cells'] = sparse_cells(cells)
         
-        print(f"Grille finale: {grid}")
         return jsonify(response_data)
 
     except Exception as e:
-        print(f"Erreur: {str(e)}")
+        logger.error("Erreur lors du chargement de la parcelle %s : %s", id, e)
         return jsonify({"error": str(e)}), 500
 
 # Modifier la route pour mettre à jour la position d'une parcelle
-@app.route('/parcelles/position', methods=['POST'])
+@bp.route('/parcelles/position', methods=['POST'])
 def update_parcelle_position():
     try:
         data = request.get_json()
@@ -291,80 +1522,233 @@ def update_parcelle_position():
         if not parcelle:
             return jsonify({"error": "Parcelle non trouvée"}), 404
 
-        # Mettre à jour ou créer la position
-        position = ParcellePosition.query.filter_by(parcelle_config_id=parcelle_id).first()
-        if position:
-            position.position_x = x
-            position.position_y = y
-        else:
-            position = ParcellePosition(
-                parcelle_config_id=parcelle_id,
-                position_x=x,
-                position_y=y
-            )
-            db.session.add(position)
+        with spatial_index(write=True) as index:
+            error = check_placement(index, parcelle.id, x, y, parcelle.rows, parcelle.cols)
+            if error:
+                return error
 
-        db.session.commit()
+            # Mettre à jour ou créer la position
+            position = ParcellePosition.query.filter_by(parcelle_config_id=parcelle_id).first()
+            if position:
+                position.position_x = x
+                position.position_y = y
+            else:
+                position = ParcellePosition(
+                    parcelle_config_id=parcelle_id,
+                    position_x=x,
+                    position_y=y
+                )
+                db.session.add(position)
+
+            footprint = (parcelle.id, x, y, parcelle.rows, parcelle.cols)
+            stage_spatial_change(lambda index: index.place(*footprint))
+            publish_event('position', {'parcelle_id': parcelle.id, 'x': x, 'y': y})
+            db.session.commit()
         return jsonify({"message": "Position mise à jour avec succès"}), 200
 
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/parcelles/positions', methods=['GET'])
+@bp.route('/parcelles/positions', methods=['GET'])
+@conditional('parcelle_position')
 def get_parcelle_positions():
-    positions = ParcellePosition.query.all()
-    return jsonify([pos.to_dict() for pos in positions])
+    return jsonify(column_dicts(db.select(*ParcellePosition.__table__.columns)))
+
+# Construire une grille à plat à partir des cellules (row, col, libellé) d'une parcelle
+def build_grid(rows, cols, cells):
+    grid = [''] * (rows * cols)
+    for row, col, emoji in cells:
+        index = row * cols + col
+        if 0 <= index < len(grid):
+            grid[index] = emoji if emoji else ''
+    return grid
+
+# Forme des grilles renvoyées : 'dense' (liste à plat de rows * cols cases,
+# ancien format) ou 'sparse' (seulement les cases plantées, [ligne, colonne, emoji]).
+# Par défaut, dense pour les petites grilles et creuse au-delà de DENSE_GRID_MAX_CELLS.
+def grid_encoding(size):
+    requested = request.args.get('grid')
+    if requested is None:
+        return 'dense' if size <= current_app.config['DENSE_GRID_MAX_CELLS'] else 'sparse'
+    if requested not in ('dense', 'sparse'):
+        raise ValueError("grid doit valoir 'dense' ou 'sparse'")
+    return requested
+
+def sparse_cells(cells):
+    return sorted([row, col, emoji] for row, col, emoji in cells if emoji)
+
+# Route pour récupérer tout le potager en une seule requête
+# (configurations, grilles, positions et taille du potager)
+@bp.route('/garden', methods=['GET'])
+@conditional('parcelle_config', 'parcelle', 'parcelle_position', 'potager_config', 'culture')
+def get_garden():
+    try:
+        # Nombre fixe de requêtes, quel que soit le nombre de parcelles
+        configs = ParcelleConfig.query.order_by(ParcelleConfig.id).all()
+        cells = db.session.query(
+            Parcelle.parcelle_config_id,
+            Parcelle.row,
+            Parcelle.col,
+            Parcelle.culture_id,
+            Parcelle.culture_emoji
+        ).all()
+        positions = ParcellePosition.query.all()
+        potager_config = PotagerConfig.query.first()
+
+        # Regrouper les cellules par parcelle en un seul passage
+        labels = culture_catalog().labels
+        cells_by_parcelle = {}
+        for parcelle_config_id, row, col, culture_id, culture_emoji in cells:
+            label = labels.get(culture_id, '') if culture_id is not None else culture_emoji
+            cells_by_parcelle.setdefault(parcelle_config_id, []).append((row, col, label))
+
+        positions_by_parcelle = {pos.parcelle_config_id: pos.to_dict() for pos in positions}
+
+        parcelles = []
+        for config in configs:
+            parcelle_data = config.to_dict()
+            parcelle_cells = cells_by_parcelle.get(config.id, [])
+            if grid_encoding(config.rows * config.cols) == 'dense':
+                parcelle_data['grid'] = build_grid(config.rows, config.cols, parcelle_cells)
+            else:
+                parcelle_data['cells'] = sparse_cells(parcelle_cells)
+            parcelle_data['position'] = positions_by_parcelle.get(config.id)
+            parcelles.append(parcelle_data)
+
+        return jsonify({
+            'potager': potager_size_dict(potager_config.to_dict() if potager_config else {'rows': 10, 'cols': 10}),
+            'parcelles': parcelles
+        })
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur lors du chargement du potager : {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Capturer l'état du potager depuis la base en une seule requête
+# (configurations, positions et cases occupées), sans construire de grille dense
+def capture_garden_state(parcelle_ids=None):
+    query = db.session.query(
+        ParcelleConfig.id, ParcelleConfig.nom, ParcelleConfig.rows, ParcelleConfig.cols,
+        ParcellePosition.position_x, ParcellePosition.position_y,
+        Parcelle.row, Parcelle.col, Parcelle.culture_id, Parcelle.culture_emoji
+    ).outerjoin(
+        ParcellePosition, ParcellePosition.parcelle_config_id == ParcelleConfig.id
+    ).outerjoin(
+        Parcelle, Parcelle.parcelle_config_id == ParcelleConfig.id
+    ).order_by(ParcelleConfig.id)
+    if parcelle_ids is not None:
+        query = query.filter(ParcelleConfig.id.in_(parcelle_ids))
+
+    parcelles, positions, parcelle_cultures = [], {}, {}
+    for config_id, nom, rows, cols, x, y, row, col, culture_id, culture_emoji in query:
+        key = str(config_id)
+        if key not in parcelle_cultures:
+            parcelles.append({'id': config_id, 'nom': nom, 'rows': rows, 'cols': cols})
+            parcelle_cultures[key] = (rows * cols, {})
+            if x is not None:
+                positions[key] = {'row': y, 'col': x}
+        reference = cell_reference(culture_id, culture_emoji)
+        if reference is not None and 0 <= row < rows and 0 <= col < cols:
+            parcelle_cultures[key][1][row * cols + col] = reference
+
+    return {
+        'parcelles': parcelles,
+        'parcelle_positions': positions,
+        'parcelle_cultures': parcelle_cultures
+    }
 
 # Route pour créer une version
-@app.route('/versions', methods=['POST'])
+# Le contenu est toujours lu côté serveur ; avec "whole_garden": true (ou sans
+# liste de parcelles), tout le potager est capturé, positions comprises.
+@bp.route('/versions', methods=['POST'])
 def create_version():
-    data = request.get_json()
-    
-    # Mettre à jour toutes les versions existantes comme non courantes
-    Version.query.update({Version.is_current: False})
-    
-    # Récupérer le contenu actuel des parcelles
-    parcelle_cultures = {}
-    for parcelle in data['parcelles']:
-        parcelle_id = parcelle['id']
-        # Récupérer toutes les cultures de cette parcelle
-        cultures = Parcelle.query.filter_by(parcelle_config_id=parcelle_id).all()
-        grid = [''] * (parcelle['rows'] * parcelle['cols'])
-        for culture in cultures:
-            index = culture.row * parcelle['cols'] + culture.col
-            if 0 <= index < len(grid):
-                grid[index] = culture.culture_emoji
-        parcelle_cultures[str(parcelle_id)] = grid
-    
-    new_version = Version(
-        name=data.get('name'),
-        parcelles=data['parcelles'],
-        parcelle_positions=data['parcellePositions'],
-        parcelle_cultures=parcelle_cultures,  # Utiliser les cultures récupérées
-        is_current=True
-    )
-    db.session.add(new_version)
-    db.session.commit()
-    return jsonify(new_version.to_dict()), 201
+    data = request.get_json() or {}
+
+    if data.get('whole_garden') or 'parcelles' not in data:
+        state = capture_garden_state()
+    else:
+        state = capture_garden_state([parcelle['id'] for parcelle in data['parcelles']])
+        if data.get('parcellePositions') is not None:
+            state['parcelle_positions'] = data['parcellePositions']
+
+    new_version = save_version(data.get('name'), state, pinned=bool(data.get('pinned')))
+    try:
+        encoding = grid_encoding(largest_grid(state))
+    except ValueError:
+        encoding = 'sparse'
+    return jsonify(new_version.to_dict(state, encoding)), 201
+
+# Curseur opaque de pagination des versions
+def encode_version_cursor(created_at, version_id):
+    raw = f"{created_at.isoformat()}|{version_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
 
-# Route pour récupérer toutes les versions
-@app.route('/versions', methods=['GET'])
+# Lève ValueError si le curseur est mal formé
+def decode_version_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    created_at, version_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(created_at), int(version_id)
+
+# Liste paginée par curseur (created_at, id), sans le contenu des versions :
+# le détail complet reste disponible via /versions/<id>
+@bp.route('/versions', methods=['GET'])
+@conditional('version', 'current_version')
 def get_versions():
-    versions = Version.query.order_by(Version.created_at.desc()).all()
-    return jsonify([version.to_dict() for version in versions])
+    try:
+        limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+        current_id = current_version_id()
+        query = db.select(Version.id, Version.name, Version.created_at, Version.pinned).order_by(
+            Version.created_at.desc(), Version.id.desc()
+        )
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                created_at, version_id = decode_version_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Curseur invalide"}), 400
+            query = query.where(db.or_(
+                Version.created_at < created_at,
+                db.and_(Version.created_at == created_at, Version.id < version_id)
+            ))
+
+        # Mêmes champs que Version.to_summary_dict(), sans objets ORM
+        versions = column_dicts(query.limit(limit + 1))
+        for version in versions:
+            version['is_current'] = version['id'] == current_id
+        next_cursor = None
+        if len(versions) > limit:
+            versions = versions[:limit]
+            next_cursor = encode_version_cursor(versions[-1]['created_at'], versions[-1]['id'])
+
+        return jsonify({
+            'versions': versions,
+            'next_cursor': next_cursor
+        })
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la liste des versions : {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Taille du potager avec la limite acceptée par POST /potager/size, pour
+# que l'interface borne ses champs sur la même valeur
+def potager_size_dict(size):
+    return {**size, 'max_size': current_app.config['POTAGER_MAX_SIZE']}
 
 # Ajouter ces nouvelles routes avant la fonction init_default_data()
-@app.route('/potager/size', methods=['GET'])
+@bp.route('/potager/size', methods=['GET'])
 def get_potager_size():
     config = PotagerConfig.query.first()
     if not config:
         config = PotagerConfig()  # Utilise les valeurs par défaut
         db.session.add(config)
         db.session.commit()
-    return jsonify(config.to_dict())
+    return jsonify(potager_size_dict(config.to_dict()))
 
-@app.route('/potager/size', methods=['POST'])
+@bp.route('/potager/size', methods=['POST'])
 def update_potager_size():
     data = request.get_json()
     config = PotagerConfig.query.first()
@@ -373,65 +1757,87 @@ def update_potager_size():
         config = PotagerConfig()
         db.session.add(config)
     
-    config.rows = max(1, min(data.get('rows', 10), 20))  # Limite entre 1 et 20
-    config.cols = max(1, min(data.get('cols', 10), 20))  # Limite entre 1 et 20
-    
-    db.session.commit()
-    return jsonify(config.to_dict())
+    max_size = current_app.config['POTAGER_MAX_SIZE']
+    rows = max(1, min(data.get('rows', 10), max_size))
+    cols = max(1, min(data.get('cols', 10), max_size))
+
+    # Refuser une taille qui laisserait des parcelles hors du potager ; les
+    # verrous sont gardés jusqu'au commit, comme pour les placements, pour
+    # qu'une parcelle ne soit pas placée entre la vérification et la validation
+    with spatial_index(write=True) as index:
+        outside = index.outside(rows, cols)
+        if outside:
+            db.session.rollback()
+            return jsonify({"error": "Des parcelles dépasseraient du potager", "conflicts": outside}), 409
+
+        config.rows = rows
+        config.cols = cols
+        publish_event('potager', {'rows': config.rows, 'cols': config.cols})
+        db.session.commit()
+    return jsonify(potager_size_dict(config.to_dict()))
+
+# Premier emplacement libre pour une parcelle de rows x cols
+@bp.route('/potager/free-slot', methods=['GET'])
+def get_free_slot():
+    rows = request.args.get('rows', type=int)
+    cols = request.args.get('cols', type=int)
+    if not rows or not cols or rows < 1 or cols < 1:
+        return jsonify({"error": "rows et cols (entiers positifs) sont requis"}), 400
+    with spatial_index() as index:
+        slot = index.find_free_slot(rows, cols, *get_potager_dimensions())
+    if slot is None:
+        return jsonify({"error": "Aucun emplacement libre"}), 404
+    return jsonify({'x': slot[0], 'y': slot[1]})
 
 # Modifier la fonction init_default_data pour inclure la configuration du potager
 def init_default_data():
-    print("Démarrage de l'initialisation des données...")
+    logger.info("Démarrage de l'initialisation des données...")
     
     # Configuration par défaut du potager
     default_config = PotagerConfig.query.first()
     if not default_config:
-        print("Création de la configuration par défaut du potager...")
+        logger.info("Création de la configuration par défaut du potager...")
         default_config = PotagerConfig(rows=10, cols=10)
         db.session.add(default_config)
         db.session.commit()
-        print("Configuration du potager créée.")
+        logger.info("Configuration du potager créée.")
     
-    # Forcer la suppression de l'allée existante si elle existe
+    # Créer l'allée, ou la remettre à ses valeurs par défaut. Elle est mise à
+    # jour sur place : les cases qui la désignent gardent son identifiant.
+    logger.info("Création de l'allée...")
     try:
-        Culture.query.filter_by(nom="Allée").delete()
-        db.session.commit()
-        print("Ancienne allée supprimée.")
-    except Exception as e:
-        print(f"Erreur lors de la suppression de l'ancienne allée: {str(e)}")
-        db.session.rollback()
-
-    # Créer une nouvelle allée
-    print("Création de l'allée...")
-    try:
-        allee_culture = Culture(
-            nom="Allée",
-            date_semis=datetime.strptime("1970-01-01", "%Y-%m-%d"),
-            type_culture="pleine terre",
-            date_recolte=datetime.strptime("2100-01-01", "%Y-%m-%d"),
-            commentaire="Allée de passage",
-            couleur="#8B4513",
-            emoji="⬛"
-        )
-        db.session.add(allee_culture)
+        allee = {
+            'date_semis': date(1970, 1, 1),
+            'type_culture': "pleine terre",
+            'date_recolte': date(2100, 1, 1),
+            'commentaire': "Allée de passage",
+            'couleur': "#8B4513",
+            'emoji': "⬛"
+        }
+        allee_culture = Culture.query.filter_by(nom="Allée").order_by(Culture.id).first()
+        if allee_culture is None:
+            db.session.add(Culture(nom="Allée", **allee))
+        else:
+            for field, value in allee.items():
+                setattr(allee_culture, field, value)
         db.session.commit()
-        print("Allée créée avec succès!")
+        logger.info("Allée créée avec succès!")
         
         # Vérification immédiate
         verification = Culture.query.filter_by(nom="Allée").first()
         if verification:
-            print(f"Vérification: Allée trouvée avec l'ID {verification.id}")
+            logger.info("Vérification: Allée trouvée avec l'ID %s", verification.id)
         else:
-            print("Erreur: L'allée n'a pas été créée correctement")
+            logger.error("Erreur: L'allée n'a pas été créée correctement")
             
     except Exception as e:
-        print(f"Erreur lors de la création de l'allée: {str(e)}")
+        logger.error("Erreur lors de la création de l'allée: %s", e)
         db.session.rollback()
 
-    print("Configuration initiale terminée!")
+    logger.info("Configuration initiale terminée!")
 
 # Ajouter cette nouvelle route après les autres routes de parcelles
-@app.route('/parcelles/<int:id>', methods=['DELETE'])
+@bp.route('/parcelles/<int:id>', methods=['DELETE'])
 def delete_parcelle(id):
     try:
         # Supprimer d'abord toutes les positions associées
@@ -443,6 +1849,8 @@ def delete_parcelle(id):
         # Supprimer la configuration de la parcelle
         parcelle = ParcelleConfig.query.get_or_404(id)
         db.session.delete(parcelle)
+        stage_spatial_change(lambda index: index.remove(id))
+        publish_event('parcelle', {'action': 'deleted', 'id': id})
         db.session.commit()
         
         return jsonify({"message": "Parcelle supprimée avec succès"}), 200
@@ -450,42 +1858,35 @@ def delete_parcelle(id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+# Classement des cultures par nombre de cases plantées
+def compute_popular_cultures():
+    # Cases plantées de chaque culture (base du potager), lues sur l'index des cultures
+    counts = dict(db.session.query(
+        Parcelle.culture_id,
+        db.func.count()
+    ).filter(Parcelle.culture_id.isnot(None)).group_by(Parcelle.culture_id))
+
+    # Le catalogue peut être dans une autre base : association en mémoire,
+    # triée par popularité puis par nom
+    cultures = column_dicts(db.select(*Culture.dict_columns()))
+    for culture in cultures:
+        culture['usage_count'] = counts.get(culture['id'], 0)
+    cultures.sort(key=lambda culture: (-culture['usage_count'], culture['nom']))
+    return cultures
+
 # Ajouter cette nouvelle route après les autres routes
-@app.route('/cultures/popular', methods=['GET'])
+@bp.route('/cultures/popular', methods=['GET'])
+@conditional('culture', 'parcelle')
 def get_popular_cultures():
     try:
-        # Sous-requête pour compter les occurrences de chaque emoji dans les parcelles
-        culture_counts = db.session.query(
-            Parcelle.culture_emoji,
-            db.func.count(Parcelle.culture_emoji).label('count')
-        ).group_by(Parcelle.culture_emoji).subquery()
-
-        # Joindre avec la table Culture et trier par popularité
-        popular_cultures = db.session.query(
-            Culture,
-            db.func.coalesce(culture_counts.c.count, 0).label('usage_count')
-        ).outerjoin(
-            culture_counts,
-            Culture.emoji == culture_counts.c.culture_emoji
-        ).order_by(
-            db.desc('usage_count'),
-            Culture.nom
-        ).all()
-
-        # Formater les résultats
-        result = [{
-            **culture.to_dict(),
-            'usage_count': count
-        } for culture, count in popular_cultures]
-
-        return jsonify(result)
+        return cached_json_response('cultures/popular', {'culture', 'parcelle'}, compute_popular_cultures)
 
     except Exception as e:
-        print(f"Erreur: {str(e)}")
+        logger.error("Erreur lors du classement des cultures : %s", e)
         return jsonify({"error": str(e)}), 500
 
 # Ajouter cette nouvelle route après la route GET /cultures
-@app.route('/cultures/<int:id>', methods=['PUT'])
+@bp.route('/cultures/<int:id>', methods=['PUT'])
 def update_culture(id):
     try:
         culture = Culture.query.get_or_404(id)
@@ -494,15 +1895,17 @@ def update_culture(id):
         temp_emoji = '❄️' if data['type_culture'] == 'pleine terre' else '🌡️'
         
         culture.nom = data['nom']
-        culture.date_semis = data['date_semis']
+        culture.date_semis = parse_date(data['date_semis'])
         culture.type_culture = data['type_culture']
-        culture.date_repiquage = data.get('date_repiquage')
-        culture.date_recolte = data.get('date_recolte')
+        culture.date_repiquage = parse_date(data.get('date_repiquage'))
+        culture.date_recolte = parse_date(data.get('date_recolte'))
         culture.commentaire = data.get('commentaire')
         culture.emoji = data.get('emoji')
         culture.couleur = data.get('couleur')
+        culture.famille = data.get('famille')
         culture.temp_emoji = temp_emoji
         
+        publish_event('culture', {'action': 'updated', 'culture': culture.to_dict()})
         db.session.commit()
         return jsonify({"message": "Culture mise à jour avec succès!", "culture": culture.to_dict()}), 200
         
@@ -511,7 +1914,7 @@ def update_culture(id):
         return jsonify({"error": str(e)}), 500
 
 # Ajouter également une route pour récupérer une culture spécifique
-@app.route('/cultures/<int:id>', methods=['GET'])
+@bp.route('/cultures/<int:id>', methods=['GET'])
 def get_culture(id):
     try:
         culture = Culture.query.get_or_404(id)
@@ -522,68 +1925,550 @@ def get_culture(id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Découper [debut, fin] en périodes hebdomadaires (lundi-dimanche) ou mensuelles
+def calendar_buckets(debut, fin, group):
+    buckets = []
+    if group == 'week':
+        start = debut - timedelta(days=debut.weekday())
+        while start <= fin:
+            end = start + timedelta(days=6)
+            year, week, _ = start.isocalendar()
+            buckets.append((f"{year}-W{week:02d}", start, end))
+            start = end + timedelta(days=1)
+    else:
+        start = debut.replace(day=1)
+        while start <= fin:
+            following = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+            buckets.append((start.strftime('%Y-%m'), start, following - timedelta(days=1)))
+            start = following
+    return buckets
+
+# Nombre maximum de périodes renvoyées par /calendar
+CALENDAR_MAX_BUCKETS = 1000
+
+# Route du calendrier : cultures dont la période [semis, récolte] chevauche [from, to]
+# Paramètres : from, to (AAAA-MM-JJ, année en cours par défaut), type_culture,
+# group=week|month pour des agrégats par période au lieu de la liste des cultures
+@bp.route('/calendar', methods=['GET'])
+@conditional('culture')
+def get_calendar():
+    try:
+        today = date.today()
+        debut = parse_date(request.args.get('from')) or date(today.year, 1, 1)
+        fin = parse_date(request.args.get('to')) or date(today.year, 12, 31)
+    except ValueError:
+        return jsonify({"error": "Dates invalides (format AAAA-MM-JJ attendu)"}), 400
+    if debut > fin:
+        return jsonify({"error": "'from' doit précéder 'to'"}), 400
+
+    group = request.args.get('group')
+    if group not in (None, 'week', 'month'):
+        return jsonify({"error": "group doit valoir 'week' ou 'month'"}), 400
+
+    try:
+        query = Culture.query.filter(Culture.date_semis <= fin, Culture.date_fin() >= debut)
+        type_culture = request.args.get('type_culture')
+        if type_culture:
+            query = query.filter(Culture.type_culture == type_culture)
+
+        response = {'from': debut.isoformat(), 'to': fin.isoformat()}
+        if group is None:
+            response['cultures'] = column_dicts(
+                query.with_entities(*Culture.dict_columns()).order_by(Culture.date_semis, Culture.nom).statement
+            )
+            return jsonify(response)
+
+        buckets = calendar_buckets(debut, fin, group)
+        if len(buckets) > CALENDAR_MAX_BUCKETS:
+            return jsonify({"error": f"Trop de périodes ({CALENDAR_MAX_BUCKETS} maximum)"}), 400
+
+        starts = [start for _, start, _ in buckets]
+        counts = [{'semis': 0, 'repiquage': 0, 'recolte': 0, 'en_cours': 0} for _ in buckets]
+        rows = query.with_entities(Culture.date_semis, Culture.date_repiquage, Culture.date_recolte).all()
+        for semis, repiquage, recolte in rows:
+            for event_name, event_date in (('semis', semis), ('repiquage', repiquage), ('recolte', recolte)):
+                if event_date and debut <= event_date <= fin:
+                    counts[bisect_right(starts, event_date) - 1][event_name] += 1
+            first = max(0, bisect_right(starts, semis) - 1)
+            last = bisect_right(starts, recolte or repiquage or semis) - 1
+            for index in range(first, last + 1):
+                counts[index]['en_cours'] += 1
+
+        response['group'] = group
+        response['buckets'] = [
+            {'key': key, 'start': start.isoformat(), 'end': end.isoformat(), **bucket_counts}
+            for (key, start, end), bucket_counts in zip(buckets, counts)
+        ]
+        return jsonify(response)
+
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul du calendrier : {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Nombre maximum de semaines prévues par /forecast
+FORECAST_MAX_WEEKS = 520
+
+# Prévisions du potager : cases plantées regroupées par culture (culture_id, par
+# l'index ix_parcelle_culture) en une requête, puis histogrammes hebdomadaires
+# calculés en Python pur par forecast.py
+def compute_forecast(start, weeks, parcelle_id=None):
+    query = db.session.query(Parcelle.culture_id, Parcelle.culture_emoji, db.func.count()).filter(
+        db.or_(Parcelle.culture_id.isnot(None), Parcelle.culture_emoji.isnot(None))
+    )
+    if parcelle_id is not None:
+        query = query.filter(Parcelle.parcelle_config_id == parcelle_id)
+
+    catalog = culture_catalog()
+    by_culture, planted, unresolved = {}, 0, 0
+    for culture_id, culture_emoji, count in query.group_by(Parcelle.culture_id, Parcelle.culture_emoji):
+        planted += count
+        culture = catalog.culture(culture_id)
+        if culture is None:
+            unresolved += count
+            continue
+        group = by_culture.setdefault(culture.id, [0, culture.date_semis, culture.date_repiquage, culture.date_recolte])
+        group[0] += count
+
+    histograms = weekly_forecast(list(by_culture.values()), start, weeks)
+    return {
+        'from': start.isoformat(),
+        'to': (start + timedelta(days=weeks * 7 - 1)).isoformat(),
+        'cells': planted,
+        'unresolved_cells': unresolved,
+        'weeks': [
+            {
+                'start': (start + timedelta(days=7 * week)).isoformat(),
+                'end': (start + timedelta(days=7 * week + 6)).isoformat(),
+                **{name: values[week] for name, values in histograms.items()}
+            }
+            for week in range(weeks)
+        ]
+    }
+
+# Cases semées, repiquées et récoltées par semaine et cases occupées, sur tout
+# le potager ou une parcelle. Paramètres : from (AAAA-MM-JJ, lundi de la semaine
+# en cours par défaut), weeks (26 par défaut), parcelle_id.
+# Le résultat est mis en cache jusqu'à la prochaine modification des cases ou des cultures.
+@bp.route('/forecast', methods=['GET'])
+@conditional('parcelle', 'culture')
+def get_forecast():
+    try:
+        start = parse_date(request.args.get('from'))
+    except ValueError:
+        return jsonify({"error": "Date invalide (format AAAA-MM-JJ attendu)"}), 400
+    if start is None:
+        today = date.today()
+        start = today - timedelta(days=today.weekday())
+    weeks = request.args.get('weeks', 26, type=int)
+    if not 1 <= weeks <= FORECAST_MAX_WEEKS:
+        return jsonify({"error": f"weeks doit être compris entre 1 et {FORECAST_MAX_WEEKS}"}), 400
+    parcelle_id = request.args.get('parcelle_id', type=int)
+
+    return cached_json_response(
+        ('forecast', start.isoformat(), weeks, parcelle_id), {'parcelle', 'culture'},
+        lambda: compute_forecast(start, weeks, parcelle_id)
+    )
+
 # Modifions la route pour récupérer une version spécifique
-@app.route('/versions/<int:id>', methods=['GET'])
+@bp.route('/versions/<int:id>', methods=['GET'])
+@conditional('version', 'current_version', 'culture')
 def get_version(id):
     version = Version.query.get_or_404(id)
+    state = load_version_state(version)
+    try:
+        encoding = grid_encoding(largest_grid(state))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response_data = version.to_dict(state, encoding)
     
     # Récupérer toutes les parcelles associées à cette version
     parcelles_data = []
-    for parcelle in version.parcelles:
+    for parcelle in state['parcelles']:
         parcelle_dict = parcelle.copy()  # Copie du dictionnaire de la parcelle
         # Ajouter les cultures associées à cette parcelle
-        if str(parcelle['id']) in version.parcelle_cultures:
-            parcelle_dict['cultures'] = version.parcelle_cultures[str(parcelle['id'])]
+        if str(parcelle['id']) in state['parcelle_cultures']:
+            parcelle_dict['cultures'] = response_data['parcelle_cultures'][str(parcelle['id'])]
         parcelles_data.append(parcelle_dict)
 
-    response_data = version.to_dict()
     response_data['parcelles'] = parcelles_data
     
     return jsonify(response_data)
 
-# Ajouter cette nouvelle route pour l'import des cultures
-@app.route('/cultures/import', methods=['POST'])
-def import_cultures():
+def format_parcelle_diff(parcelle_id, entry, catalog):
+    result = {'id': int(parcelle_id) if parcelle_id.isdigit() else parcelle_id, 'status': entry['status']}
+    for key in ('before', 'after', 'position'):
+        if key in entry:
+            result[key] = entry[key]
+    result['cells'] = [
+        {'row': row, 'col': col, 'before': catalog.label(before), 'after': catalog.label(after)}
+        for row, col, before, after in entry.get('cells', [])
+    ]
+    return result
+
+# Différences entre deux versions calculées côté serveur : seules les parcelles
+# et les cases modifiées sont renvoyées
+@bp.route('/versions/<int:a>/diff/<int:b>', methods=['GET'])
+@conditional('version', 'culture')
+def diff_versions(a, b):
+    versions = Version.query.filter(Version.id.in_({a, b})).all()
+    if {version.id for version in versions} != {a, b}:
+        return jsonify({"error": "Version non trouvée"}), 404
+
+    states = load_version_states(versions)
+    changes = diff_states(states[a], states[b])
+    catalog = culture_catalog()
+    parcelles = [format_parcelle_diff(parcelle_id, entry, catalog) for parcelle_id, entry in changes.items()]
+    return jsonify({
+        'from': a,
+        'to': b,
+        'parcelles': parcelles,
+        'changed_cells': sum(len(parcelle['cells']) for parcelle in parcelles)
+    })
+
+# Appliquer un état enregistré aux tables du potager en écritures groupées,
+# limitées à ce qui diffère de l'état actuel. Seules les parcelles présentes
+# dans la version sont lues et modifiées : comme pour l'historique des cases,
+# une version partielle laisse les autres parcelles telles quelles.
+# Ne valide pas la transaction.
+def apply_garden_state(state):
+    targets = {str(parcelle['id']): parcelle for parcelle in state['parcelles'] if isinstance(parcelle, dict)}
+    present = {
+        int(parcelle_id) for parcelle_id in {*targets, *state['parcelle_cultures']}
+        if str(parcelle_id).isdigit()
+    }
+    changes = diff_states(capture_garden_state(present), state)
+    counts = dict.fromkeys(
+        ('parcelles_added', 'parcelles_updated',
+         'cells_written', 'cells_deleted', 'positions_written', 'positions_deleted'), 0)
+
+    added, resized, updated = [], set(), []
+    for parcelle_id, entry in changes.items():
+        if not parcelle_id.isdigit():
+            continue
+        target = targets.get(parcelle_id)
+        if entry['status'] == 'added' and target is not None:
+            added.append(int(parcelle_id))
+        elif target is not None and 'after' in entry:
+            before = entry['before'] or {}
+            values = {
+                key: target[key] for key in ('nom', 'rows', 'cols')
+                if key in target and before.get(key) != target[key]
+            }
+            if values:
+                updated.append({'id': int(parcelle_id), **values})
+            if 'rows' in values or 'cols' in values:
+                resized.add(int(parcelle_id))
+
+    if added:
+        db.session.execute(db.insert(ParcelleConfig), [
+            {'id': parcelle_id, 'nom': targets[str(parcelle_id)]['nom'],
+             'rows': targets[str(parcelle_id)]['rows'], 'cols': targets[str(parcelle_id)]['cols']}
+            for parcelle_id in added
+        ])
+        counts['parcelles_added'] = len(added)
+    if updated:
+        db.session.execute(db.update(ParcelleConfig), updated)
+        counts['parcelles_updated'] = len(updated)
+
+    # Une parcelle redimensionnée est réécrite entièrement (les cases hors de
+    # l'ancienne grille ne sont pas visibles dans l'état actuel)
+    if resized:
+        db.session.execute(db.delete(Parcelle).where(Parcelle.parcelle_config_id.in_(resized)))
+
+    cell_changes = {
+        int(parcelle_id): entry['cells'] for parcelle_id, entry in changes.items()
+        if entry.get('cells') and parcelle_id.isdigit() and int(parcelle_id) not in resized
+    }
+    existing = {}
+    if cell_changes:
+        existing = {
+            (parcelle_id, row, col): cell_id
+            for cell_id, parcelle_id, row, col in db.session.query(
+                Parcelle.id, Parcelle.parcelle_config_id, Parcelle.row, Parcelle.col
+            ).filter(Parcelle.parcelle_config_id.in_(cell_changes.keys()))
+        }
+
+    inserts, updates, deletes = [], [], []
+    for parcelle_id in resized:
+        size, cells = state['parcelle_cultures'].get(str(parcelle_id), (0, {}))
+        cols = targets[str(parcelle_id)]['cols']
+        inserts.extend(
+            {'parcelle_config_id': parcelle_id, 'row': index // cols, 'col': index % cols, **cell_columns(reference)}
+            for index, reference in cells.items()
+        )
+    for parcelle_id, cells in cell_changes.items():
+        for row, col, before, after in cells:
+            cell_id = existing.get((parcelle_id, row, col))
+            if not after:
+                if cell_id is not None:
+                    deletes.append(cell_id)
+            elif cell_id is not None:
+                updates.append({'id': cell_id, **cell_columns(after)})
+            else:
+                inserts.append({'parcelle_config_id': parcelle_id, 'row': row, 'col': col, **cell_columns(after)})
+
+    if deletes:
+        db.session.execute(db.delete(Parcelle).where(Parcelle.id.in_(deletes)))
+    if updates:
+        db.session.execute(db.update(Parcelle), updates)
+    if inserts:
+        db.session.execute(db.insert(Parcelle), inserts)
+    counts['cells_written'] = len(inserts) + len(updates)
+    counts['cells_deleted'] = len(deletes)
+
+    # Positions ({'row': y, 'col': x} dans les versions)
+    moved = {
+        int(parcelle_id): entry['position'][1] for parcelle_id, entry in changes.items()
+        if 'position' in entry and parcelle_id.isdigit()
+    }
+    if moved:
+        position_ids = dict(db.session.query(ParcellePosition.parcelle_config_id, ParcellePosition.id).filter(
+            ParcellePosition.parcelle_config_id.in_(moved.keys())
+        ))
+        position_inserts, position_updates, position_deletes = [], [], []
+        for parcelle_id, position in moved.items():
+            position_id = position_ids.get(parcelle_id)
+            if not isinstance(position, dict):
+                if position_id is not None:
+                    position_deletes.append(position_id)
+                continue
+            values = {'position_x': position.get('col', 0), 'position_y': position.get('row', 0)}
+            if position_id is None:
+                position_inserts.append({'parcelle_config_id': parcelle_id, **values})
+            else:
+                position_updates.append({'id': position_id, **values})
+        if position_deletes:
+            db.session.execute(db.delete(ParcellePosition).where(ParcellePosition.id.in_(position_deletes)))
+        if position_updates:
+            db.session.execute(db.update(ParcellePosition), position_updates)
+        if position_inserts:
+            db.session.execute(db.insert(ParcellePosition), position_inserts)
+        counts['positions_written'] = len(position_inserts) + len(position_updates)
+        counts['positions_deleted'] = len(position_deletes)
+
+    return counts
+
+# Restaurer le potager dans l'état d'une version, en une seule transaction ;
+# la version restaurée devient la version courante
+@bp.route('/versions/<int:id>/restore', methods=['POST'])
+def restore_version(id):
+    version = Version.query.get_or_404(id)
     try:
-        cultures_data = request.get_json()
-        
-        # Supprimer toutes les cultures existantes si nécessaire
-        # Culture.query.delete()
-        
-        for culture_data in cultures_data:
-            # Retirer l'ID pour éviter les conflits
-            if 'id' in culture_data:
-                del culture_data['id']
-                
-            culture = Culture(**culture_data)
-            db.session.add(culture)
-            
+        counts = apply_garden_state(load_version_state(version))
+        set_current_version(id)
+        # Changement d'ensemble : les clients rechargent le potager
+        publish_event('garden', {'action': 'restored', 'version_id': id})
         db.session.commit()
-        return jsonify({"message": "Cultures importées avec succès !"}), 200
-        
+        return jsonify({"message": "Version restaurée avec succès", "id": id, "changes": counts}), 200
     except Exception as e:
         db.session.rollback()
+        logger.error("Erreur lors de la restauration de la version %s : %s", id, e)
         return jsonify({"error": str(e)}), 500
 
+# Épingler une version (ou la désépingler) : une version épinglée n'est jamais
+# supprimée par la rétention. Corps facultatif : {"pinned": false}
+@bp.route('/versions/<int:id>/pin', methods=['POST'])
+def pin_version(id):
+    version = Version.query.get_or_404(id)
+    version.pinned = bool((request.get_json(silent=True) or {}).get('pinned', True))
+    publish_event('version', {'id': id, 'pinned': version.pinned})
+    db.session.commit()
+    return jsonify(version.to_summary_dict())
+
+# Champs importables d'une culture : (longueur maximale, obligatoire)
+CULTURE_IMPORT_FIELDS = {
+    'nom': (50, True),
+    'date_semis': (10, True),
+    'type_culture': (20, True),
+    'date_repiquage': (10, False),
+    'date_recolte': (10, False),
+    'commentaire': (255, False),
+    'couleur': (7, False),
+    'emoji': (10, False),
+    'temp_emoji': (10, False),
+    'famille': (50, False),
+}
+CULTURE_DATE_FIELDS = ('date_semis', 'date_repiquage', 'date_recolte')
+# Champs présents dans les exports mais ignorés à l'import
+CULTURE_IGNORED_FIELDS = {'id', 'usage_count'}
+# Nombre maximum d'erreurs détaillées dans le rapport d'import
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+# Valider une ligne d'import ; renvoie (valeurs, None) ou (None, message d'erreur)
+def validate_culture_row(row):
+    if not isinstance(row, dict):
+        return None, "La ligne doit être un objet"
+
+    unknown = set(row) - set(CULTURE_IMPORT_FIELDS) - CULTURE_IGNORED_FIELDS
+    if unknown:
+        return None, f"Champs inconnus : {', '.join(sorted(unknown))}"
+
+    values = {}
+    for field, (max_length, required) in CULTURE_IMPORT_FIELDS.items():
+        value = row.get(field)
+        if value is None or value == '':
+            if required:
+                return None, f"Champ obligatoire manquant : {field}"
+            values[field] = None
+            continue
+        value = str(value).strip()
+        if len(value) > max_length:
+            return None, f"Champ trop long : {field} ({max_length} caractères maximum)"
+        if field in CULTURE_DATE_FIELDS:
+            try:
+                value = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                return None, f"Date invalide pour {field} : {value} (format AAAA-MM-JJ attendu)"
+        values[field] = value
+
+    values['couleur'] = values['couleur'] or '#ffffff'
+    if values['temp_emoji'] is None:
+        values['temp_emoji'] = '❄️' if values['type_culture'] == 'pleine terre' else '🌡️'
+    return values, None
+
+# Lire le corps de la requête ligne par ligne : NDJSON, CSV, ou tableau JSON (ancien format)
+# Produit des paires (numéro de ligne, données brutes ou exception de lecture)
+def iter_import_rows(import_format):
+    if import_format == 'json':
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            raise ValueError("Un tableau JSON est attendu")
+        yield from enumerate(rows, start=1)
+        return
+
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    if import_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+def detect_import_format():
+    requested = request.args.get('format')
+    if requested:
+        return requested
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/ndjson'):
+        return 'ndjson'
+    if request.mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    return 'json'
+
+# Écrire un lot de cultures valides ; en mode upsert, les cultures de même nom sont mises à jour
+def write_culture_chunk(chunk, upsert):
+    if not upsert:
+        db.session.execute(db.insert(Culture), chunk)
+        db.session.commit()
+        return len(chunk), 0
+    inserted, updated = merge_cultures(chunk)
+    db.session.commit()
+    return inserted, updated
+
+# Ajouter ou mettre à jour (par nom) un lot de cultures, sans valider la transaction
+def merge_cultures(chunk):
+    # Une seule ligne par nom dans le lot (la dernière l'emporte)
+    by_name = {values['nom']: values for values in chunk}
+    existing = {}
+    for culture_id, nom in db.session.query(Culture.id, Culture.nom).filter(
+        Culture.nom.in_(by_name.keys())
+    ).order_by(Culture.id.desc()):
+        existing[nom] = culture_id
+
+    to_update = [{'id': existing[nom], **values} for nom, values in by_name.items() if nom in existing]
+    to_insert = [values for nom, values in by_name.items() if nom not in existing]
+    if to_update:
+        db.session.execute(db.update(Culture), to_update)
+    if to_insert:
+        db.session.execute(db.insert(Culture), to_insert)
+    return len(to_insert), len(to_update)
+
+# Un seul événement par import (les lots déjà validés) : les clients rechargent le catalogue
+def publish_cultures_imported(inserted, updated):
+    if inserted or updated:
+        publish_event('cultures', {'action': 'imported', 'inserted': inserted, 'updated': updated})
+        db.session.commit()
+
+# Route d'import des cultures, en flux et par lots
+# Formats : NDJSON (application/x-ndjson), CSV (text/csv) ou tableau JSON.
+# Paramètres : ?chunk_size=1000, ?mode=insert|upsert (upsert par nom), ?format=
+@bp.route('/cultures/import', methods=['POST'])
+def import_cultures():
+    import_format = detect_import_format()
+    if import_format not in ('json', 'ndjson', 'csv'):
+        return jsonify({"error": f"Format d'import inconnu : {import_format}"}), 400
+    mode = request.args.get('mode', 'insert')
+    if mode not in ('insert', 'upsert'):
+        return jsonify({"error": f"Mode d'import inconnu : {mode}"}), 400
+    chunk_size = max(1, min(request.args.get('chunk_size', 1000, type=int), 10000))
+
+    inserted = updated = error_count = 0
+    errors = []
+    chunk = []
+    try:
+        for line_number, row in iter_import_rows(import_format):
+            if isinstance(row, Exception):
+                values, error = None, f"JSON invalide : {row}"
+            else:
+                values, error = validate_culture_row(row)
+
+            if error:
+                error_count += 1
+                if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                    errors.append({'line': line_number, 'error': error})
+                continue
+
+            chunk.append(values)
+            if len(chunk) >= chunk_size:
+                counts = write_culture_chunk(chunk, mode == 'upsert')
+                inserted, updated = inserted + counts[0], updated + counts[1]
+                chunk = []
+
+        if chunk:
+            counts = write_culture_chunk(chunk, mode == 'upsert')
+            inserted, updated = inserted + counts[0], updated + counts[1]
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de l'import des cultures : {str(e)}")
+        publish_cultures_imported(inserted, updated)
+        return jsonify({
+            "error": str(e),
+            "inserted": inserted,
+            "updated": updated,
+            "error_count": error_count,
+            "errors": errors
+        }), 400 if isinstance(e, (ValueError, UnicodeDecodeError, csv.Error)) else 500
+
+    publish_cultures_imported(inserted, updated)
+    return jsonify({
+        "message": "Cultures importées avec succès !",
+        "inserted": inserted,
+        "updated": updated,
+        "error_count": error_count,
+        "errors": errors
+    }), 200
+
 # Après la route GET /versions/<int:id>
 
-@app.route('/versions/export/<int:id>', methods=['GET'])
+@bp.route('/versions/export/<int:id>', methods=['GET'])
 def export_version(id):
+    version = Version.query.get_or_404(id)
     try:
-        version = Version.query.get_or_404(id)
-        version_data = version.to_dict()
-        
-        # Récupérer les positions des parcelles
-        parcelle_positions = {}
-        positions = ParcellePosition.query.filter(ParcellePosition.parcelle_config_id.in_([p['id'] for p in version.parcelles])).all()
-        for position in positions:
-            parcelle_positions[position.parcelle_config_id] = {
-                'position_x': position.position_x,
-                'position_y': position.position_y
-            }
-        
-        # Inclure les positions dans les données exportées
-        version_data['parcelle_positions'] = parcelle_positions
+        # Les positions enregistrées dans la version sont exportées telles quelles
+        # (même format que celui attendu par /versions/import, grilles denses ou creuses)
+        state = load_version_state(version)
+        try:
+            encoding = grid_encoding(largest_grid(state))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        version_data = version.to_dict(state, encoding)
         
         # Nettoyer les données pour l'export
         if 'created_at' in version_data:
@@ -594,25 +2479,17 @@ def export_version(id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/versions/import', methods=['POST'])
+@bp.route('/versions/import', methods=['POST'])
 def import_version():
     try:
         data = request.get_json()
         
-        # Mettre à jour toutes les versions existantes comme non courantes
-        Version.query.update({Version.is_current: False})
-        
-        # Créer la nouvelle version
-        new_version = Version(
-            name=data.get('name', 'Version importée'),
-            parcelles=data['parcelles'],
-            parcelle_positions=data['parcelle_positions'],
-            parcelle_cultures=data['parcelle_cultures'],
-            is_current=True
+        # Créer la nouvelle version ; les libellés des cases deviennent des références
+        state = state_from_grids(
+            data['parcelles'], data['parcelle_positions'], data['parcelle_cultures']
         )
-        
-        db.session.add(new_version)
-        db.session.commit()
+        state = map_state_cells(state, culture_catalog().reference)
+        new_version = save_version(data.get('name', 'Version importée'), state)
         
         return jsonify({"message": "Version importée avec succès!", "id": new_version.id}), 201
         
@@ -620,10 +2497,1212 @@ def import_version():
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-# Création de la base de données
-if __name__ == "__main__":
-    with app.app_context():
+# Sauvegarde complète en NDJSON : une ligne par objet, précédée d'un en-tête
+#   {"type": "header", "format": 1, ...}
+#   {"type": "potager", "rows", "cols"}
+#   {"type": "culture", ...}                      (Culture.to_dict())
+#   {"type": "parcelle", "id", "nom", "rows", "cols", "position": [x, y] | null,
+#    "cells": [[ligne, colonne, "emoji,id,nom"], ...]}
+#   {"type": "version", "id", "name", "created_at", "is_current", "pinned",
+#    "keyframe_id", "depth", "payload"}           (contenu compressé, en base64)
+# Les versions sont copiées sans être décodées ; les identifiants d'origine
+# sont conservés, les deltas et les versions continuent donc de se référencer.
+# Les cases des versions citent les identifiants des cultures de la sauvegarde :
+# à l'import, elles ne sont réécrites que si ces identifiants changent.
+BACKUP_FORMAT_VERSION = 2
+# Formats de sauvegarde relus par /import (1 : cases et versions en emojis)
+BACKUP_READABLE_FORMATS = (1, 2)
+BACKUP_BATCH_SIZE = 500
+# Taille approximative des morceaux envoyés au client
+BACKUP_CHUNK_SIZE = 64 * 1024
+
+def iter_backup_records():
+    yield {'type': 'header', 'format': BACKUP_FORMAT_VERSION, 'created_at': utcnow().isoformat()}
+
+    potager = PotagerConfig.query.first()
+    if potager:
+        yield {'type': 'potager', 'rows': potager.rows, 'cols': potager.cols}
+
+    for culture in Culture.query.order_by(Culture.id).yield_per(BACKUP_BATCH_SIZE):
+        yield {'type': 'culture', **culture.to_dict()}
+
+    # Une seule requête triée par parcelle ; une parcelle est émise dès que la suivante commence
+    catalog = culture_catalog()
+    rows = db.session.query(
+        ParcelleConfig.id, ParcelleConfig.nom, ParcelleConfig.rows, ParcelleConfig.cols,
+        ParcellePosition.position_x, ParcellePosition.position_y,
+        Parcelle.row, Parcelle.col, Parcelle.culture_id, Parcelle.culture_emoji
+    ).outerjoin(
+        ParcellePosition, ParcellePosition.parcelle_config_id == ParcelleConfig.id
+    ).outerjoin(
+        Parcelle, Parcelle.parcelle_config_id == ParcelleConfig.id
+    ).order_by(ParcelleConfig.id, Parcelle.row, Parcelle.col).yield_per(BACKUP_BATCH_SIZE)
+    record = None
+    for config_id, nom, config_rows, config_cols, x, y, row, col, culture_id, culture_emoji in rows:
+        if record is None or record['id'] != config_id:
+            if record is not None:
+                yield record
+            record = {
+                'type': 'parcelle', 'id': config_id, 'nom': nom, 'rows': config_rows, 'cols': config_cols,
+                'position': [x, y] if x is not None else None, 'cells': []
+            }
+        label = catalog.cell_label(culture_id, culture_emoji)
+        if label:
+            record['cells'].append([row, col, label])
+    if record is not None:
+        yield record
+
+    current_id = current_version_id()
+    versions = db.session.query(
+        Version.id, Version.name, Version.created_at, Version.pinned,
+        Version.keyframe_id, Version.depth, Version.payload
+    ).order_by(Version.id).yield_per(BACKUP_BATCH_SIZE // 5)
+    for version_id, name, created_at, pinned, keyframe_id, depth, payload in versions:
+        yield {
+            'type': 'version', 'id': version_id, 'name': name,
+            'created_at': created_at.isoformat() if created_at else None,
+            'is_current': version_id == current_id, 'pinned': bool(pinned),
+            'keyframe_id': keyframe_id, 'depth': depth,
+            'payload': base64.b64encode(payload).decode('ascii')
+        }
+
+# Sérialiser les enregistrements par morceaux, compressés en gzip si demandé
+def iter_backup_chunks(records, compress):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    size = 0
+    for record in records:
+        line = json_line(record)
+        buffer.append(line)
+        size += len(line)
+        if size >= BACKUP_CHUNK_SIZE:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+# Export complet en flux (transfert par morceaux), en mémoire constante :
+#   GET /export              NDJSON
+#   GET /export?format=gzip  NDJSON compressé
+@bp.route('/export', methods=['GET'])
+def export_garden():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'gzip'):
+        return jsonify({"error": f"Format d'export inconnu : {export_format}"}), 400
+    compress = export_format == 'gzip'
+
+    filename = f"potager-{utcnow():%Y%m%d-%H%M%S}.ndjson" + ('.gz' if compress else '')
+    response = current_app.response_class(
+        stream_with_context(iter_backup_chunks(iter_backup_records(), compress)),
+        mimetype='application/gzip' if compress else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def parse_backup_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+# Restauration d'une sauvegarde produite par /export (NDJSON, éventuellement gzip).
+# Le flux est relu ligne par ligne et écrit par lots, dans une seule transaction.
+# Le potager actuel est remplacé : ?replace=true est exigé s'il contient déjà
+# des parcelles ou des versions. Quand le catalogue est partagé entre plusieurs
+# potagers, ses cultures ne sont pas remplacées mais fusionnées par nom.
+@bp.route('/import', methods=['POST'])
+def import_garden():
+    replace = request.args.get('replace', '').lower() in ('1', 'true', 'yes')
+    has_garden = db.session.query(
+        db.session.query(ParcelleConfig.id).exists() | db.session.query(Version.id).exists()
+    ).scalar()
+    if has_garden and not replace:
+        return jsonify({"error": "Le potager n'est pas vide : ajoutez ?replace=true pour le remplacer"}), 409
+
+    stream = request.stream
+    if request.content_encoding == 'gzip' or request.mimetype in ('application/gzip', 'application/x-gzip'):
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+
+    shared_catalogue = bool(current_app.config['GARDEN_DATABASE_URI'] or current_app.config['CATALOGUE_DATABASE_URI'])
+    counts = dict.fromkeys(('cultures', 'parcelles', 'cells', 'versions'), 0)
+    pending = {'culture': [], 'config': [], 'position': [], 'cell': [], 'version': []}
+    tables = (
+        ('culture', Culture), ('config', ParcelleConfig), ('position', ParcellePosition),
+        ('cell', Parcelle), ('version', Version)
+    )
+    # Cultures de la sauvegarde (identifiant -> nom) et, une fois écrites,
+    # catalogue et correspondance de leurs identifiants dans la base
+    source_cultures = {}
+    resolution = {}
+
+    def culture_ids():
+        if not resolution:
+            if shared_catalogue:
+                by_name = {}
+                for culture_id, nom in db.session.query(Culture.id, Culture.nom).filter(
+                    Culture.nom.in_(set(source_cultures.values()))
+                ).order_by(Culture.id.desc()):
+                    by_name[nom] = culture_id
+                ids = {source_id: by_name[nom] for source_id, nom in source_cultures.items() if nom in by_name}
+            else:
+                ids = {source_id: source_id for source_id in source_cultures}
+            # Lu dans la transaction en cours, jamais mis en cache
+            resolution.update(catalog=load_culture_catalog(), ids=ids)
+        return resolution['catalog'], resolution['ids']
+
+    # Écrire tous les lots en attente, dans l'ordre des dépendances
+    def flush():
+        for key, model in tables:
+            if pending[key]:
+                if key == 'culture':
+                    if shared_catalogue:
+                        merge_cultures(pending[key])
+                    else:
+                        db.session.execute(db.insert(model), pending[key])
+                    resolution.clear()
+                elif key == 'cell':
+                    catalog, ids = culture_ids()
+                    db.session.execute(db.insert(model), [
+                        {
+                            'parcelle_config_id': cell['parcelle_config_id'], 'row': cell['row'], 'col': cell['col'],
+                            **cell_columns(catalog.reference(cell['label'], ids))
+                        }
+                        for cell in pending[key]
+                    ])
+                else:
+                    db.session.execute(db.insert(model), pending[key])
+                pending[key] = []
+
+    line_number, current_id = 0, None
+    try:
+        replaced = (CellHistory, Parcelle, ParcellePosition, ParcelleConfig, CurrentVersion, Version, PotagerConfig)
+        if not shared_catalogue:
+            replaced = (Notification, Culture) + replaced
+        for model in replaced:
+            db.session.execute(db.delete(model))
+
+        header_seen = False
+        for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), start=1):
+            if not line.strip():
+                continue
+            record = current_app.json.loads(line)
+            kind = record.get('type')
+            if not header_seen:
+                if kind != 'header' or record.get('format') not in BACKUP_READABLE_FORMATS:
+                    raise ValueError("En-tête de sauvegarde absent ou format inconnu")
+                backup_format = record['format']
+                header_seen = True
+            elif kind == 'potager':
+                db.session.add(PotagerConfig(rows=record['rows'], cols=record['cols']))
+            elif kind == 'culture':
+                values = {field: record.get(field) for field in CULTURE_IMPORT_FIELDS}
+                for field in CULTURE_DATE_FIELDS:
+                    values[field] = parse_date(values[field])
+                pending['culture'].append(values if shared_catalogue else {'id': record['id'], **values})
+                source_cultures[record['id']] = values['nom']
+                counts['cultures'] += 1
+            elif kind == 'parcelle':
+                pending['config'].append({
+                    'id': record['id'], 'nom': record['nom'], 'rows': record['rows'], 'cols': record['cols']
+                })
+                if record.get('position'):
+                    x, y = record['position']
+                    pending['position'].append({'parcelle_config_id': record['id'], 'position_x': x, 'position_y': y})
+                pending['cell'].extend(
+                    {'parcelle_config_id': record['id'], 'row': row, 'col': col, 'label': label}
+                    for row, col, label in record['cells']
+                )
+                counts['parcelles'] += 1
+                counts['cells'] += len(record['cells'])
+            elif kind == 'version':
+                pending['version'].append({
+                    'id': record['id'], 'name': record['name'],
+                    'created_at': parse_backup_datetime(record['created_at']),
+                    'pinned': bool(record.get('pinned')), 'keyframe_id': record['keyframe_id'],
+                    'depth': record['depth'], 'payload': base64.b64decode(record['payload'])
+                })
+                if record['is_current']:
+                    current_id = record['id']
+                counts['versions'] += 1
+            else:
+                raise ValueError(f"Type d'enregistrement inconnu : {kind}")
+
+            if any(len(rows) >= BACKUP_BATCH_SIZE for rows in pending.values()):
+                flush()
+        if not header_seen:
+            raise ValueError("Sauvegarde vide")
+        flush()
+        if current_id is not None:
+            set_current_version(current_id)
+
+        # Cases des versions en emojis (format 1) ou citant des cultures renumérotées
+        catalog, ids = culture_ids()
+        if counts['versions'] and (backup_format == 1 or any(source != target for source, target in ids.items())):
+            recode_versions(lambda value: catalog.reference(value, ids))
+
+        publish_event('garden', {'action': 'imported'})
+        publish_event('cultures', {'action': 'imported', 'inserted': counts['cultures'], 'updated': 0})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Erreur lors de l'import de la sauvegarde (ligne %s) : %s", line_number, e)
+        invalid = isinstance(e, (ValueError, KeyError, TypeError, OSError, EOFError, zlib.error))
+        return jsonify({"error": str(e), "line": line_number}), 400 if invalid else 500
+
+    # Les identifiants des versions ont changé de contenu
+    get_version_state_cache().clear()
+    counts['history_rows'] = backfill_cell_history()
+    return jsonify({"message": "Sauvegarde importée avec succès", **counts}), 200
+
+# Remplir l'historique des cases à partir des versions existantes (versions
+# sans historique seulement). Les versions sont décodées dans l'ordre, une
+# chaîne à la fois, et les lignes insérées par lots.
+def backfill_cell_history(batch_size=1000):
+    done = {version_id for (version_id,) in db.session.query(CellHistory.version_id).distinct()}
+    versions = db.session.query(
+        Version.id, Version.keyframe_id, Version.created_at, Version.payload
+    ).order_by(Version.id).yield_per(50)
+
+    chain, chain_state, previous_state = None, None, None
+    pending, total = [], 0
+    for version_id, keyframe_id, created_at, payload in versions:
+        if (keyframe_id or version_id) != chain:
+            chain, chain_state = keyframe_id or version_id, None
+        chain_state = decode_payload(payload, chain_state)
+        if version_id not in done:
+            pending.extend(cell_history_rows(version_id, created_at, previous_state, chain_state))
+            if len(pending) >= batch_size:
+                db.session.execute(db.insert(CellHistory), pending)
+                total += len(pending)
+                pending = []
+        previous_state = chain_state
+    if pending:
+        db.session.execute(db.insert(CellHistory), pending)
+        total += len(pending)
+    db.session.commit()
+    return total
+
+# Convertir le contenu des cases de toutes les versions (voir map_state_cells),
+# une chaîne à la fois : chaque version est réencodée par rapport à la version
+# précédente convertie. Les chaînes dont aucune case ne change sont laissées
+# telles quelles. Ne valide pas la transaction.
+def recode_versions(convert):
+    keyframes = [version_id for (version_id,) in db.session.query(Version.id).filter(
+        Version.keyframe_id.is_(None)
+    ).order_by(Version.id)]
+    rewritten = 0
+    for keyframe_id in keyframes:
+        rows = db.session.query(Version.id, Version.payload).filter(
+            db.or_(Version.id == keyframe_id, Version.keyframe_id == keyframe_id)
+        ).order_by(Version.id).all()
+        state, previous, updates, changed = None, None, [], False
+        for version_id, payload in rows:
+            state = decode_payload(payload, state)
+            converted = map_state_cells(state, convert)
+            changed = changed or any(
+                grid is not state['parcelle_cultures'][parcelle_id]
+                for parcelle_id, grid in converted['parcelle_cultures'].items()
+            )
+            payload = encode_keyframe(converted) if previous is None else encode_delta(previous, converted)
+            updates.append({'id': version_id, 'payload': payload})
+            previous = converted
+        if changed:
+            db.session.execute(db.update(Version), updates)
+            rewritten += len(updates)
+    get_version_state_cache().clear()
+    return rewritten
+
+# Rétention des versions (voir retention.py) : supprimer les versions
+# éclaircies, puis rendre l'espace libéré (VACUUM incrémental). Les versions
+# épinglées, nommées (VERSION_RETENTION_KEEP_NAMED), courante et la plus récente
+# sont gardées, ainsi que toute la dernière chaîne, celle que save_version
+# prolonge. Les versions restantes de chaînes voisines sont réencodées ensemble
+# en chaînes d'au plus VERSION_KEYFRAME_INTERVAL versions ; l'historique des
+# cases d'une version supprimée passe à la version gardée suivante (avec ses dates).
+def compact_versions(now=None, batch_size=500):
+    config = current_app.config
+    rows = db.session.query(
+        Version.id, Version.keyframe_id, Version.created_at, Version.name, Version.pinned
+    ).order_by(Version.id).all()
+    if not rows:
+        return {'deleted': 0, 'rewritten': 0, 'freed_pages': incremental_vacuum()}
+
+    chains = {}
+    for version_id, keyframe_id, *_ in rows:
+        chains.setdefault(keyframe_id or version_id, []).append(version_id)
+    last_chain = rows[-1][1] or rows[-1][0]
+    current_id = current_version_id()
+    protected = set(chains[last_chain]) | {current_id}
+    protected.update(
+        version_id for version_id, _, created_at, name, pinned in rows
+        if pinned or created_at is None or (config['VERSION_RETENTION_KEEP_NAMED'] and name)
+    )
+    doomed = set(versions_to_thin(
+        [(version_id, created_at) for version_id, _, created_at, *_ in rows if created_at is not None],
+        now or utcnow(), config['VERSION_RETENTION'], protected
+    ))
+    if not doomed:
+        return {'deleted': 0, 'rewritten': 0, 'freed_pages': incremental_vacuum()}
+
+    # Historique des versions supprimées : vers la version gardée suivante
+    successors, following = {}, None
+    for version_id, *_ in reversed(rows):
+        if version_id in doomed:
+            successors.setdefault(following, []).append(version_id)
+        else:
+            following = version_id
+    for successor, version_ids in successors.items():
+        for batch in batched(version_ids, batch_size):
+            db.session.execute(db.update(CellHistory).where(
+                CellHistory.version_id.in_(batch)
+            ).values(version_id=successor).execution_options(synchronize_session=False))
+
+    # Chaînes touchées, regroupées par suites de chaînes consécutives
+    runs, run = [], []
+    for chain, version_ids in chains.items():
+        if doomed.intersection(version_ids):
+            run.append(chain)
+        elif run:
+            runs.append(run)
+            run = []
+    if run:
+        runs.append(run)
+
+    interval = config['VERSION_KEYFRAME_INTERVAL']
+    rewritten = 0
+    for run in runs:
+        previous, keyframe_id, depth = None, None, 0
+        for chain in run:
+            chain_rows = db.session.query(Version.id, Version.payload).filter(
+                db.or_(Version.id == chain, Version.keyframe_id == chain)
+            ).order_by(Version.id).all()
+            state, updates = None, []
+            for version_id, payload in chain_rows:
+                state = decode_payload(payload, state)
+                if version_id in doomed:
+                    continue
+                if previous is None or depth + 1 >= interval:
+                    keyframe_id, depth = version_id, 0
+                    updates.append({'id': version_id, 'payload': encode_keyframe(state), 'keyframe_id': None, 'depth': 0})
+                else:
+                    depth += 1
+                    updates.append({
+                        'id': version_id, 'payload': encode_delta(previous, state),
+                        'keyframe_id': keyframe_id, 'depth': depth
+                    })
+                previous = state
+            if updates:
+                db.session.execute(db.update(Version), updates)
+                rewritten += len(updates)
+
+    for batch in batched(sorted(doomed), batch_size):
+        db.session.execute(db.delete(Version).where(Version.id.in_(batch)).execution_options(synchronize_session=False))
+    publish_event('version', {'action': 'compacted', 'deleted': len(doomed)})
+    db.session.commit()
+    get_version_state_cache().clear()
+    logger.info("Versions compactées : %d supprimées, %d réécrites", len(doomed), rewritten)
+    return {'deleted': len(doomed), 'rewritten': rewritten, 'freed_pages': incremental_vacuum()}
+
+# Rendre au système de fichiers les pages libérées, sans réécrire la base
+# (bases en auto_vacuum incrémental : nouvelles bases, ou après la migration 8)
+def incremental_vacuum():
+    with garden_engine().connect() as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return 0
+        freed = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+        # sqlite3 n'exécute qu'un pas de la commande (une page) ; executescript va jusqu'au bout
+        connection.connection.driver_connection.executescript("PRAGMA incremental_vacuum;")
+    return freed
+
+# Un cycle de compactage : le potager par défaut et les potagers ouverts dans
+# ce processus, chacun dans un thread avec son propre contexte d'application
+async def run_compaction_cycle(app, gardens):
+    def compact(garden_id):
+        with app.app_context():
+            g.garden = find_garden(garden_id)
+            return compact_versions()
+
+    results = {}
+    for garden_id in gardens():
+        results[garden_id] = await asyncio.to_thread(compact, garden_id)
+    return results
+
+def create_compaction_scheduler(app, gardens=None):
+    if gardens is None:
+        def gardens():
+            return [DEFAULT_GARDEN, *app.extensions['potager']['gardens'].names()]
+    return BackgroundScheduler(
+        lambda: run_compaction_cycle(app, gardens),
+        interval=app.config['VERSION_COMPACTION_INTERVAL'],
+        cron=app.config['VERSION_COMPACTION_CRON'],
+        name='potager-compaction'
+    )
+
+# Compactage des versions dans un processus dédié (recommandé avec plusieurs workers) :
+#   flask --app app compact-versions [--once] [--garden <potager>]
+@bp.cli.command('compact-versions')
+@click.option('--once', is_flag=True, help="Exécuter un seul compactage puis quitter.")
+@click.option('--garden', default=DEFAULT_GARDEN, help="Potager à compacter.")
+def compact_versions_command(once, garden):
+    """Supprime les versions éclaircies par la politique de rétention."""
+    app = current_app._get_current_object()
+    try:
+        find_garden(garden)
+    except (ValueError, LookupError) as e:
+        raise click.ClickException(str(e))
+    if once:
+        result = asyncio.run(run_compaction_cycle(app, lambda: [garden]))[garden]
+        print(f"{result['deleted']} versions supprimées, {result['rewritten']} réécrites, "
+              f"{result['freed_pages']} pages libérées.")
+        return
+    scheduler = create_compaction_scheduler(app, lambda: [garden])
+    scheduler.start()
+    print("Compactage des versions planifié (Ctrl+C pour arrêter).")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+# Remplissage de l'historique des cases (après une mise à jour) :
+#   flask --app app backfill-history
+@bp.cli.command('backfill-history')
+@click.option('--garden', default=DEFAULT_GARDEN, help="Potager à traiter.")
+def backfill_history_command(garden):
+    """Remplit l'historique des cases à partir des versions existantes."""
+    try:
+        g.garden = find_garden(garden)
+    except (ValueError, LookupError) as e:
+        raise click.ClickException(str(e))
+    print(f"{backfill_cell_history()} lignes d'historique ajoutées.")
+
+def history_reference(entry):
+    return cell_reference(entry.culture_id, entry.culture_emoji)
+
+def format_history_entry(entry, catalog):
+    reference = history_reference(entry)
+    culture = catalog.culture(reference)
+    return {
+        'version_id': entry.version_id,
+        'recorded_at': entry.recorded_at.isoformat(),
+        'culture_id': entry.culture_id,
+        'culture_emoji': catalog.label(reference),
+        'culture': {'id': culture.id, 'nom': culture.nom, 'famille': culture.famille} if culture else None
+    }
+
+# Filtrer l'historique sur ?from=&to= (dates, bornes incluses) ; lève ValueError
+def history_period(query):
+    debut = parse_date(request.args.get('from'))
+    fin = parse_date(request.args.get('to'))
+    if debut:
+        query = query.filter(CellHistory.recorded_at >= datetime.combine(debut, datetime.min.time()))
+    if fin:
+        query = query.filter(CellHistory.recorded_at < datetime.combine(fin + timedelta(days=1), datetime.min.time()))
+    return query
+
+# Frise d'une case, sans les enregistrements identiques consécutifs
+def cell_timeline(entries, catalog):
+    timeline, last = [], None
+    for entry in entries:
+        reference = history_reference(entry)
+        if timeline and reference == last:
+            continue
+        last = reference
+        timeline.append(format_history_entry(entry, catalog))
+    return timeline
+
+@bp.route('/history/parcelles/<int:id>/cells/<int:row>/<int:col>', methods=['GET'])
+@conditional('cell_history', 'culture')
+def get_cell_history(id, row, col):
+    try:
+        query = history_period(CellHistory.query.filter_by(parcelle_config_id=id, row=row, col=col))
+    except ValueError:
+        return jsonify({"error": "Dates invalides (format AAAA-MM-JJ attendu)"}), 400
+    entries = query.order_by(CellHistory.recorded_at, CellHistory.id).all()
+    return jsonify({
+        'parcelle_id': id, 'row': row, 'col': col,
+        'timeline': cell_timeline(entries, culture_catalog())
+    })
+
+# Frises de toutes les cases d'une parcelle ayant changé sur la période
+@bp.route('/history/parcelles/<int:id>', methods=['GET'])
+@conditional('cell_history', 'culture')
+def get_parcelle_history(id):
+    try:
+        query = history_period(CellHistory.query.filter_by(parcelle_config_id=id))
+    except ValueError:
+        return jsonify({"error": "Dates invalides (format AAAA-MM-JJ attendu)"}), 400
+    entries = query.order_by(CellHistory.row, CellHistory.col, CellHistory.recorded_at, CellHistory.id).all()
+
+    catalog = culture_catalog()
+    cells, current, cell_entries = [], None, []
+    for entry in entries + [None]:
+        key = (entry.row, entry.col) if entry is not None else None
+        if key != current and cell_entries:
+            cells.append({'row': current[0], 'col': current[1], 'timeline': cell_timeline(cell_entries, catalog)})
+            cell_entries = []
+        current = key
+        if entry is not None:
+            cell_entries.append(entry)
+    return jsonify({'parcelle_id': id, 'cells': cells})
+
+# Contrôle de rotation : une même famille (à défaut, la même culture) replantée
+# dans une case moins de `seasons` saisons (années civiles) après la précédente.
+# Seul l'historique depuis le 1er janvier de `since` est parcouru (par défaut,
+# les `seasons` dernières saisons et la saison en cours).
+@bp.route('/history/rotation', methods=['GET'])
+@conditional('cell_history', 'culture')
+def get_rotation_violations():
+    seasons = max(1, request.args.get('seasons', current_app.config['ROTATION_SEASONS'], type=int))
+    since = request.args.get('since', date.today().year - seasons, type=int)
+    parcelle_id = request.args.get('parcelle_id', type=int)
+    if not MINYEAR <= since <= MAXYEAR:
+        return jsonify({"error": f"since doit être une année comprise entre {MINYEAR} et {MAXYEAR}"}), 400
+
+    query = CellHistory.query.filter(CellHistory.recorded_at >= datetime(since, 1, 1))
+    if parcelle_id is not None:
+        query = query.filter(CellHistory.parcelle_config_id == parcelle_id)
+    entries = query.order_by(
+        CellHistory.parcelle_config_id, CellHistory.row, CellHistory.col, CellHistory.recorded_at, CellHistory.id
+    ).all()
+
+    catalog = culture_catalog()
+    violations = []
+    current, last_reference, plantings = None, None, {}
+    for entry in entries:
+        key = (entry.parcelle_config_id, entry.row, entry.col)
+        reference = history_reference(entry)
+        if key != current:
+            current, last_reference, plantings = key, None, {}
+        if reference == last_reference:
+            continue
+        last_reference = reference
+        if reference is None:
+            continue
+
+        culture = catalog.culture(reference)
+        famille = (culture.famille or culture.nom) if culture else catalog.label(reference) or str(reference)
+        season = entry.recorded_at.year
+        previous = plantings.get(famille)
+        if previous is not None and 0 < season - previous[0] < seasons:
+            violations.append({
+                'parcelle_id': entry.parcelle_config_id, 'row': entry.row, 'col': entry.col,
+                'famille': famille,
+                'previous': {**format_history_entry(previous[1], catalog), 'season': previous[0]},
+                'current': {**format_history_entry(entry, catalog), 'season': season}
+            })
+        plantings[famille] = (season, entry)
+
+    return jsonify({'seasons': seasons, 'since': since, 'violations': violations})
+
+# Bornes du journal d'événements : (plus ancien, plus récent), (None, None) s'il est vide
+def event_bounds(journal):
+    return db.session.query(db.func.min(journal.id), db.func.max(journal.id)).one()
+
+# Le client doit recharger si des événements postérieurs à `since` ont été
+# purgés, ou si `since` est inconnu (base réinitialisée)
+def events_missed(since, oldest, latest):
+    if latest is None:
+        return since > 0
+    return since > latest or since < oldest - 1
+
+def events_since(journal, since, limit):
+    return journal.query.filter(journal.id > since).order_by(journal.id).limit(limit).all()
+
+def format_sse(kind, data, seq):
+    return f"id: {seq}\nevent: {kind}\ndata: {data}\n\n"
+
+# Position d'un client dans les deux journaux : "<potager>.<catalogue>" (un
+# entier seul désigne le journal du potager). None pour une valeur absente.
+def parse_event_cursor(value):
+    garden, _, catalogue = (value or '').partition('.')
+    return (
+        int(garden) if garden.isdigit() else None,
+        int(catalogue) if catalogue.isdigit() else None
+    )
+
+# Reprise par scrutation : événements postérieurs à `since` (journal du
+# potager) et à `catalogue_since` (journal du catalogue). Sans eux, renvoie
+# seulement les derniers numéros de séquence.
+@bp.route('/events', methods=['GET'])
+def get_events():
+    limit = max(1, min(request.args.get('limit', 500, type=int), 1000))
+    response = {'more': False}
+    for journal, param, prefix in ((GardenEvent, 'since', ''), (CatalogueEvent, 'catalogue_since', 'catalogue_')):
+        since = request.args.get(param, type=int)
+        oldest, latest = event_bounds(journal)
+        events = []
+        reset = since is not None and events_missed(since, oldest, latest)
+        if since is None or reset:
+            last = latest or 0
+        else:
+            events = events_since(journal, since, limit)
+            last = events[-1].id if events else since
+            response['more'] = response['more'] or len(events) == limit
+        response.update({
+            f'{prefix}events': [event.to_dict() for event in events],
+            f'{prefix}last_seq': last,
+            f'{prefix}reset': reset,
+        })
+    return jsonify(response)
+
+# Flux Server-Sent Events des modifications du potager et du catalogue. La
+# reprise se fait avec l'en-tête Last-Event-ID (envoyé automatiquement par
+# EventSource) ou ?since= ; un événement `reset` demande au client de tout
+# recharger, un événement `cultures` de recharger le catalogue. La connexion
+# est fermée après EVENTS_STREAM_MAX_SECONDS pour libérer le worker, le client
+# se reconnecte alors de lui-même.
+@bp.route('/events/stream', methods=['GET'])
+def stream_events():
+    since, catalogue_since = parse_event_cursor(
+        request.headers.get('Last-Event-ID') or request.args.get('since')
+    )
+    if since is None:
+        since = event_bounds(GardenEvent)[1] or 0
+    if catalogue_since is None:
+        catalogue_since = event_bounds(CatalogueEvent)[1] or 0
+    db.session.remove()
+
+    config = current_app.config
+    poll_interval = config['EVENTS_POLL_INTERVAL']
+    heartbeat = config['EVENTS_HEARTBEAT']
+    notifier = get_event_notifier()
+
+    def generate():
+        last = {GardenEvent: since, CatalogueEvent: catalogue_since}
+        now = time.monotonic()
+        deadline = now + config['EVENTS_STREAM_MAX_SECONDS']
+        next_heartbeat = now + heartbeat
+        yield "retry: 2000\n\n"
+        try:
+            while True:
+                seen = notifier.counter
+                complete = True
+                for journal in (GardenEvent, CatalogueEvent):
+                    oldest, latest = event_bounds(journal)
+                    if events_missed(last[journal], oldest, latest):
+                        last[journal] = latest or 0
+                        cursor = f"{last[GardenEvent]}.{last[CatalogueEvent]}"
+                        if journal is GardenEvent:
+                            yield format_sse('reset', json.dumps({'last_seq': last[journal]}), cursor)
+                        else:
+                            yield format_sse('cultures', json.dumps({'action': 'reset'}), cursor)
+                        continue
+                    events = events_since(journal, last[journal], 500)
+                    for event in events:
+                        last[journal] = event.id
+                        yield format_sse(event.kind, event.payload, f"{last[GardenEvent]}.{last[CatalogueEvent]}")
+                    complete = complete and len(events) < 500
+                # Ne pas garder de connexion à la base entre deux scrutations
+                db.session.remove()
+
+                now = time.monotonic()
+                if now >= deadline:
+                    return
+                if now >= next_heartbeat:
+                    next_heartbeat = now + heartbeat
+                    yield ": ping\n\n"
+                if complete:
+                    notifier.wait(seen, min(poll_interval, deadline - now))
+        finally:
+            db.session.remove()
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Types d'échéances notifiées : (type, emoji, libellé, colonne de Culture)
+NOTIFICATION_EVENTS = (
+    ('semis', '🌱', 'Semis', 'date_semis'),
+    ('repiquage', '🌿', 'Repiquage', 'date_repiquage'),
+    ('recolte', '🥕', 'Récolte', 'date_recolte'),
+)
+# Délai après lequel un envoi interrompu (processus arrêté) est repris
+NOTIFICATION_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# Enregistrer les échéances à venir puis réserver celles à envoyer (dans un contexte d'application).
+# Renvoie une liste de (id de notification, texte).
+def claim_due_notifications(today=None):
+    config = current_app.config
+    today = today or date.today()
+    horizon = today + timedelta(days=config['NOTIFICATIONS_HORIZON_DAYS'])
+    now = utcnow()
+
+    cultures = Culture.query.filter(db.or_(*(
+        getattr(Culture, column).between(today, horizon) for _, _, _, column in NOTIFICATION_EVENTS
+    ))).all()
+    rows = [
+        {'culture_id': culture.id, 'event_type': event_type, 'event_date': getattr(culture, column),
+         'status': 'pending', 'attempts': 0, 'created_at': now}
+        for culture in cultures
+        for event_type, _, _, column in NOTIFICATION_EVENTS
+        if getattr(culture, column) and today <= getattr(culture, column) <= horizon
+    ]
+    if rows:
+        db.session.execute(db.insert(Notification).prefix_with('OR IGNORE'), rows)
+    db.session.commit()
+
+    candidates = db.session.query(Notification, Culture).join(
+        Culture, Culture.id == Notification.culture_id
+    ).filter(
+        Notification.event_date.between(today, horizon),
+        Notification.attempts < config['NOTIFICATIONS_MAX_ATTEMPTS'],
+        db.or_(
+            Notification.status.in_(('pending', 'failed')),
+            db.and_(Notification.status == 'sending', Notification.claimed_at < now - NOTIFICATION_CLAIM_TIMEOUT)
+        )
+    ).order_by(Notification.event_date, Culture.nom).all()
+
+    claimed = []
+    events = {event_type: (emoji, label, column) for event_type, emoji, label, column in NOTIFICATION_EVENTS}
+    for notification, culture in candidates:
+        emoji, label, column = events[notification.event_type]
+        status = 'sending' if getattr(culture, column) == notification.event_date else 'obsolete'
+        # Réservation atomique : un autre processus a pu la prendre entre-temps
+        result = db.session.execute(db.update(Notification).where(
+            Notification.id == notification.id,
+            Notification.status == notification.status,
+            Notification.attempts == notification.attempts
+        ).values(status=status, claimed_at=now).execution_options(synchronize_session=False))
+        if result.rowcount == 1 and status == 'sending':
+            days_left = (notification.event_date - today).days
+            when = "aujourd'hui" if days_left == 0 else f"dans {days_left} jour{'s' if days_left > 1 else ''}"
+            claimed.append((
+                notification.id,
+                f"{emoji} {label} de {culture.nom} le {notification.event_date.isoformat()} ({when})"
+            ))
+    db.session.commit()
+    return claimed
+
+def finish_notifications(notification_ids, error=None):
+    values = {'attempts': Notification.attempts + 1}
+    if error is None:
+        values.update(status='sent', sent_at=utcnow(), last_error=None)
+    else:
+        values.update(status='failed', last_error=str(error)[:255])
+    db.session.execute(db.update(Notification).where(
+        Notification.id.in_(notification_ids)
+    ).values(**values).execution_options(synchronize_session=False))
+    db.session.commit()
+
+# Un cycle du planificateur : les accès à la base se font dans un thread avec
+# son propre contexte d'application, les envois sur la boucle asyncio.
+async def run_notification_cycle(app, sender):
+    def in_app_context(function, *args):
+        with app.app_context():
+            return function(*args)
+
+    due = await asyncio.to_thread(in_app_context, claim_due_notifications)
+    for batch in batched(due, app.config['NOTIFICATIONS_BATCH_SIZE']):
+        message = {'text': "Échéances à venir au potager :\n" + "\n".join(text for _, text in batch)}
+        error = None
+        try:
+            await send_with_retry(sender, message, attempts=app.config['NOTIFICATIONS_SEND_RETRIES'])
+        except Exception as e:
+            error = e
+            logger.error(f"Échec d'envoi des notifications : {str(e)}")
+        await asyncio.to_thread(in_app_context, finish_notifications, [id for id, _ in batch], error)
+    return len(due)
+
+def create_notification_scheduler(app, sender=None):
+    sender = sender or SlackWebhookSender(app.config['NOTIFICATIONS_SLACK_WEBHOOK'])
+    return BackgroundScheduler(
+        lambda: run_notification_cycle(app, sender),
+        interval=app.config['NOTIFICATIONS_INTERVAL'],
+        cron=app.config['NOTIFICATIONS_CRON']
+    )
+
+# Planificateur des notifications dans un processus dédié (recommandé avec plusieurs workers) :
+#   flask --app app notifications [--once]
+@bp.cli.command('notifications')
+@click.option('--once', is_flag=True, help="Exécuter un seul cycle puis quitter.")
+def notifications_command(once):
+    """Envoie les notifications Slack des semis, repiquages et récoltes à venir."""
+    app = current_app._get_current_object()
+    if not app.config['NOTIFICATIONS_SLACK_WEBHOOK']:
+        raise click.ClickException("NOTIFICATIONS_SLACK_WEBHOOK (ou SLACK_WEBHOOK_URL) n'est pas configuré")
+    if once:
+        sent = asyncio.run(run_notification_cycle(app, SlackWebhookSender(app.config['NOTIFICATIONS_SLACK_WEBHOOK'])))
+        print(f"{sent} notifications traitées.")
+        return
+    scheduler = create_notification_scheduler(app)
+    scheduler.start()
+    print("Planificateur de notifications démarré (Ctrl+C pour arrêter).")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+# Reconstruction d'une table au schéma de son modèle, selon la procédure
+# recommandée par SQLite : créer <table>_new, y copier les lignes, supprimer
+# l'ancienne table puis renommer la nouvelle. Renommer l'ancienne table
+# réécrirait les clés étrangères des autres tables vers ce nom provisoire.
+# Les requêtes passent par le modèle pour viser sa base (catalogue ou potager).
+def create_rebuilt_table(model):
+    metadata = db.MetaData()
+    Version.__table__.to_metadata(metadata)
+    table = model.__table__.to_metadata(metadata, name=f"{model.__tablename__}_new")
+    db.session.execute(CreateTable(table), bind_arguments={'mapper': model})
+    return table.name
+
+def replace_rebuilt_table(model):
+    name = model.__tablename__
+    bind_arguments = {'mapper': model}
+    db.session.execute(db.text(f"DROP TABLE {name}"), bind_arguments=bind_arguments)
+    db.session.execute(db.text(f"ALTER TABLE {name}_new RENAME TO {name}"), bind_arguments=bind_arguments)
+    # Les index de l'ancienne table ont disparu avec elle
+    for index in model.__table__.indexes:
+        index.create(db.session.connection(bind_arguments=bind_arguments))
+
+# Migration 1 : versions stockées en PickleType -> format compact avec deltas
+def migrate_version_storage():
+    columns = [row[1] for row in db.session.execute(db.text("PRAGMA table_info(version)"))]
+    if 'parcelles' not in columns:
+        return
+
+    logger.info("Migration des versions vers le format compact...")
+    # Table reconstruite sans renommer l'ancienne : les clés étrangères des
+    # autres tables (cell_history, current_version) continuent de viser "version"
+    new_table = create_rebuilt_table(Version)
+    rows = db.session.execute(db.text(
+        "SELECT id, name, parcelles, parcelle_positions, parcelle_cultures, created_at, is_current "
+        "FROM version ORDER BY id"
+    )).all()
+
+    interval = current_app.config['VERSION_KEYFRAME_INTERVAL']
+    previous_state, keyframe_id, depth = None, None, 0
+    for version_id, name, parcelles, positions, cultures, created_at, is_current in rows:
+        # Données locales écrites par cette application : lecture unique avant suppression
+        state = state_from_grids(pickle.loads(parcelles), pickle.loads(positions), pickle.loads(cultures))
+        if previous_state is None or depth + 1 >= interval:
+            payload, keyframe_id, depth, chain = encode_keyframe(state), None, 0, version_id
+        else:
+            payload, depth = encode_delta(previous_state, state), depth + 1
+        db.session.execute(db.text(
+            f"INSERT INTO {new_table} (id, name, payload, keyframe_id, depth, created_at) "
+            "VALUES (:id, :name, :payload, :keyframe_id, :depth, :created_at)"
+        ), {
+            'id': version_id, 'name': name, 'payload': payload,
+            'keyframe_id': keyframe_id, 'depth': depth, 'created_at': created_at
+        })
+        if is_current:
+            set_current_version(version_id)
+        keyframe_id = chain
+        previous_state = state
+
+    replace_rebuilt_table(Version)
+    logger.info(f"{len(rows)} versions migrées.")
+
+# Migration 2 : index de pagination des versions
+def add_version_listing_index():
+    # Les dates écrites par CURRENT_TIMESTAMP n'ont pas de microsecondes :
+    # les aligner sur le format de SQLAlchemy pour les comparaisons du curseur
+    db.session.execute(db.text(
+        "UPDATE version SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+    ))
+    db.session.execute(db.text(
+        "CREATE INDEX IF NOT EXISTS ix_version_created_at_id ON version (created_at, id)"
+    ))
+
+# Requête SQL sur la base du catalogue (la base principale s'il n'a pas la sienne)
+def execute_catalogue_sql(statement, params=None):
+    return db.session.execute(db.text(statement), params, bind_arguments={'mapper': Culture})
+
+# Migration 3 : index des cases, des emojis et des positions ; dates des cultures typées
+def add_indexes_and_typed_dates():
+    # Supprimer les doublons de cases (on garde la dernière écriture) avant l'index unique
+    removed = db.session.execute(db.text(
+        "DELETE FROM parcelle WHERE id NOT IN ("
+        "SELECT MAX(id) FROM parcelle GROUP BY parcelle_config_id, row, col)"
+    )).rowcount
+    if removed:
+        logger.info(f"{removed} cases en double supprimées.")
+    db.session.execute(db.text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_parcelle_cell ON parcelle (parcelle_config_id, row, col)"
+    ))
+    execute_catalogue_sql("CREATE INDEX IF NOT EXISTS ix_culture_emoji ON culture (emoji)")
+    db.session.execute(db.text(
+        "CREATE INDEX IF NOT EXISTS ix_parcelle_position_parcelle_config_id "
+        "ON parcelle_position (parcelle_config_id)"
+    ))
+
+    # SQLite stocke les Date en texte AAAA-MM-JJ : normaliser les valeurs existantes
+    # (init_default_data écrivait des datetime complets, les formulaires des chaînes vides)
+    for column in ('date_semis', 'date_repiquage', 'date_recolte'):
+        execute_catalogue_sql(
+            f"UPDATE culture SET {column} = date({column}) "
+            f"WHERE {column} IS NOT NULL AND date({column}) IS NOT NULL AND {column} != date({column})"
+        )
+    for column in ('date_repiquage', 'date_recolte'):
+        execute_catalogue_sql(
+            f"UPDATE culture SET {column} = NULL WHERE {column} IS NOT NULL AND date({column}) IS NULL"
+        )
+    invalid = execute_catalogue_sql(
+        "SELECT COUNT(*) FROM culture WHERE date(date_semis) IS NULL"
+    ).scalar()
+    if invalid:
+        logger.warning(f"{invalid} cultures ont une date de semis invalide à corriger manuellement.")
+
+# Migration 4 : index des dates de culture pour le calendrier
+def add_calendar_indexes():
+    execute_catalogue_sql("CREATE INDEX IF NOT EXISTS ix_culture_date_semis ON culture (date_semis)")
+    execute_catalogue_sql(
+        "CREATE INDEX IF NOT EXISTS ix_culture_date_fin "
+        "ON culture (coalesce(date_recolte, date_repiquage, date_semis))"
+    )
+
+# Migration 5 : famille botanique des cultures (rotation). La table
+# cell_history est créée par create_all ; la remplir avec
+#   flask --app app backfill-history
+def add_culture_family():
+    columns = [row[1] for row in execute_catalogue_sql("PRAGMA table_info(culture)")]
+    if 'famille' not in columns:
+        execute_catalogue_sql("ALTER TABLE culture ADD COLUMN famille VARCHAR(50)")
+
+# Migration 6 : index des cases par culture (comptages sans parcourir la table)
+def add_parcelle_culture_index():
+    db.session.execute(db.text(
+        "CREATE INDEX IF NOT EXISTS ix_parcelle_culture_emoji ON parcelle (culture_emoji)"
+    ))
+
+# Migration 7 : les cases (parcelles, historique, versions) désignent leur
+# culture par son identifiant ; le texte n'est gardé que s'il ne correspond
+# à aucune culture du catalogue
+def add_cell_culture_ids():
+    for table in ('parcelle', 'cell_history'):
+        columns = [row[1] for row in db.session.execute(db.text(f"PRAGMA table_info({table})"))]
+        if 'culture_id' not in columns:
+            db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN culture_id INTEGER"))
+
+    catalog = load_culture_catalog()
+    db.session.execute(db.text("UPDATE parcelle SET culture_emoji = NULL WHERE culture_emoji = ''"))
+    # Une mise à jour par valeur distincte (quelques dizaines), par l'index existant
+    for table, resolved in (('parcelle', 'NULL'), ('cell_history', "''")):
+        values = db.session.execute(db.text(
+            f"SELECT DISTINCT culture_emoji FROM {table} WHERE culture_id IS NULL AND culture_emoji != ''"
+        )).scalars().all()
+        for value in values:
+            reference = catalog.reference(value)
+            if isinstance(reference, int):
+                db.session.execute(db.text(
+                    f"UPDATE {table} SET culture_id = :culture_id, culture_emoji = {resolved} "
+                    f"WHERE culture_id IS NULL AND culture_emoji = :value"
+                ), {'culture_id': reference, 'value': value})
+
+    db.session.execute(db.text("DROP INDEX IF EXISTS ix_parcelle_culture_emoji"))
+    db.session.execute(db.text(
+        "CREATE INDEX IF NOT EXISTS ix_parcelle_culture ON parcelle (culture_id, culture_emoji)"
+    ))
+    logger.info(f"{recode_versions(catalog.reference)} versions réécrites.")
+
+# Migration 8 : version courante désignée par un pointeur (current_version) au
+# lieu d'un drapeau sur chaque version, versions épinglées, et VACUUM
+# incrémental pour rendre l'espace des versions supprimées par la rétention
+def add_version_retention():
+    columns = [row[1] for row in db.session.execute(db.text("PRAGMA table_info(version)"))]
+    if 'pinned' not in columns:
+        db.session.execute(db.text("ALTER TABLE version ADD COLUMN pinned BOOLEAN NOT NULL DEFAULT 0"))
+    CurrentVersion.__table__.create(db.session.connection(), checkfirst=True)
+    if 'is_current' in columns:
+        current_id = db.session.execute(db.text("SELECT max(id) FROM version WHERE is_current")).scalar()
+        if current_id is not None:
+            set_current_version(current_id)
+        # DROP COLUMN existe depuis SQLite 3.35 ; avant, la colonne reste, inutilisée
+        if sqlite3.sqlite_version_info >= (3, 35):
+            db.session.execute(db.text("ALTER TABLE version DROP COLUMN is_current"))
+
+    # auto_vacuum ne change qu'avec un VACUUM complet, hors transaction (une seule fois)
+    if db.session.execute(db.text("PRAGMA auto_vacuum")).scalar() != 2:
+        db.session.commit()
+        logger.info("Passage de la base en VACUUM incrémental...")
+        with garden_engine().connect() as connection:
+            connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.exec_driver_sql("VACUUM")
+
+# Migration 9 : identifiants des cultures en AUTOINCREMENT, pour qu'une culture
+# créée après une suppression ne reprenne pas l'identifiant gardé par les
+# versions et l'historique. La séquence part au moins du plus grand
+# identifiant encore cité par les cases et l'historique de ce potager.
+def add_culture_autoincrement():
+    schema = execute_catalogue_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'culture'").scalar()
+    if 'AUTOINCREMENT' not in schema.upper():
+        logger.info("Reconstruction de la table culture...")
+        new_table = create_rebuilt_table(Culture)
+        columns = ', '.join(f'"{column.name}"' for column in Culture.__table__.columns)
+        execute_catalogue_sql(f"INSERT INTO {new_table} ({columns}) SELECT {columns} FROM culture")
+        replace_rebuilt_table(Culture)
+
+    cited = db.session.execute(db.text(
+        "SELECT max(culture_id) FROM (SELECT max(culture_id) AS culture_id FROM parcelle "
+        "UNION ALL SELECT max(culture_id) FROM cell_history)"
+    )).scalar() or 0
+    execute_catalogue_sql(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'culture', 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'culture')"
+    )
+    execute_catalogue_sql(
+        "UPDATE sqlite_sequence SET seq = max(seq, :cited, (SELECT coalesce(max(id), 0) FROM culture)) "
+        "WHERE name = 'culture'",
+        {'cited': cited}
+    )
+
+# Migrations du schéma, appliquées dans l'ordre et suivies par PRAGMA user_version
+# de chaque base. Les bases des autres potagers sont créées au schéma courant ;
+# leurs nouvelles tables sont ajoutées à leur ouverture, les migrations
+# appliquées par `flask --app app migrate --garden <potager>`.
+SCHEMA_MIGRATIONS = [
+    migrate_version_storage,
+    add_version_listing_index,
+    add_indexes_and_typed_dates,
+    add_calendar_indexes,
+    add_culture_family,
+    add_parcelle_culture_index,
+    add_cell_culture_ids,
+    add_version_retention,
+    add_culture_autoincrement,
+]
+
+def run_migrations():
+    current = db.session.execute(db.text("PRAGMA user_version")).scalar()
+    for number, migration in enumerate(SCHEMA_MIGRATIONS, start=1):
+        if number <= current:
+            continue
+        migration()
+        db.session.execute(db.text(f"PRAGMA user_version = {number}"))
+        db.session.commit()
+
+    # Tables reconstruites par les migrations : aucune ligne ne doit viser une
+    # ligne ou une table disparue
+    for model in (Version, CellHistory, CurrentVersion):
+        dangling = db.session.execute(db.text(f"PRAGMA foreign_key_check({model.__tablename__})")).all()
+        if dangling:
+            raise RuntimeError(
+                f"Clés étrangères invalides après migration : {len(dangling)} lignes de {model.__tablename__}"
+            )
+
+# Création et mise à jour de la base, à lancer une fois (et après chaque mise à jour) :
+#   flask --app app migrate
+@bp.cli.command('migrate')
+@click.option('--garden', default=DEFAULT_GARDEN, help="Potager à migrer.")
+def migrate_command(garden):
+    """Crée les tables, applique les migrations en attente et les données par défaut."""
+    try:
+        g.garden = find_garden(garden)
+    except (ValueError, LookupError) as e:
+        raise click.ClickException(str(e))
+    # Les tables d'un autre potager sont créées avec lui (create-garden)
+    if g.garden.engine is None:
         db.create_all()
-        print("Tables créées.")
-        init_default_data()
-    app.run(host='0.0.0.0', port=8001, debug=True)
+    # Générations des tables du catalogue et son journal, dans sa propre base
+    TableGeneration.__table__.create(catalogue_engine(), checkfirst=True)
+    CatalogueEvent.__table__.create(catalogue_engine(), checkfirst=True)
+    print("Tables créées.")
+    run_migrations()
+    print("Migrations appliquées.")
+    init_default_data()
+
+# Création d'un potager (avec POTAGER_GARDEN_DATABASE_URI) :
+#   flask --app app create-garden <potager>
+@bp.cli.command('create-garden')
+@click.argument('garden')
+def create_garden_command(garden):
+    """Crée la base d'un nouveau potager, au schéma courant."""
+    try:
+        created = create_garden(garden)
+    except (ValueError, LookupError) as e:
+        raise click.ClickException(str(e))
+    print(f"Potager {garden} créé." if created else f"Le potager {garden} existe déjà.")
+
+# Réglages SQLite appliqués à chaque nouvelle connexion du pool :
+# WAL pour que les lectures ne bloquent pas sur l'écrivain, synchronous=NORMAL
+# (sûr en WAL, un fsync par checkpoint au lieu d'un par commit) et busy_timeout
+# pour attendre le verrou d'écriture plutôt qu'échouer immédiatement.
+def configure_sqlite_connection(busy_timeout):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Sans effet sur une base existante (voir la migration 8) ; les nouvelles
+        # bases rendent ainsi l'espace libéré par la rétention des versions
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+        cursor.close()
+    return on_connect
+
+# Pool de connexions des bases SQLite sur fichier
+def sqlite_engine_options(app, url):
+    if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        return {'pool_size': app.config['SQLITE_POOL_SIZE'], 'max_overflow': app.config['SQLITE_MAX_OVERFLOW']}
+    return {}
+
+# Réglages SQLite et instrumentation, pour chaque moteur (base principale,
+# catalogue, bases des potagers)
+def configure_engine(app, engine):
+    if engine.url.get_backend_name() == 'sqlite':
+        event.listen(engine, 'connect', configure_sqlite_connection(app.config['SQLITE_BUSY_TIMEOUT']))
+    if app.config['METRICS_ENABLED']:
+        event.listen(engine, 'before_cursor_execute', record_query_start)
+        event.listen(engine, 'after_cursor_execute', record_query_end)
+
+# Fabrique d'application, utilisable par les serveurs WSGI/ASGI :
+#   gunicorn -w 4 -b 0.0.0.0:8001 'app:create_app()'
+#   uvicorn --factory --interface wsgi --host 0.0.0.0 --port 8001 app:create_app
+def create_app(config=None):
+    app = Flask(__name__)
+    # orjson s'il est installé, sinon le sérialiseur standard de Flask
+    app.json = FastJSONProvider(app)
+    app.config.from_mapping(DEFAULT_CONFIG)
+    if config:
+        app.config.from_mapping(config)
+    # Politique de rétention vérifiée dès le démarrage (ValueError si invalide)
+    parse_policy(app.config['VERSION_RETENTION'])
+
+    engine_options = sqlite_engine_options(app, make_url(app.config['SQLALCHEMY_DATABASE_URI']))
+    if engine_options:
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options)
+    app.config['SQLALCHEMY_BINDS'] = {
+        **app.config.get('SQLALCHEMY_BINDS', {}),
+        CATALOGUE_BIND: app.config['CATALOGUE_DATABASE_URI'] or app.config['SQLALCHEMY_DATABASE_URI'],
+    }
+
+    # Activer CORS
+    CORS(app)
+
+    db.init_app(app)
+    app.extensions['potager'] = {
+        'read_cache': ReadCache(app.config['READ_CACHE_SIZE'], app.config['READ_CACHE_TTL']),
+        'metrics': create_request_metrics(),
+        'default_garden': GardenState(DEFAULT_GARDEN),
+        'gardens': GardenRegistry(
+            lambda garden_id, create: open_garden(app, garden_id, create),
+            close_garden, app.config['GARDEN_ENGINE_CACHE_SIZE']
+        ),
+    }
+    app.register_blueprint(bp)
+
+    with app.app_context():
+        configure_engine(app, db.engine)
+        if app.config['CATALOGUE_DATABASE_URI']:
+            configure_engine(app, db.engines[CATALOGUE_BIND])
+
+    # Les planificateurs tournent sur leur propre boucle asyncio, jamais dans les requêtes
+    if app.config['NOTIFICATIONS_IN_PROCESS'] and app.config['NOTIFICATIONS_SLACK_WEBHOOK']:
+        scheduler = create_notification_scheduler(app)
+        scheduler.start()
+        app.extensions['potager']['scheduler'] = scheduler
+    if app.config['VERSION_COMPACTION_IN_PROCESS'] and app.config['VERSION_RETENTION']:
+        compaction = create_compaction_scheduler(app)
+        compaction.start()
+        app.extensions['potager']['compaction'] = compaction
+
+    return app
+
+# Serveur de développement ; la base doit avoir été créée avec `flask --app app migrate`
+if __name__ == "__main__":
+    create_app().run(host='0.0.0.0', port=8001, debug=True)
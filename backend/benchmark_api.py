@@ -0,0 +1,283 @@
+"""Banc d'essai de l'API : génère un potager synthétique dans une base SQLite
+temporaire puis rejoue des parcours réalistes avec le client de test Flask.
+
+    python backend/benchmark_api.py --beds 50 --size 20 --cultures 300 --versions 40
+    python backend/benchmark_api.py --output resultats.json --baseline precedent.json
+
+Pour chaque route : débit, latences p50/p99 et nombre moyen de requêtes SQL.
+Avec --baseline, les routes plus lentes (au-delà de --tolerance) ou plus
+gourmandes en requêtes SQL que la mesure de référence sont signalées et le
+script se termine avec le code 1.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+import app as potager
+from app import Culture, Parcelle, ParcelleConfig, ParcellePosition, PotagerConfig, db
+
+TYPES_CULTURE = ('pleine terre', 'serre', 'intérieur')
+
+
+def populate(beds, size, cultures, versions, fill, seed):
+    rng = random.Random(seed)
+    emojis = [chr(0x1F330 + i % 200) + str(i // 200) for i in range(cultures)]
+    start = date(date.today().year, 1, 1)
+
+    db.session.add(PotagerConfig(rows=20, cols=20))
+    rows = []
+    for i, emoji in enumerate(emojis):
+        semis = start + timedelta(days=rng.randrange(365))
+        rows.append({
+            'nom': f"culture {i}", 'date_semis': semis, 'type_culture': rng.choice(TYPES_CULTURE),
+            'date_repiquage': semis + timedelta(days=rng.randrange(20, 60)) if rng.random() < 0.5 else None,
+            'date_recolte': semis + timedelta(days=rng.randrange(60, 150)),
+            'couleur': '#00aa00', 'emoji': emoji,
+        })
+    db.session.execute(db.insert(Culture), rows)
+    db.session.execute(db.insert(ParcelleConfig), [
+        {'id': bed, 'nom': f"parcelle {bed}", 'rows': size, 'cols': size} for bed in range(1, beds + 1)
+    ])
+    db.session.execute(db.insert(ParcellePosition), [
+        {'parcelle_config_id': bed, 'position_x': bed % 10, 'position_y': bed // 10}
+        for bed in range(1, beds + 1)
+    ])
+    # Cultures numérotées de 1 à `cultures` (base neuve)
+    cells = [
+        {'parcelle_config_id': bed, 'row': row, 'col': col, 'culture_id': rng.randint(1, cultures)}
+        for bed in range(1, beds + 1)
+        for row in range(size)
+        for col in range(size)
+        if rng.random() < fill
+    ]
+    if cells:
+        db.session.execute(db.insert(Parcelle), cells)
+    db.session.commit()
+
+    # Historique : quelques cases repeintes entre deux versions (chaînes de deltas réalistes)
+    for number in range(versions):
+        if number:
+            db.session.execute(db.update(Parcelle), [
+                {'id': rng.randint(1, len(cells)), 'culture_id': rng.randint(1, cultures)}
+                for _ in range(max(1, len(cells) // 50))
+            ])
+            db.session.commit()
+        potager.save_version(f"version {number + 1}", potager.capture_garden_state())
+    return emojis
+
+
+# Parcours rejoués : chacun renvoie (méthode, url, corps JSON)
+def workflows(beds, size, emojis, year):
+    def planner(rng):
+        return 'GET', '/garden', None
+
+    def parcelle(rng):
+        return 'GET', f"/parcelles/{rng.randint(1, beds)}", None
+
+    def paint(rng):
+        bed = rng.randint(1, beds)
+        cells = []
+        for _ in range(rng.randint(1, 10)):
+            # culture 0 : case vidée
+            culture = rng.randint(0, len(emojis))
+            cells.append({
+                'parcelle_id': bed, 'row': rng.randrange(size), 'col': rng.randrange(size),
+                **({'culture_id': culture} if culture else {'culture_emoji': ''})
+            })
+        return 'POST', '/parcelles/batch', {'cells': cells}
+
+    def snapshot(rng):
+        return 'POST', '/versions', {'name': 'benchmark', 'whole_garden': True}
+
+    def version_list(rng):
+        return 'GET', '/versions?limit=50', None
+
+    def version_detail(rng):
+        return 'GET', f"/versions/{rng.randint(1, max(1, version_count()))}", None
+
+    def version_export(rng):
+        return 'GET', f"/versions/export/{rng.randint(1, max(1, version_count()))}", None
+
+    def calendar(rng):
+        month = rng.randint(1, 12)
+        return 'GET', f"/calendar?from={year}-{month:02d}-01&to={year}-12-31&group=week", None
+
+    def forecast(rng):
+        return 'GET', f"/forecast?from={year}-{rng.randint(1, 12):02d}-01&weeks=26", None
+
+    def popular(rng):
+        return 'GET', '/cultures/popular', None
+
+    def cultures(rng):
+        return 'GET', '/cultures', None
+
+    # Poids relatifs : la lecture du planificateur domine, les instantanés sont rares
+    return {
+        'planificateur (GET /garden)': (planner, 10),
+        'parcelle (GET /parcelles/<id>)': (parcelle, 5),
+        'peinture (POST /parcelles/batch)': (paint, 10),
+        'instantané (POST /versions)': (snapshot, 1),
+        'versions (GET /versions)': (version_list, 3),
+        'version (GET /versions/<id>)': (version_detail, 3),
+        'export (GET /versions/export/<id>)': (version_export, 1),
+        'calendrier (GET /calendar)': (calendar, 3),
+        'prévisions (GET /forecast)': (forecast, 2),
+        'populaires (GET /cultures/popular)': (popular, 3),
+        'cultures (GET /cultures)': (cultures, 3),
+    }
+
+
+def version_count():
+    return db.session.query(db.func.count(potager.Version.id)).scalar()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(client, scenarios, iterations, seed):
+    rng = random.Random(seed)
+    queries = [0]
+
+    def count_query(*args):
+        queries[0] += 1
+
+    event.listen(db.engine, 'after_cursor_execute', count_query)
+    names = list(scenarios)
+    weights = [scenarios[name][1] for name in names]
+    samples = {name: {'durations': [], 'queries': [], 'errors': 0} for name in names}
+
+    started = time.perf_counter()
+    try:
+        for name in rng.choices(names, weights, k=iterations):
+            method, url, body = scenarios[name][0](rng)
+            queries[0] = 0
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=body)
+            response.get_data()
+            elapsed = time.perf_counter() - start
+            sample = samples[name]
+            sample['durations'].append(elapsed)
+            sample['queries'].append(queries[0])
+            if response.status_code >= 400:
+                sample['errors'] += 1
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', count_query)
+    total = time.perf_counter() - started
+
+    results = {}
+    for name, sample in samples.items():
+        durations = sample['durations']
+        if not durations:
+            continue
+        results[name] = {
+            'requests': len(durations),
+            'errors': sample['errors'],
+            'throughput_rps': len(durations) / sum(durations),
+            'p50_ms': percentile(durations, 0.5) * 1000,
+            'p99_ms': percentile(durations, 0.99) * 1000,
+            'mean_queries': sum(sample['queries']) / len(durations),
+            'max_queries': max(sample['queries']),
+        }
+    return results, iterations / total
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        if current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{name} : p50 {previous['p50_ms']:.2f} -> {current['p50_ms']:.2f} ms")
+        if current['mean_queries'] > previous['mean_queries'] + 0.5:
+            regressions.append(
+                f"{name} : requêtes SQL {previous['mean_queries']:.1f} -> {current['mean_queries']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--beds', type=int, default=30)
+    parser.add_argument('--size', type=int, default=20, help="côté des parcelles (cases, 20 au plus)")
+    parser.add_argument('--cultures', type=int, default=200)
+    parser.add_argument('--versions', type=int, default=30)
+    parser.add_argument('--fill', type=float, default=0.6, help="proportion de cases plantées")
+    parser.add_argument('--iterations', type=int, default=2000, help="nombre de requêtes rejouées")
+    parser.add_argument('--warmup', type=int, default=100, help="requêtes ignorées avant la mesure")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="fichier JSON où enregistrer les résultats")
+    parser.add_argument('--baseline', help="résultats JSON de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="ralentissement du p50 toléré par rapport à la référence (0.25 = 25 %%)")
+    args = parser.parse_args()
+    args.size = max(1, min(args.size, 20))
+
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        application = potager.create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'benchmark.db'),
+            'SLOW_REQUEST_THRESHOLD_MS': None,
+        })
+        with application.app_context():
+            db.create_all()
+            potager.run_migrations()
+            build_start = time.perf_counter()
+            emojis = populate(args.beds, args.size, args.cultures, args.versions, args.fill, args.seed)
+            build_time = time.perf_counter() - build_start
+
+            scenarios = workflows(args.beds, args.size, emojis, date.today().year)
+            client = application.test_client()
+            if args.warmup:
+                run(client, scenarios, args.warmup, args.seed + 1)
+            results, throughput = run(client, scenarios, args.iterations, args.seed)
+            db.session.remove()
+            db.engine.dispose()
+
+    print(f"{args.beds} parcelles de {args.size}x{args.size}, {args.cultures} cultures, "
+          f"{args.versions} versions (génération {build_time:.1f}s)\n")
+    print(f"{'route':<38}{'req':>6}{'req/s':>9}{'p50 (ms)':>10}{'p99 (ms)':>10}{'SQL':>7}{'err':>5}")
+    for name, result in results.items():
+        print(f"{name:<38}{result['requests']:>6}{result['throughput_rps']:>9.0f}"
+              f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['mean_queries']:>7.1f}{result['errors']:>5}")
+    print(f"\nDébit global : {throughput:.0f} req/s")
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'parameters': vars(args),
+        'throughput_rps': throughput,
+        'endpoints': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        print(f"Résultats enregistrés dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("\nRégressions par rapport à la référence :")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nAucune régression par rapport à la référence.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Mesure le coût des recherches de cases et de la jointure de popularité,
+avant et après les index ajoutés par la migration 3.
+
+    python backend/benchmark_schema.py --beds 300 --cultures 500
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+SCHEMA = """
+CREATE TABLE culture (
+    id INTEGER PRIMARY KEY, nom VARCHAR(50) NOT NULL, date_semis DATE NOT NULL,
+    type_culture VARCHAR(20) NOT NULL, date_repiquage DATE, date_recolte DATE,
+    commentaire VARCHAR(255), couleur VARCHAR(7) NOT NULL, emoji VARCHAR(10), temp_emoji VARCHAR(10)
+);
+CREATE TABLE parcelle_config (
+    id INTEGER PRIMARY KEY, nom VARCHAR(50) NOT NULL, rows INTEGER NOT NULL, cols INTEGER NOT NULL
+);
+CREATE TABLE parcelle (
+    id INTEGER PRIMARY KEY, parcelle_config_id INTEGER NOT NULL REFERENCES parcelle_config (id),
+    row INTEGER NOT NULL, col INTEGER NOT NULL, culture_emoji VARCHAR(10)
+);
+CREATE TABLE parcelle_position (
+    id INTEGER PRIMARY KEY, parcelle_config_id INTEGER NOT NULL REFERENCES parcelle_config (id),
+    position_x INTEGER NOT NULL, position_y INTEGER NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE UNIQUE INDEX ix_parcelle_cell ON parcelle (parcelle_config_id, row, col);
+CREATE INDEX ix_culture_emoji ON culture (emoji);
+CREATE INDEX ix_parcelle_position_parcelle_config_id ON parcelle_position (parcelle_config_id);
+"""
+
+POPULAR_QUERY = """
+SELECT culture.id, culture.nom, coalesce(counts.count, 0) AS usage_count
+FROM culture LEFT OUTER JOIN (
+    SELECT culture_emoji, count(culture_emoji) AS count FROM parcelle GROUP BY culture_emoji
+) AS counts ON culture.emoji = counts.culture_emoji
+ORDER BY usage_count DESC, culture.nom
+"""
+
+QUERIES = {
+    'case (update_parcelle)': (
+        "SELECT id FROM parcelle WHERE parcelle_config_id = ? AND row = ? AND col = ?", 'cell'),
+    'parcelle (get_parcelle)': (
+        "SELECT row, col, culture_emoji FROM parcelle WHERE parcelle_config_id = ?", 'bed'),
+    'position': (
+        "SELECT id FROM parcelle_position WHERE parcelle_config_id = ?", 'bed'),
+    'popularité (jointure)': (POPULAR_QUERY, None),
+}
+
+
+def populate(connection, beds, size, cultures, fill, seed):
+    rng = random.Random(seed)
+    emojis = [chr(0x1F330 + i % 200) + str(i // 200) for i in range(cultures)]
+    connection.executemany(
+        "INSERT INTO culture (nom, date_semis, type_culture, couleur, emoji) VALUES (?, ?, ?, ?, ?)",
+        [(f"culture {i}", '2025-03-01', 'pleine terre', '#00aa00', emoji) for i, emoji in enumerate(emojis)]
+    )
+    connection.executemany(
+        "INSERT INTO parcelle_config (id, nom, rows, cols) VALUES (?, ?, ?, ?)",
+        [(bed, f"parcelle {bed}", size, size) for bed in range(1, beds + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO parcelle_position (parcelle_config_id, position_x, position_y) VALUES (?, ?, ?)",
+        [(bed, bed % 20, bed // 20) for bed in range(1, beds + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO parcelle (parcelle_config_id, row, col, culture_emoji) VALUES (?, ?, ?, ?)",
+        (
+            (bed, row, col, rng.choice(emojis))
+            for bed in range(1, beds + 1)
+            for row in range(size)
+            for col in range(size)
+            if rng.random() < fill
+        )
+    )
+    connection.commit()
+
+
+def run(connection, beds, size, lookups, seed):
+    rng = random.Random(seed)
+    results = {}
+    for label, (sql, kind) in QUERIES.items():
+        plan = ' / '.join(row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + sql,
+                                                                (1, 0, 0) if kind == 'cell' else (1,) if kind else ()))
+        repeat = lookups if kind else max(1, lookups // 100)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            bed = rng.randint(1, beds)
+            if kind == 'cell':
+                params = (bed, rng.randrange(size), rng.randrange(size))
+            elif kind == 'bed':
+                params = (bed,)
+            else:
+                params = ()
+            connection.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - start
+        results[label] = (elapsed / repeat * 1e6, plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--beds', type=int, default=200)
+    parser.add_argument('--size', type=int, default=20, help="côté des parcelles (cases)")
+    parser.add_argument('--cultures', type=int, default=300)
+    parser.add_argument('--fill', type=float, default=0.6, help="proportion de cases plantées")
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for label, indexes in (('avant', ''), ('après', INDEXES)):
+            connection = sqlite3.connect(os.path.join(directory, f"{label}.db"))
+            connection.executescript(SCHEMA + indexes)
+            populate(connection, args.beds, args.size, args.cultures, args.fill, args.seed)
+            connection.execute("ANALYZE")
+            results[label] = run(connection, args.beds, args.size, args.lookups, args.seed)
+            connection.close()
+
+    print(f"{args.beds} parcelles de {args.size}x{args.size}, {args.cultures} cultures\n")
+    print(f"{'requête':<26}{'avant (µs)':>14}{'après (µs)':>14}{'gain':>8}")
+    for label in QUERIES:
+        before, after = results['avant'][label][0], results['après'][label][0]
+        print(f"{label:<26}{before:>14.1f}{after:>14.1f}{before / after:>7.1f}x")
+    print("\nPlans d'exécution")
+    for label in QUERIES:
+        print(f"  {label}\n    avant : {results['avant'][label][1]}\n    après : {results['après'][label][1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+from datetime import date
+
+# Prévisions hebdomadaires du travail au potager : nombre de cases semées,
+# repiquées et récoltées chaque semaine, et nombre de cases occupées.
+#
+# Les cases sont d'abord regroupées par culture (une requête GROUP BY dans
+# app.py) : chaque groupe est (nombre de cases, semis, repiquage, récolte).
+# Les dates deviennent des décalages en jours depuis le début de la période,
+# puis des numéros de semaine ; les histogrammes sont des sommes pondérées par
+# semaine. L'occupation utilise un tableau de différences (+n la première
+# semaine, -n après la dernière) suivi d'une somme cumulée.
+#
+# Les groupes sont peu nombreux (une entrée par culture plantée) : le calcul
+# est fait en Python pur.
+
+EVENTS = ('semis', 'repiquage', 'recolte')
+
+# Décalage des dates absentes : toujours hors de la période
+MISSING = -(1 << 40)
+
+
+def _offset(day, start):
+    return (day - start).days if isinstance(day, date) else MISSING
+
+
+# Une case est occupée du repiquage (à défaut, du semis) jusqu'à la récolte
+# (à défaut, jusqu'au début de l'occupation)
+def _occupation(semis, repiquage, recolte, start):
+    first = _offset(repiquage or semis, start)
+    last = _offset(recolte, start) if recolte else first
+    return first, last
+
+
+def weekly_forecast(groups, start, weeks):
+    """Histogrammes hebdomadaires {'semis', 'repiquage', 'recolte', 'occupied'}
+    (listes de `weeks` entiers) pour des groupes (cases, semis, repiquage, récolte)."""
+    result = {name: [0] * weeks for name in EVENTS}
+    difference = [0] * (weeks + 1)
+    for count, semis, repiquage, recolte in groups:
+        for name, day in zip(EVENTS, (semis, repiquage, recolte)):
+            offset = _offset(day, start)
+            if 0 <= offset < weeks * 7:
+                result[name][offset // 7] += count
+        first, last = _occupation(semis, repiquage, recolte, start)
+        if first == MISSING or last < 0 or first >= weeks * 7 or last < first:
+            continue
+        difference[max(first // 7, 0)] += count
+        difference[min(last // 7, weeks - 1) + 1] -= count
+
+    occupied, running = [], 0
+    for change in difference[:weeks]:
+        running += change
+        occupied.append(running)
+    result['occupied'] = occupied
+    return result
+
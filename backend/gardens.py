@@ -0,0 +1,105 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.engine import make_url
+
+# Potagers indépendants : chacun a sa propre base SQLite (donc son propre
+# verrou d'écriture), ouverte à la première requête qui le désigne. Un potager
+# n'est créé que sur demande explicite (route ou commande dédiée) : désigner un
+# identifiant inconnu ne crée ni fichier ni dossier. Les moteurs ouverts sont
+# gardés dans un registre LRU borné ; le moins récemment utilisé est fermé
+# (connexions inactives libérées) quand la limite est atteinte.
+# La logique propre à l'application (schéma, caches par potager) est dans app.py.
+
+GARDEN_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+def is_valid_garden_id(garden_id):
+    return bool(garden_id) and GARDEN_ID_PATTERN.fullmatch(garden_id) is not None
+
+
+# URL de la base d'un potager à partir du modèle, ex. "sqlite:///gardens/{garden}.db".
+# Comme pour Flask-SQLAlchemy, un chemin SQLite relatif part du dossier d'instance.
+# Le dossier de la base n'est créé qu'avec `create`.
+def garden_database_uri(template, garden_id, instance_path, create=False):
+    url = make_url(template.format(garden=garden_id))
+    if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        path = url.database
+        if not os.path.isabs(path):
+            path = os.path.join(instance_path, path)
+        if create:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        url = url.set(database=path)
+    return url
+
+
+# La base existe-t-elle déjà ? Seuls les fichiers SQLite peuvent être vérifiés ;
+# une base en mémoire ou sur un serveur est considérée comme existante.
+def garden_database_exists(url):
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return True
+    return os.path.isfile(url.database)
+
+
+class GardenRegistry:
+    def __init__(self, open_garden, close_garden, maxsize):
+        self.maxsize = maxsize
+        self._open = open_garden
+        self._close = close_garden
+        self._gardens = OrderedDict()
+        self._lock = threading.Lock()
+        # Un verrou par potager en cours d'ouverture : deux requêtes simultanées
+        # sur un nouveau potager ne créent pas deux fois son schéma
+        self._opening = {}
+
+    # Potager ouvert (ou ouvert à l'instant) ; `create` est transmis à la
+    # fonction d'ouverture, qui lève LookupError pour un potager inconnu
+    def get(self, garden_id, create=False):
+        with self._lock:
+            garden = self._gardens.get(garden_id)
+            if garden is not None:
+                self._gardens.move_to_end(garden_id)
+                return garden
+            opening = self._opening.setdefault(garden_id, threading.Lock())
+
+        with opening:
+            with self._lock:
+                garden = self._gardens.get(garden_id)
+                if garden is not None:
+                    return garden
+            evicted = []
+            try:
+                garden = self._open(garden_id, create)
+                with self._lock:
+                    self._gardens[garden_id] = garden
+                    while len(self._gardens) > self.maxsize:
+                        evicted.append(self._gardens.popitem(last=False)[1])
+            finally:
+                with self._lock:
+                    self._opening.pop(garden_id, None)
+        for old in evicted:
+            self._close(old)
+        return garden
+
+    # Identifiants des potagers ouverts, du moins au plus récemment utilisé
+    def names(self):
+        with self._lock:
+            return list(self._gardens)
+
+    # Potagers ouverts, sans changer leur ordre d'utilisation
+    def open_gardens(self):
+        with self._lock:
+            return list(self._gardens.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._gardens)
+
+    def close_all(self):
+        with self._lock:
+            gardens = list(self._gardens.values())
+            self._gardens.clear()
+        for garden in gardens:
+            self._close(garden)
@@ -1,7 +1,8 @@
-from app import app, db, ParcelleConfig, Culture
-from datetime import datetime
+from app import create_app, db, ParcelleConfig, Culture
+from datetime import date
 
 def init_test_data():
+    app = create_app()
     with app.app_context():
         # Création de la parcelle de test
         test_parcelle = ParcelleConfig(
@@ -13,9 +14,9 @@ def init_test_data():
         # Création de la culture tomate
         test_culture = Culture(
             nom="tomate",
-            date_semis="2025-01-20",
+            date_semis=date(2025, 1, 20),
             type_culture="pleine terre",
-            date_recolte="2025-07-20",  # Date de récolte approximative
+            date_recolte=date(2025, 7, 20),  # Date de récolte approximative
             commentaire="Culture de test",
             couleur="#ff0000",  # Rouge pour les tomates
             emoji="🍅"
@@ -0,0 +1,230 @@
+import abc
+import asyncio
+import json
+import logging
+import random
+import threading
+import urllib.request
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Infrastructure des notifications : planification (intervalle ou cron),
+# envoi asynchrone (webhook Slack), réessais avec backoff et boucle asyncio
+# dans un thread dédié. La logique métier (échéances des cultures,
+# déduplication en base) est dans app.py.
+
+logger = logging.getLogger(__name__)
+
+
+# Expression cron à 5 champs : minute heure jour-du-mois mois jour-de-la-semaine
+# (0 = dimanche). Chaque champ accepte *, des valeurs, des listes, des plages et des pas.
+class CronSpec:
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Expression cron invalide : {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for item in field.split(','):
+            step = 1
+            if '/' in item:
+                item, step_text = item.split('/', 1)
+                step = int(step_text)
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = (int(value) for value in item.split('-', 1))
+            else:
+                start = end = int(item)
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Champ cron invalide : {field}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day):
+        weekday = (day.weekday() + 1) % 7
+        if self.any_day or self.any_weekday:
+            return day.day in self.days and weekday in self.weekdays
+        # Comme cron : si les deux champs sont restreints, l'un ou l'autre suffit
+        return day.day in self.days or weekday in self.weekdays
+
+    # Prochaine échéance strictement après `moment`
+    def next_after(self, moment):
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(366 * 5):
+            if day.month in self.months and self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Aucune échéance pour l'expression cron : {self.expression}")
+
+
+# Interface des expéditeurs de notifications : chaque expéditeur fournit send()
+class NotificationSender(abc.ABC):
+    @abc.abstractmethod
+    async def send(self, message):
+        ...
+
+
+# Envoi vers un webhook entrant Slack ; l'appel HTTP bloquant tourne dans un thread
+class SlackWebhookSender(NotificationSender):
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, message):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(message).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise RuntimeError(f"Webhook : statut HTTP {response.status}")
+
+    async def send(self, message):
+        await asyncio.to_thread(self._post, message)
+
+
+# Envoyer un message avec réessais et backoff exponentiel (avec gigue)
+async def send_with_retry(sender, message, attempts=4, base_delay=1.0, max_delay=60.0):
+    for attempt in range(1, attempts + 1):
+        try:
+            await sender.send(message)
+            return
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            logger.warning(f"Échec d'envoi de notification ({e}), nouvel essai dans {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+# Découper une liste en lots de taille fixe
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Planificateur : exécute `job` (coroutine) à intervalle fixe ou selon une
+# expression cron, sur sa propre boucle asyncio dans un thread démon, hors du
+# traitement des requêtes HTTP.
+class BackgroundScheduler:
+    def __init__(self, job, interval=None, cron=None, name='potager-notifications'):
+        if interval is None and cron is None:
+            raise ValueError("Un intervalle ou une expression cron est requis")
+        self.job = job
+        self.interval = interval
+        self.cron = CronSpec(cron) if cron else None
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._stopping = None
+
+    def _delay_until_next_run(self):
+        if self.cron:
+            now = datetime.now()
+            return (self.cron.next_after(now) - now).total_seconds()
+        return self.interval
+
+    async def run(self):
+        self._stopping = asyncio.Event()
+        while not self._stopping.is_set():
+            try:
+                await self.job()
+            except Exception as e:
+                logger.error(f"Erreur du planificateur {self.name} : {str(e)}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self._delay_until_next_run())
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_until_complete, args=(self.run(),), name=self.name, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        if self._thread is None:
+            return
+        if self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+# Faux webhook local pour les essais : enregistre les messages reçus et peut
+# simuler des échecs. Lancement autonome : python notifications.py [port]
+class StubWebhookServer:
+    def __init__(self, host='127.0.0.1', port=0):
+        stub = self
+        self.received = []
+        self.failures_to_simulate = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if stub.failures_to_simulate > 0:
+                    stub.failures_to_simulate -= 1
+                    self.send_response(500)
+                else:
+                    stub.received.append(json.loads(body or b'{}'))
+                    self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+    server = StubWebhookServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8002).start()
+    print(f"Faux webhook Slack à l'écoute sur {server.url}")
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.5)
+            for message in server.received[seen:]:
+                print(message.get('text', message))
+            seen = len(server.received)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+# Rétention des versions : éclaircissement par paliers d'âge.
+#
+# Une politique est une suite de paliers (granularité, âge maximum en jours),
+# du plus récent au plus ancien, par exemple :
+#   [('all', 1), ('day', 30), ('week', 365), ('month', None)]
+# soit : tout garder pendant un jour, puis une version par jour pendant un
+# mois, une par semaine pendant un an et une par mois au-delà. Dans chaque
+# période (jour, semaine ISO, mois, en UTC), seule la version la plus récente
+# est gardée ; les versions plus anciennes que le dernier palier sont
+# supprimées (None = sans limite d'âge). Les versions protégées (épinglées,
+# courante...) et la plus récente sont toujours gardées et représentent
+# leur période. La suppression elle-même est faite par app.py.
+
+GRANULARITIES = ('all', 'hour', 'day', 'week', 'month', 'year')
+
+
+# Valider une politique ; renvoie [(granularité, âge maximum en timedelta ou None)]
+def parse_policy(policy):
+    tiers, previous = [], timedelta(0)
+    for index, (granularity, max_age_days) in enumerate(policy or []):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularité de rétention inconnue : {granularity}")
+        if max_age_days is None:
+            if index != len(policy) - 1:
+                raise ValueError("Seul le dernier palier de rétention peut être sans limite d'âge")
+            tiers.append((granularity, None))
+            continue
+        max_age = timedelta(days=max_age_days)
+        if max_age <= previous:
+            raise ValueError("Les âges maximums des paliers de rétention doivent être croissants")
+        tiers.append((granularity, max_age))
+        previous = max_age
+    return tiers
+
+
+# Période d'un horodatage pour une granularité
+def period(granularity, moment):
+    if granularity == 'hour':
+        return moment.date(), moment.hour
+    if granularity == 'day':
+        return moment.date()
+    if granularity == 'week':
+        return tuple(moment.isocalendar()[:2])
+    if granularity == 'month':
+        return moment.year, moment.month
+    return moment.year
+
+
+# Identifiants des versions à supprimer. `versions` : (id, created_at) ;
+# `protected` : identifiants toujours gardés. Sans palier, rien n'est supprimé.
+def versions_to_thin(versions, now, policy, protected=()):
+    tiers = parse_policy(policy)
+    if not tiers:
+        return []
+    ordered = sorted(versions, key=lambda version: (version[1], version[0]), reverse=True)
+    protected = set(protected)
+    if ordered:
+        protected.add(ordered[0][0])
+
+    kept_periods, doomed = set(), []
+    for version_id, created_at in ordered:
+        age = now - created_at
+        tier = next(
+            (index for index, (_, max_age) in enumerate(tiers) if max_age is None or age <= max_age),
+            None
+        )
+        if tier is None:
+            if version_id not in protected:
+                doomed.append(version_id)
+            continue
+        granularity = tiers[tier][0]
+        if granularity == 'all':
+            continue
+        key = (tier, period(granularity, created_at))
+        if key in kept_periods and version_id not in protected:
+            doomed.append(version_id)
+        kept_periods.add(key)
+    return sorted(doomed)
@@ -0,0 +1,89 @@
+import gzip
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+# Sérialisation JSON rapide et compression des réponses.
+#
+# orjson et brotli sont facultatifs : sans orjson, le sérialiseur standard de
+# Flask est utilisé (mêmes conversions, sortie équivalente) ; sans brotli,
+# seules les réponses gzip sont proposées. La négociation et le seuil de
+# compression sont appliqués dans app.py.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Types de contenu compressés (les flux, déjà découpés en morceaux, ne le sont pas)
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'application/x-ndjson', 'text/plain', 'text/csv', 'text/html',
+})
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Fournisseur JSON de Flask reposant sur orjson quand il est installé.
+
+    Les conversions restent celles de Flask (dates au format HTTP, clés non
+    textuelles, tri des clés) pour que la sortie ne dépende pas du module
+    disponible.
+    """
+
+    def _options(self, pretty=False):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    # Corps de la réponse produit directement en octets, sans passer par une chaîne
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(pretty) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# Une ligne NDJSON compacte, en octets UTF-8
+def json_line(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+# Encodages proposés, par ordre de préférence à qualité égale côté client
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+# Meilleur encodage accepté par le client (en-tête Accept-Encoding analysé par
+# werkzeug), ou None. Sans en-tête, la réponse n'est pas compressée.
+def negotiate_encoding(accept_encodings):
+    if not accept_encodings:
+        return None
+    return accept_encodings.best_match(available_encodings())
+
+
+def compress(body, encoding, gzip_level=6, brotli_quality=5):
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    # mtime fixe : un même contenu donne toujours les mêmes octets
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
@@ -0,0 +1,90 @@
+# Index spatial des emprises des parcelles dans le potager
+#
+# Une parcelle placée occupe les cases [y, y + rows) x [x, x + cols) du
+# potager. Le potager est découpé en seaux de BUCKET_SIZE x BUCKET_SIZE cases ;
+# chaque seau connaît les parcelles qui le recouvrent. Un test de collision ne
+# compare donc le rectangle demandé qu'aux parcelles voisines, quelle que soit
+# la taille du potager.
+
+BUCKET_SIZE = 8
+
+
+class OccupancyIndex:
+    def __init__(self, bucket_size=BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        # {parcelle_id: (x, y, rows, cols)}
+        self.footprints = {}
+        # {(seau_ligne, seau_colonne): {parcelle_id, ...}}
+        self.buckets = {}
+
+    def _bucket_keys(self, x, y, rows, cols):
+        size = self.bucket_size
+        return [
+            (bucket_row, bucket_col)
+            for bucket_row in range(y // size, (y + rows - 1) // size + 1)
+            for bucket_col in range(x // size, (x + cols - 1) // size + 1)
+        ]
+
+    # Ajouter ou déplacer une parcelle ; une emprise vide n'est pas indexée
+    def place(self, parcelle_id, x, y, rows, cols):
+        self.remove(parcelle_id)
+        if rows < 1 or cols < 1:
+            return
+        self.footprints[parcelle_id] = (x, y, rows, cols)
+        for key in self._bucket_keys(x, y, rows, cols):
+            self.buckets.setdefault(key, set()).add(parcelle_id)
+
+    def remove(self, parcelle_id):
+        footprint = self.footprints.pop(parcelle_id, None)
+        if footprint is None:
+            return
+        for key in self._bucket_keys(*footprint):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(parcelle_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    # Parcelles dont l'emprise recouvre le rectangle, sauf `ignore`
+    def overlaps(self, x, y, rows, cols, ignore=None):
+        if rows < 1 or cols < 1:
+            return []
+        candidates = set()
+        for key in self._bucket_keys(x, y, rows, cols):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(ignore)
+        return sorted(
+            parcelle_id for parcelle_id in candidates
+            if _intersects(self.footprints[parcelle_id], (x, y, rows, cols))
+        )
+
+    # Parcelles qui dépasseraient d'un potager de garden_rows x garden_cols
+    def outside(self, garden_rows, garden_cols):
+        return sorted(
+            parcelle_id for parcelle_id, (x, y, rows, cols) in self.footprints.items()
+            if x < 0 or y < 0 or x + cols > garden_cols or y + rows > garden_rows
+        )
+
+    # Premier emplacement libre (ligne par ligne) pour une parcelle de rows x cols,
+    # ou None. Une collision fait sauter directement après la parcelle rencontrée.
+    def find_free_slot(self, rows, cols, garden_rows, garden_cols):
+        if rows < 1 or cols < 1:
+            return None
+        for y in range(garden_rows - rows + 1):
+            x = 0
+            while x + cols <= garden_cols:
+                hits = self.overlaps(x, y, rows, cols)
+                if not hits:
+                    return x, y
+                x = max(self.footprints[hit][0] + self.footprints[hit][3] for hit in hits)
+        return None
+
+
+def fits_in_garden(x, y, rows, cols, garden_rows, garden_cols):
+    return x >= 0 and y >= 0 and x + cols <= garden_cols and y + rows <= garden_rows
+
+
+def _intersects(a, b):
+    ax, ay, arows, acols = a
+    bx, by, brows, bcols = b
+    return ax < bx + bcols and bx < ax + acols and ay < by + brows and by < ay + arows
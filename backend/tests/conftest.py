@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as potager  # noqa: E402
+
+
+# Application sur une base temporaire, créée et migrée comme en production
+# (`flask --app app migrate`)
+def make_app(tmp_path, name='potager', **config):
+    application = potager.create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / name}.db",
+        **config,
+    })
+    result = application.test_cli_runner().invoke(args=['migrate'])
+    assert result.exit_code == 0, result.output
+    return application
+
+
+@pytest.fixture
+def app(tmp_path):
+    application = make_app(tmp_path)
+    with application.app_context():
+        yield application
+        potager.db.session.remove()
+        for engine in potager.db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_culture(client, nom, emoji, **fields):
+    response = client.post('/cultures', json={
+        'nom': nom, 'emoji': emoji, 'date_semis': '2026-03-01', 'type_culture': 'serre', **fields
+    })
+    assert response.status_code == 201, response.json
+    return next(culture['id'] for culture in client.get('/cultures').json if culture['nom'] == nom)
+
+
+def add_parcelle(client, nom, rows=2, cols=2, **position):
+    response = client.post('/parcelles/create', json={'nom': nom, 'rows': rows, 'cols': cols, **position})
+    assert response.status_code == 200, response.json
+    return response.json['id']
+
+
+def set_cell(client, parcelle_id, row, col, culture_id):
+    response = client.post('/parcelles', json={
+        'parcelle_id': parcelle_id, 'row': row, 'col': col, 'culture_id': culture_id
+    })
+    assert response.status_code == 200, response.json
@@ -0,0 +1,52 @@
+from conftest import add_culture, add_parcelle, make_app, set_cell
+
+
+def garden_snapshot(client):
+    versions = client.get('/versions?limit=200').json['versions']
+    return {
+        'cultures': client.get('/cultures').json,
+        'garden': client.get('/garden').json,
+        'versions': versions,
+        'contents': {version['id']: client.get(f'/versions/{version["id"]}').json for version in versions},
+        'history': client.get('/history/parcelles/1').json,
+    }
+
+
+def populate(client):
+    tomate = add_culture(client, 'Tomate', '🍅', famille='Solanacées', date_recolte='2026-08-01')
+    carotte = add_culture(client, 'Carotte', '🥕')
+    nord = add_parcelle(client, 'nord', 3, 3, x=0, y=0)
+    sud = add_parcelle(client, 'sud', 2, 4, x=4, y=0)
+    set_cell(client, nord, 0, 0, tomate)
+    set_cell(client, sud, 1, 3, carotte)
+    client.post('/versions', json={'name': 'printemps', 'whole_garden': True})
+    set_cell(client, nord, 2, 2, carotte)
+    client.post('/versions', json={'whole_garden': True, 'pinned': True})
+
+
+def test_export_import_round_trip(tmp_path):
+    source = make_app(tmp_path, 'source').test_client()
+    populate(source)
+    expected = garden_snapshot(source)
+
+    for export_format, content_type in (('ndjson', 'application/x-ndjson'), ('gzip', 'application/gzip')):
+        backup = source.get(f'/export?format={export_format}').data
+        target = make_app(tmp_path, f'copie-{export_format}').test_client()
+        response = target.post('/import', data=backup, content_type=content_type)
+        assert response.status_code == 200, response.json
+        assert garden_snapshot(target) == expected
+
+
+def test_import_requires_replace_for_a_non_empty_garden(tmp_path):
+    source = make_app(tmp_path, 'source').test_client()
+    populate(source)
+    backup = source.get('/export').data
+
+    target = make_app(tmp_path, 'cible').test_client()
+    add_parcelle(target, 'existante')
+    assert target.post('/import', data=backup, content_type='application/x-ndjson').status_code == 409
+    assert [parcelle['nom'] for parcelle in target.get('/parcelles').json] == ['existante']
+
+    response = target.post('/import?replace=true', data=backup, content_type='application/x-ndjson')
+    assert response.status_code == 200, response.json
+    assert garden_snapshot(target) == garden_snapshot(source)
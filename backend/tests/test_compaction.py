@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+import app as potager
+from conftest import add_culture, add_parcelle, make_app, set_cell
+
+VERSION_FIELDS = ('name', 'parcelles', 'parcelle_positions', 'parcelle_cultures')
+
+
+def version_contents(client, version_id):
+    version = client.get(f'/versions/{version_id}').json
+    return {field: version[field] for field in VERSION_FIELDS}
+
+
+def test_compaction_preserves_remaining_versions(tmp_path):
+    # Chaînes courtes : le compactage doit réécrire des deltas et des images clés
+    application = make_app(tmp_path, VERSION_KEYFRAME_INTERVAL=4)
+    client = application.test_client()
+    cultures = [add_culture(client, nom, emoji) for nom, emoji in (('Tomate', '🍅'), ('Carotte', '🥕'))]
+    first = add_parcelle(client, 'nord', 3, 3, x=0, y=0)
+    second = add_parcelle(client, 'sud', 2, 2, x=5, y=0)
+
+    version_ids = []
+    for number in range(40):
+        set_cell(client, first if number % 3 else second, number % 2, number % 2, cultures[number % 2])
+        if number == 25:
+            client.post('/parcelles/position', json={'parcelleId': second, 'x': 5, 'y': 3})
+        response = client.post('/versions', json={'whole_garden': True, 'name': 'récolte' if number == 7 else None})
+        version_ids.append(response.json['id'])
+    pinned = version_ids[3]
+    assert client.post(f'/versions/{pinned}/pin').status_code == 200
+    named = version_ids[7]
+
+    # Une version toutes les 30 heures, la plus récente maintenant : 50 jours d'historique
+    with application.app_context():
+        now = potager.utcnow()
+        for age, version_id in enumerate(reversed(version_ids)):
+            potager.db.session.execute(
+                potager.db.update(potager.Version).where(potager.Version.id == version_id)
+                .values(created_at=now - timedelta(hours=30 * age))
+            )
+        potager.db.session.commit()
+
+    before = {version_id: version_contents(client, version_id) for version_id in version_ids}
+    current = client.get('/garden').json
+
+    with application.app_context():
+        result = potager.compact_versions(now=now)
+    assert result['deleted'] > 0 and result['rewritten'] > 0, result
+
+    remaining = [version['id'] for version in client.get('/versions?limit=200').json['versions']]
+    assert len(remaining) == len(version_ids) - result['deleted']
+    assert {pinned, named, version_ids[-1]} <= set(remaining)
+    for version_id in remaining:
+        assert version_contents(client, version_id) == before[version_id], version_id
+    for version_id in set(version_ids) - set(remaining):
+        assert client.get(f'/versions/{version_id}').status_code == 404
+
+    # Le potager et la version courante sont intacts, l'historique ne cite que des versions gardées
+    assert client.get('/garden').json == current
+    with application.app_context():
+        assert potager.current_version_id() == version_ids[-1]
+        history_versions = set(potager.db.session.execute(
+            potager.db.select(potager.CellHistory.version_id).distinct()
+        ).scalars())
+        assert history_versions <= set(remaining)
+        assert potager.db.session.execute(potager.db.text("PRAGMA foreign_key_check")).all() == []
+
+    # Un second passage ne supprime plus rien
+    with application.app_context():
+        assert potager.compact_versions(now=now)['deleted'] == 0
@@ -0,0 +1,34 @@
+from conftest import add_culture, add_parcelle, set_cell
+
+
+def test_deleted_culture_id_is_never_reused(client):
+    tomate = add_culture(client, 'tomate', '🍅')
+    parcelle = add_parcelle(client, 'nord')
+    set_cell(client, parcelle, 0, 0, tomate)
+    version = client.post('/versions', json={'whole_garden': True}).json['id']
+
+    assert client.delete(f'/cultures/{tomate}').status_code == 200
+    ortie = add_culture(client, 'ortie', '🌿')
+    assert ortie > tomate
+
+    # La version garde l'identifiant de la tomate : case vide, jamais attribuée à l'ortie
+    assert client.get(f'/versions/{version}').json['parcelle_cultures'][str(parcelle)][0] == ''
+    # Le potager et l'historique gardent le libellé de la culture supprimée
+    assert client.get(f'/parcelles/{parcelle}').json['grid'][0] == f'🍅,{tomate},tomate'
+    (entry,) = client.get(f'/history/parcelles/{parcelle}/cells/0/0').json['timeline']
+    assert entry['culture_emoji'] == f'🍅,{tomate},tomate'
+
+
+def test_cells_follow_culture_renames(client):
+    tomate = add_culture(client, 'tomate', '🍅')
+    parcelle = add_parcelle(client, 'nord')
+    set_cell(client, parcelle, 0, 0, tomate)
+    version = client.post('/versions', json={'whole_garden': True}).json['id']
+
+    culture = next(culture for culture in client.get('/cultures').json if culture['id'] == tomate)
+    response = client.put(f'/cultures/{tomate}', json={**culture, 'nom': 'tomate cerise', 'emoji': '🍒'})
+    assert response.status_code == 200, response.json
+
+    label = f'🍒,{tomate},tomate cerise'
+    assert client.get(f'/parcelles/{parcelle}').json['grid'][0] == label
+    assert client.get(f'/versions/{version}').json['parcelle_cultures'][str(parcelle)][0] == label
@@ -0,0 +1,19 @@
+import os
+
+from conftest import make_app
+
+
+def test_gardens_are_created_only_on_request(tmp_path):
+    gardens_dir = os.path.join(tmp_path, 'gardens')
+    application = make_app(tmp_path, GARDEN_DATABASE_URI=f"sqlite:///{gardens_dir}/{{garden}}.db")
+    client = application.test_client()
+
+    assert client.get('/garden', headers={'X-Garden': 'inconnu'}).status_code == 404
+    assert client.get('/garden?garden=inconnu').status_code == 404
+    assert not os.path.exists(os.path.join(gardens_dir, 'inconnu.db'))
+
+    # L'interface envoie X-Garden pour le potager affiché, y compris pour le créer
+    assert client.post('/gardens', json={'id': 'jardin'}, headers={'X-Garden': 'jardin'}).status_code == 201
+    assert client.post('/gardens', json={'id': 'jardin'}, headers={'X-Garden': 'jardin'}).status_code == 200
+    assert client.post('/gardens', json={'id': 'mauvais id'}).status_code == 400
+    assert client.get('/garden', headers={'X-Garden': 'jardin'}).json['parcelles'] == []
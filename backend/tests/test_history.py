@@ -0,0 +1,4 @@
+def test_rotation_rejects_out_of_range_years(client):
+    for since in (0, 10000, -1):
+        assert client.get(f'/history/rotation?since={since}').status_code == 400
+    assert client.get('/history/rotation?since=2020').json == {'seasons': 3, 'since': 2020, 'violations': []}
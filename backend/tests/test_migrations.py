@@ -0,0 +1,97 @@
+import pickle
+import sqlite3
+
+import app as potager
+from conftest import make_app
+
+# Schéma de la première version publiée, avant toute migration
+BASELINE_SCHEMA = """
+CREATE TABLE culture (
+    id INTEGER NOT NULL PRIMARY KEY, nom VARCHAR(50) NOT NULL, date_semis VARCHAR(10) NOT NULL,
+    type_culture VARCHAR(20) NOT NULL, date_repiquage VARCHAR(10), date_recolte VARCHAR(10),
+    commentaire VARCHAR(255), couleur VARCHAR(7) NOT NULL, emoji VARCHAR(10), temp_emoji VARCHAR(10)
+);
+CREATE TABLE parcelle_config (
+    id INTEGER NOT NULL PRIMARY KEY, nom VARCHAR(50) NOT NULL, rows INTEGER NOT NULL, cols INTEGER NOT NULL
+);
+CREATE TABLE parcelle (
+    id INTEGER NOT NULL PRIMARY KEY, parcelle_config_id INTEGER NOT NULL REFERENCES parcelle_config (id),
+    row INTEGER NOT NULL, col INTEGER NOT NULL, culture_emoji VARCHAR(10)
+);
+CREATE TABLE parcelle_position (
+    id INTEGER NOT NULL PRIMARY KEY, parcelle_config_id INTEGER NOT NULL REFERENCES parcelle_config (id),
+    position_x INTEGER NOT NULL, position_y INTEGER NOT NULL
+);
+CREATE TABLE version (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100), parcelles BLOB NOT NULL,
+    parcelle_positions BLOB NOT NULL, parcelle_cultures BLOB NOT NULL, created_at DATETIME, is_current BOOLEAN
+);
+CREATE TABLE potager_config (
+    id INTEGER NOT NULL PRIMARY KEY, rows INTEGER NOT NULL, cols INTEGER NOT NULL
+);
+"""
+
+
+def make_baseline_database(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.executemany(
+        "INSERT INTO culture (id, nom, date_semis, type_culture, date_recolte, couleur, emoji) "
+        "VALUES (?, ?, ?, 'serre', ?, '#ff0000', ?)",
+        [(1, 'Tomate', '2024-03-01', '2024-08-01', '🍅'), (2, 'Carotte', '2024-04-01', None, '🥕')]
+    )
+    connection.execute("INSERT INTO parcelle_config VALUES (1, 'Potager nord', 2, 2)")
+    connection.executemany(
+        "INSERT INTO parcelle (parcelle_config_id, row, col, culture_emoji) VALUES (1, ?, ?, ?)",
+        [(0, 0, '🍅'), (0, 1, '🥕'), (1, 1, '')]
+    )
+    connection.execute("INSERT INTO parcelle_position VALUES (1, 1, 3, 4)")
+    connection.execute("INSERT INTO potager_config VALUES (1, 12, 12)")
+    parcelles = pickle.dumps([{'id': 1, 'nom': 'Potager nord', 'rows': 2, 'cols': 2}])
+    positions = pickle.dumps({'1': {'x': 3, 'y': 4}})
+    for version_id, grid in ((1, ['🍅', '', '', '']), (2, ['🍅', '🥕', '', ''])):
+        connection.execute(
+            "INSERT INTO version VALUES (?, ?, ?, ?, ?, '2024-05-0' || ? || ' 10:00:00', ?)",
+            (version_id, f'v{version_id}', parcelles, positions, pickle.dumps({'1': grid}),
+             version_id, version_id == 2)
+        )
+    connection.commit()
+    connection.close()
+
+
+def test_baseline_database_migrates_to_latest_schema(tmp_path):
+    make_baseline_database(tmp_path / 'potager.db')
+    application = make_app(tmp_path)
+    client = application.test_client()
+
+    with application.app_context():
+        session = potager.db.session
+        assert session.execute(potager.db.text("PRAGMA user_version")).scalar() == len(potager.SCHEMA_MIGRATIONS)
+        assert session.execute(potager.db.text("PRAGMA foreign_key_check")).all() == []
+        for table in ('cell_history', 'current_version'):
+            targets = {row[2] for row in session.execute(potager.db.text(f"PRAGMA foreign_key_list({table})"))}
+            assert targets == {'version'}
+        schema = session.execute(potager.db.text("SELECT sql FROM sqlite_master WHERE name = 'culture'")).scalar()
+        assert 'AUTOINCREMENT' in schema.upper()
+        assert potager.current_version_id() == 2
+
+    cultures = {culture['nom']: culture for culture in client.get('/cultures').json}
+    assert cultures['Tomate']['date_semis'] == '2024-03-01'
+    assert cultures['Tomate']['date_recolte'] == '2024-08-01'
+
+    garden = client.get('/garden').json
+    assert garden['potager']['rows'] == 12
+    (parcelle,) = garden['parcelles']
+    assert parcelle['grid'] == ['🍅,1,Tomate', '🥕,2,Carotte', '', '']
+    assert (parcelle['position']['position_x'], parcelle['position']['position_y']) == (3, 4)
+
+    assert client.get('/versions/1').json['parcelle_cultures'] == {'1': ['🍅,1,Tomate', '', '', '']}
+    assert client.get('/versions/2').json['parcelle_cultures'] == {'1': ['🍅,1,Tomate', '🥕,2,Carotte', '', '']}
+
+
+def test_migrations_are_idempotent(tmp_path):
+    make_baseline_database(tmp_path / 'potager.db')
+    application = make_app(tmp_path)
+    result = application.test_cli_runner().invoke(args=['migrate'])
+    assert result.exit_code == 0, result.output
+    assert application.test_client().get('/versions/2').json['parcelle_cultures']['1'][1] == '🥕,2,Carotte'
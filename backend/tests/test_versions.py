@@ -0,0 +1,10 @@
+from conftest import add_parcelle
+
+
+def test_version_export_validates_its_parameters(client):
+    add_parcelle(client, 'nord')
+    version = client.post('/versions', json={'whole_garden': True}).json['id']
+
+    assert client.get(f'/versions/export/{version}?grid=sparse').status_code == 200
+    assert client.get(f'/versions/export/{version}?grid=plein').status_code == 400
+    assert client.get(f'/versions/export/{version + 1}').status_code == 404
@@ -0,0 +1,323 @@
+import json
+import zlib
+
+# Format de stockage des versions du potager
+#
+# Chaque version est un document JSON compressé (zlib). Les grilles sont
+# stockées de façon creuse (seules les cases occupées) et le contenu des cases
+# est encodé par dictionnaire : une palette par document, chaque case occupée
+# devient une paire [index, code]. Les cases sont aplaties dans une seule
+# liste [index, code, index, code, ...].
+#
+# Le contenu d'une case est l'identifiant de sa culture (entier), ou le texte
+# d'origine quand il ne correspond à aucune culture du catalogue. Le format 1
+# ne contenait que du texte (emojis) ; il reste lisible.
+#
+# Une version est soit une image complète ("keyframe"), soit un delta par
+# rapport à la version précédente de la chaîne :
+#   - 'cultures' : grilles complètes des parcelles nouvelles ou redimensionnées
+#   - 'changes'  : cases modifiées des autres parcelles (code 0 = case vidée)
+#   - 'removed'  : parcelles disparues
+#   - 'parcelles' / 'parcelle_positions' : seulement si elles ont changé
+#
+# L'état décodé d'une version est un dictionnaire :
+#   {'parcelles': [...], 'parcelle_positions': ...,
+#    'parcelle_cultures': {parcelle_id: (taille, {index: contenu})}}
+
+FORMAT_VERSION = 2
+READABLE_FORMATS = (1, 2)
+COMPRESSION_LEVEL = 6
+
+
+# Convertir une grille à plat en (taille, {index: emoji}) sans les cases vides
+def grid_to_cells(grid):
+    return len(grid), {index: emoji for index, emoji in enumerate(grid) if emoji}
+
+
+# Reconstruire la grille à plat à partir de sa forme creuse
+def cells_to_grid(size, cells):
+    grid = [''] * size
+    for index, emoji in cells.items():
+        if 0 <= index < size:
+            grid[index] = emoji
+    return grid
+
+
+# Convertir une liste creuse [[ligne, colonne, emoji], ...] en (taille, {index: emoji})
+def sparse_to_cells(parcelle, triples):
+    if not parcelle or not isinstance(parcelle.get('rows'), int) or not isinstance(parcelle.get('cols'), int):
+        raise ValueError("Dimensions de parcelle requises pour une grille creuse")
+    rows, cols = parcelle['rows'], parcelle['cols']
+    return rows * cols, {
+        row * cols + col: emoji for row, col, emoji in triples
+        if emoji and 0 <= row < rows and 0 <= col < cols
+    }
+
+
+# Construire un état à partir des données envoyées par le client : grilles
+# à plat (['', '🥕', ...]) ou creuses ([[ligne, colonne, emoji], ...])
+def state_from_grids(parcelles, parcelle_positions, parcelle_cultures):
+    by_id = {
+        str(parcelle['id']): parcelle
+        for parcelle in parcelles or [] if isinstance(parcelle, dict) and 'id' in parcelle
+    }
+    cultures = {}
+    for parcelle_id, grid in (parcelle_cultures or {}).items():
+        grid = grid or []
+        if grid and isinstance(grid[0], list):
+            cultures[str(parcelle_id)] = sparse_to_cells(by_id.get(str(parcelle_id)), grid)
+        else:
+            cultures[str(parcelle_id)] = grid_to_cells(grid)
+    return {
+        'parcelles': parcelles,
+        'parcelle_positions': parcelle_positions,
+        'parcelle_cultures': cultures
+    }
+
+
+# Grilles à plat d'un état, au format attendu par le frontend
+def state_grids(state):
+    return {
+        parcelle_id: cells_to_grid(size, cells)
+        for parcelle_id, (size, cells) in state['parcelle_cultures'].items()
+    }
+
+
+# Largeur de chaque grille d'un état (à défaut, toute la grille sur une ligne)
+def _grid_widths(state):
+    widths = {}
+    for parcelle in state['parcelles']:
+        if isinstance(parcelle, dict) and isinstance(parcelle.get('cols'), int) and parcelle['cols'] > 0:
+            widths[str(parcelle.get('id'))] = parcelle['cols']
+    return widths
+
+
+# Grilles creuses d'un état : {parcelle_id: [[ligne, colonne, emoji], ...]},
+# sans jamais construire la grille complète
+def state_cells(state):
+    widths = _grid_widths(state)
+    result = {}
+    for parcelle_id, (size, cells) in state['parcelle_cultures'].items():
+        width = widths.get(parcelle_id) or size or 1
+        result[parcelle_id] = [[index // width, index % width, cells[index]] for index in sorted(cells)]
+    return result
+
+
+# Copie d'un état dont le contenu des cases est converti par `convert`
+# (None ou '' = case vidée) ; les grilles inchangées restent partagées
+def map_state_cells(state, convert):
+    parcelle_cultures = {}
+    for parcelle_id, (size, cells) in state['parcelle_cultures'].items():
+        converted = {}
+        for index, value in cells.items():
+            value = convert(value)
+            if value:
+                converted[index] = value
+        parcelle_cultures[parcelle_id] = (size, cells) if converted == cells else (size, converted)
+    return {**state, 'parcelle_cultures': parcelle_cultures}
+
+
+# Taille de la plus grande grille d'un état
+def largest_grid(state):
+    return max((size for size, cells in state['parcelle_cultures'].values()), default=0)
+
+
+class _Palette:
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        if not value:
+            return 0
+        if value not in self.codes:
+            self.values.append(value)
+            self.codes[value] = len(self.values)
+        return self.codes[value]
+
+    def flatten(self, cells):
+        flat = []
+        for index in sorted(cells):
+            flat.append(index)
+            flat.append(self.code(cells[index]))
+        return flat
+
+
+def _compress(document):
+    raw = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def _decompress(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+def _unflatten(flat, palette):
+    return {flat[i]: palette[flat[i + 1] - 1] if flat[i + 1] else '' for i in range(0, len(flat), 2)}
+
+
+# Encoder une image complète d'un état
+def encode_keyframe(state):
+    palette = _Palette()
+    cultures = {
+        parcelle_id: [size, palette.flatten(cells)]
+        for parcelle_id, (size, cells) in state['parcelle_cultures'].items()
+    }
+    return _compress({
+        'f': FORMAT_VERSION,
+        'k': 1,
+        'parcelles': state['parcelles'],
+        'parcelle_positions': state['parcelle_positions'],
+        'palette': palette.values,
+        'cultures': cultures
+    })
+
+
+# Encoder un état sous forme de delta par rapport à l'état précédent
+def encode_delta(previous, state):
+    palette = _Palette()
+    document = {'f': FORMAT_VERSION, 'k': 0}
+
+    if state['parcelles'] != previous['parcelles']:
+        document['parcelles'] = state['parcelles']
+    if state['parcelle_positions'] != previous['parcelle_positions']:
+        document['parcelle_positions'] = state['parcelle_positions']
+
+    cultures, changes = {}, {}
+    previous_cultures = previous['parcelle_cultures']
+    for parcelle_id, (size, cells) in state['parcelle_cultures'].items():
+        if parcelle_id not in previous_cultures or previous_cultures[parcelle_id][0] != size:
+            cultures[parcelle_id] = [size, palette.flatten(cells)]
+            continue
+        previous_cells = previous_cultures[parcelle_id][1]
+        if previous_cells == cells:
+            continue
+        changed = {
+            index: emoji for index, emoji in cells.items()
+            if previous_cells.get(index) != emoji
+        }
+        changed.update({index: '' for index in previous_cells if index not in cells})
+        changes[parcelle_id] = palette.flatten(changed)
+
+    removed = [
+        parcelle_id for parcelle_id in previous_cultures
+        if parcelle_id not in state['parcelle_cultures']
+    ]
+
+    document['palette'] = palette.values
+    if cultures:
+        document['cultures'] = cultures
+    if changes:
+        document['changes'] = changes
+    if removed:
+        document['removed'] = removed
+    return _compress(document)
+
+
+# Décoder une version ; les deltas nécessitent l'état de la version précédente.
+# L'état précédent n'est jamais modifié (il peut être en cache).
+def decode_payload(payload, previous=None):
+    document = _decompress(payload)
+    if document.get('f') not in READABLE_FORMATS:
+        raise ValueError(f"Format de version inconnu : {document.get('f')}")
+    palette = document.get('palette', [])
+
+    if document.get('k'):
+        return {
+            'parcelles': document['parcelles'],
+            'parcelle_positions': document['parcelle_positions'],
+            'parcelle_cultures': {
+                parcelle_id: (size, _unflatten(flat, palette))
+                for parcelle_id, (size, flat) in document['cultures'].items()
+            }
+        }
+
+    if previous is None:
+        raise ValueError("Delta de version sans état précédent")
+
+    parcelle_cultures = dict(previous['parcelle_cultures'])
+    for parcelle_id in document.get('removed', []):
+        parcelle_cultures.pop(parcelle_id, None)
+    for parcelle_id, (size, flat) in document.get('cultures', {}).items():
+        parcelle_cultures[parcelle_id] = (size, _unflatten(flat, palette))
+    for parcelle_id, flat in document.get('changes', {}).items():
+        size, cells = parcelle_cultures[parcelle_id]
+        cells = dict(cells)
+        for index, emoji in _unflatten(flat, palette).items():
+            if emoji:
+                cells[index] = emoji
+            else:
+                cells.pop(index, None)
+        parcelle_cultures[parcelle_id] = (size, cells)
+
+    return {
+        'parcelles': document.get('parcelles', previous['parcelles']),
+        'parcelle_positions': document.get('parcelle_positions', previous['parcelle_positions']),
+        'parcelle_cultures': parcelle_cultures
+    }
+
+
+def _parcelles_by_id(state):
+    return {
+        str(parcelle['id']): parcelle
+        for parcelle in state['parcelles'] if isinstance(parcelle, dict) and 'id' in parcelle
+    }
+
+
+# Cases d'une parcelle indexées par (ligne, colonne), pour comparer aussi
+# des parcelles redimensionnées ; sans largeur connue, tout est sur une ligne
+def _cells_by_position(parcelle, size, cells):
+    cols = parcelle.get('cols') if parcelle else None
+    if not isinstance(cols, int) or cols < 1:
+        return {(0, index): emoji for index, emoji in cells.items()}
+    return {divmod(index, cols): emoji for index, emoji in cells.items()}
+
+
+# Différences entre deux états, par parcelle :
+#   {parcelle_id: {'status': 'added' | 'removed' | 'modified',
+#                  'before' / 'after': configuration si elle a changé,
+#                  'position': [avant, après] si elle a changé,
+#                  'cells': [(ligne, colonne, avant, après), ...]}}
+# Seules les parcelles modifiées apparaissent. Les grilles partagées entre
+# deux états d'une même chaîne (même objet) ne sont pas parcourues.
+def diff_states(before, after):
+    before_parcelles, after_parcelles = _parcelles_by_id(before), _parcelles_by_id(after)
+    before_cultures, after_cultures = before['parcelle_cultures'], after['parcelle_cultures']
+    before_positions = before['parcelle_positions'] if isinstance(before['parcelle_positions'], dict) else {}
+    after_positions = after['parcelle_positions'] if isinstance(after['parcelle_positions'], dict) else {}
+
+    parcelle_ids = list(dict.fromkeys(
+        [*after_parcelles, *after_cultures, *before_parcelles, *before_cultures]
+    ))
+    changes = {}
+    for parcelle_id in parcelle_ids:
+        old, new = before_parcelles.get(parcelle_id), after_parcelles.get(parcelle_id)
+        entry = {}
+        if old is None and parcelle_id not in before_cultures:
+            entry.update(status='added', after=new)
+        elif new is None and parcelle_id not in after_cultures:
+            entry.update(status='removed', before=old)
+        elif old != new:
+            entry.update(status='modified', before=old, after=new)
+
+        old_position = before_positions.get(parcelle_id)
+        new_position = after_positions.get(parcelle_id)
+        if old_position != new_position:
+            entry['position'] = [old_position, new_position]
+
+        old_grid, new_grid = before_cultures.get(parcelle_id), after_cultures.get(parcelle_id)
+        if old_grid is not new_grid and old_grid != new_grid:
+            old_cells = _cells_by_position(old, *old_grid) if old_grid else {}
+            new_cells = _cells_by_position(new, *new_grid) if new_grid else {}
+            cells = [
+                (row, col, old_cells.get((row, col), ''), new_cells.get((row, col), ''))
+                for row, col in sorted(old_cells.keys() | new_cells.keys())
+                if old_cells.get((row, col), '') != new_cells.get((row, col), '')
+            ]
+            if cells:
+                entry['cells'] = cells
+
+        if entry:
+            entry.setdefault('status', 'modified')
+            changes[parcelle_id] = entry
+    return changes
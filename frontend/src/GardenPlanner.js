@@ -11,9 +11,13 @@ function GardenPlanner() {
   const [parcelles, setParcelles] = useState([]);
   const [selectedParcelle, setSelectedParcelle] = useState(null);
   const [potagerSize, setPotagerSize] = useState({ rows: 10, cols: 10 });
+  // Taille maximale acceptée par le backend (POTAGER_MAX_SIZE)
+  const [potagerMaxSize, setPotagerMaxSize] = useState(1000);
   const [parcellePositions, setParcellePositions] = useState({});
   const [cultures, setCultures] = useState([]);
   const [versions, setVersions] = useState([]);
+  // Curseur de la page suivante des versions (null : tout est chargé)
+  const [versionsCursor, setVersionsCursor] = useState(null);
   const [showVersionsModal, setShowVersionsModal] = useState(false);
   const [lastSelectedVersion, setLastSelectedVersion] = useState(null);
   const [versionName, setVersionName] = useState('');
@@ -22,6 +26,11 @@ function GardenPlanner() {
   const [hoverTooltip, setHoverTooltip] = useState({ visible: false, text: '', x: 0, y: 0 });
   const [showCropSlider, setShowCropSlider] = useState(false);
   const cropSliderRef = useRef(null);
+  // Valeurs courantes lues par les gestionnaires du flux d'événements
+  const parcellesRef = useRef(parcelles);
+  const selectedParcelleRef = useRef(selectedParcelle);
+  parcellesRef.current = parcelles;
+  selectedParcelleRef.current = selectedParcelle;
 
   // Gestion du changement de taille
   const handleSizeChange = (type, value) => {
@@ -38,36 +47,6 @@ function GardenPlanner() {
     axios.get('http://localhost:8001/cultures/popular')
       .then(response => setCrops(response.data))
       .catch(error => console.error('Erreur chargement cultures:', error));
-
-    axios.get('http://localhost:8001/parcelles')
-      .then(response => setParcelles(response.data))
-      .catch(error => console.error('Erreur chargement parcelles:', error));
-  }, []);
-
-  // Charger les positions au démarrage
-  useEffect(() => {
-    const loadPositions = async () => {
-      try {
-        // Charger d'abord les positions
-        const positionsResponse = await axios.get('http://localhost:8001/parcelles/positions');
-        const positions = {};
-        positionsResponse.data.forEach(pos => {
-          positions[pos.parcelle_config_id] = {
-            row: pos.position_y,
-            col: pos.position_x
-          };
-        });
-        setParcellePositions(positions);
-
-        // Ensuite charger les parcelles
-        const parcellesResponse = await axios.get('http://localhost:8001/parcelles');
-        setParcelles(parcellesResponse.data);
-      } catch (error) {
-        console.error('Erreur chargement positions:', error);
-      }
-    };
-
-    loadPositions();
   }, []);
 
   // Charger les cultures au démarrage
@@ -77,14 +56,31 @@ function GardenPlanner() {
       .catch(error => console.error('Erreur chargement cultures:', error));
   }, []);
 
+  // Charger la première page des versions (les plus récentes)
+  const loadVersions = () => axios.get('http://localhost:8001/versions')
+    .then(response => {
+      setVersions(response.data.versions);
+      setVersionsCursor(response.data.next_cursor);
+      return response.data.versions;
+    });
+
+  // Ajouter la page suivante des versions à la liste
+  const loadMoreVersions = () => {
+    axios.get('http://localhost:8001/versions', { params: { cursor: versionsCursor } })
+      .then(response => {
+        setVersions(prev => [...prev, ...response.data.versions]);
+        setVersionsCursor(response.data.next_cursor);
+      })
+      .catch(error => console.error('Erreur chargement versions:', error));
+  };
+
   // Charger les versions au démarrage
   useEffect(() => {
-    axios.get('http://localhost:8001/versions')
-      .then(response => {
-        setVersions(response.data);
+    loadVersions()
+      .then(loadedVersions => {
         // Trouver la version la plus récente
-        if (response.data.length > 0) {
-          const mostRecent = response.data.reduce((prev, current) => {
+        if (loadedVersions.length > 0) {
+          const mostRecent = loadedVersions.reduce((prev, current) => {
             return new Date(current.created_at) > new Date(prev.created_at) ? current : prev;
           });
           setLastSelectedVersion(mostRecent.id);
@@ -94,52 +90,156 @@ function GardenPlanner() {
       .catch(error => console.error('Erreur chargement versions:', error));
   }, []);
 
-  // Charger les données initiales des parcelles
-  useEffect(() => {
-    const loadInitialData = async () => {
-      try {
-        // Charger toutes les parcelles
-        const parcellesResponse = await axios.get('http://localhost:8001/parcelles');
-        setParcelles(parcellesResponse.data);
-        
-        // Pour chaque parcelle, charger sa grille
-        for (const parcelle of parcellesResponse.data) {
-          const response = await axios.get(`http://localhost:8001/parcelles/${parcelle.id}`);
-          setParcelleGrids(prev => ({
-            ...prev,
-            [parcelle.id]: response.data.grid
-          }));
+  // Les grandes parcelles sont renvoyées en forme creuse ([ligne, colonne, emoji])
+  const toGrid = (parcelle) => parcelle.grid || applyCells(
+    Array(parcelle.rows * parcelle.cols).fill(''), parcelle.cells || [], parcelle.cols
+  );
+
+  // Charger tout le potager (parcelles, grilles, positions, taille) en une seule requête
+  const loadGarden = async () => {
+    try {
+      const response = await axios.get('http://localhost:8001/garden');
+      const { potager, parcelles: gardenParcelles } = response.data;
+
+      const positions = {};
+      const grids = {};
+      gardenParcelles.forEach(parcelle => {
+        if (parcelle.position) {
+          positions[parcelle.id] = {
+            row: parcelle.position.position_y,
+            col: parcelle.position.position_x
+          };
         }
-      } catch (error) {
-        console.error('Erreur chargement données initiales:', error);
+        grids[parcelle.id] = toGrid(parcelle);
+      });
+
+      setParcelles(gardenParcelles.map(({ grid, cells, position, ...config }) => config));
+      setParcellePositions(positions);
+      setParcelleGrids(grids);
+      setPotagerSize({
+        rows: potager.rows || 10,
+        cols: potager.cols || 10
+      });
+      if (potager.max_size) {
+        setPotagerMaxSize(potager.max_size);
       }
-    };
+      const selected = selectedParcelleRef.current;
+      if (selected && grids[selected]) {
+        setGrid(grids[selected]);
+      }
+    } catch (error) {
+      console.error('Erreur chargement données initiales:', error);
+    }
+  };
 
-    loadInitialData();
+  useEffect(() => {
+    loadGarden();
   }, []);
 
-  // Charger la taille du potager au démarrage
+  // Ajouter une parcelle une seule fois (réponse de création et événement du flux) ;
+  // le serveur la place au premier emplacement libre du potager
+  const addParcelle = ({ position, ...parcelle }) => {
+    setParcelles(prev => prev.some(p => p.id === parcelle.id) ? prev : [...prev, parcelle]);
+    if (position) {
+      setParcellePositions(prev => prev[parcelle.id] ? prev : {
+        ...prev,
+        [parcelle.id]: { row: position.y, col: position.x }
+      });
+    }
+    setParcelleGrids(prev => prev[parcelle.id] ? prev : {
+      ...prev,
+      [parcelle.id]: Array(parcelle.rows * parcelle.cols).fill('')
+    });
+  };
+
+  // Appliquer des cases modifiées [ligne, colonne, emoji] à une grille à plat
+  const applyCells = (grid, cells, cols) => {
+    const newGrid = [...grid];
+    cells.forEach(([row, col, emoji]) => {
+      newGrid[row * cols + col] = emoji;
+    });
+    return newGrid;
+  };
+
+  // Modifications en direct des autres utilisateurs (Server-Sent Events) :
+  // les deltas sont appliqués localement au lieu de recharger les grilles.
+  // EventSource se reconnecte seul et reprend au dernier événement reçu.
   useEffect(() => {
-    axios.get('http://localhost:8001/potager/size')
-      .then(response => {
-        if (response.data) {
-          setPotagerSize({
-            rows: response.data.rows || 10,
-            cols: response.data.cols || 10
-          });
-        }
-      })
-      .catch(error => console.error('Erreur chargement taille potager:', error));
+    // EventSource n'envoie pas d'en-têtes : le potager passe dans l'adresse
+    const garden = new URLSearchParams(window.location.search).get('garden');
+    const source = new EventSource('http://localhost:8001/events/stream'
+      + (garden ? `?garden=${encodeURIComponent(garden)}` : ''));
+    const on = (type, handler) => source.addEventListener(type, event => handler(JSON.parse(event.data)));
+
+    on('cells', ({ parcelle_id, cells }) => {
+      const parcelle = parcellesRef.current.find(p => String(p.id) === String(parcelle_id));
+      if (!parcelle) return;
+      setParcelleGrids(prev => ({
+        ...prev,
+        [parcelle_id]: applyCells(prev[parcelle_id] || Array(parcelle.rows * parcelle.cols).fill(''), cells, parcelle.cols)
+      }));
+      if (String(selectedParcelleRef.current) === String(parcelle_id)) {
+        setGrid(prev => applyCells(prev, cells, parcelle.cols));
+      }
+    });
+    on('position', ({ parcelle_id, x, y }) => {
+      setParcellePositions(prev => ({ ...prev, [parcelle_id]: { row: y, col: x } }));
+    });
+    on('parcelle', ({ action, parcelle, id }) => {
+      if (action === 'created') {
+        addParcelle(parcelle);
+      } else if (action === 'deleted') {
+        setParcelles(prev => prev.filter(p => String(p.id) !== String(id)));
+        setParcellePositions(({ [id]: removed, ...rest }) => rest);
+        setParcelleGrids(({ [id]: removed, ...rest }) => rest);
+      }
+    });
+    on('potager', ({ rows, cols }) => setPotagerSize({ rows, cols }));
+    on('culture', ({ action, culture, id }) => {
+      const upsert = list => list.some(c => c.id === culture.id)
+        ? list.map(c => c.id === culture.id ? { ...c, ...culture } : c)
+        : [...list, culture];
+      if (action === 'deleted') {
+        setCultures(prev => prev.filter(c => c.id !== id));
+        setCrops(prev => prev.filter(c => c.id !== id));
+      } else {
+        setCultures(upsert);
+        setCrops(upsert);
+      }
+    });
+    on('cultures', () => {
+      axios.get('http://localhost:8001/cultures').then(response => setCultures(response.data));
+      axios.get('http://localhost:8001/cultures/popular').then(response => setCrops(response.data));
+    });
+    on('version', () => {
+      loadVersions().catch(error => console.error('Erreur chargement versions:', error));
+    });
+    // Restauration d'une version, ou événements manqués trop anciens : tout recharger
+    on('garden', () => loadGarden());
+    on('reset', () => loadGarden());
+
+    return () => source.close();
   }, []);
 
   // Modifier la fonction de changement de taille
   const handlePotagerSizeChange = (type, value) => {
+    const previousSize = potagerSize;
     const newSize = { ...potagerSize, [type]: parseInt(value) || 1 };
     setPotagerSize(newSize);
     
-    // Sauvegarder la nouvelle taille
+    // Sauvegarder la nouvelle taille (refusée si des parcelles dépasseraient)
     axios.post('http://localhost:8001/potager/size', newSize)
-      .catch(error => console.error('Erreur sauvegarde taille potager:', error));
+      .then(({ data: { max_size, ...size } }) => {
+        setPotagerSize(size);
+        setPotagerMaxSize(max_size);
+      })
+      .catch(error => {
+        console.error('Erreur sauvegarde taille potager:', error);
+        setPotagerSize(previousSize);
+        if (error.response?.status === 409) {
+          alert(error.response.data.error);
+        }
+      });
   };
 
   const handleCellClick = async (index) => {
@@ -214,7 +314,7 @@ function GardenPlanner() {
           rows: gridSize.rows,
           cols: gridSize.cols
         });
-        setParcelles([...parcelles, response.data]);
+        addParcelle(response.data);
         setParcelleName('');
       } catch (error) {
         console.error('Erreur création parcelle:', error);
@@ -235,10 +335,11 @@ function GardenPlanner() {
         cols: response.data.cols
       });
 
-      setGrid(response.data.grid);
+      const parcelleGrid = toGrid(response.data);
+      setGrid(parcelleGrid);
       setParcelleGrids(prev => ({
         ...prev,
-        [id]: response.data.grid
+        [id]: parcelleGrid
       }));
 
     } catch (error) {
@@ -249,6 +350,7 @@ function GardenPlanner() {
 
   // Fonction pour déplacer une parcelle
   const handleParcelleDrag = async (parcelleId, newRow, newCol) => {
+    const previousPosition = parcellePositions[parcelleId];
     try {
       // Mettre à jour l'interface
       setParcellePositions(prev => ({
@@ -263,20 +365,14 @@ function GardenPlanner() {
         y: newRow
       });
   
-      // Recharger les données de la parcelle après le déplacement
-      const response = await axios.get(`http://localhost:8001/parcelles/${parcelleId}`);
-      setParcelleGrids(prev => ({
-        ...prev,
-        [parcelleId]: response.data.grid
-      }));
-  
       // Sélectionner automatiquement la parcelle après le drag & drop
       handleParcelleSelect(parcelleId);
   
     } catch (error) {
       console.error('Erreur sauvegarde position:', error);
-      setParcellePositions(prev => ({ ...prev }));
-      alert('Erreur lors de la sauvegarde de la position');
+      // Position refusée (chevauchement, hors du potager) : revenir à la précédente
+      setParcellePositions(prev => ({ ...prev, [parcelleId]: previousPosition }));
+      alert(error.response?.data?.error || 'Erreur lors de la sauvegarde de la position');
     }
   };
 
@@ -336,13 +432,14 @@ function GardenPlanner() {
     })
       .then(response => {
         alert('Version créée avec succès !');
-        setVersions([...versions, response.data]);
+        // Liste de la plus récente à la plus ancienne
+        setVersions(prev => [response.data, ...prev]);
       })
       .catch(error => console.error('Erreur création version:', error));
   };
 
   // Composant Modal pour les versions
-  const VersionsModal = ({ versions, onClose, onSelect }) => (
+  const VersionsModal = ({ versions, hasMore, onLoadMore, onClose, onSelect }) => (
     <div style={{
       position: 'fixed',
       top: 0,
@@ -436,6 +533,22 @@ function GardenPlanner() {
             </div>
           );
         })}
+
+        {/* Versions plus anciennes, page par page */}
+        {hasMore && (
+          <button onClick={onLoadMore} style={{
+            display: 'block',
+            margin: '10px auto',
+            padding: '8px 16px',
+            backgroundColor: '#2196F3',
+            color: 'white',
+            border: 'none',
+            borderRadius: '4px',
+            cursor: 'pointer'
+          }}>
+            Charger plus de versions
+          </button>
+        )}
         
         {/* Bouton fermer existant */}
         <button onClick={onClose} style={{ 
@@ -453,7 +566,17 @@ function GardenPlanner() {
     </div>
   );
 
-  const handleVersionSelect = (version) => {
+  const handleVersionSelect = async (versionSummary) => {
+    // La liste ne contient que les résumés : charger le contenu de la version
+    let version;
+    try {
+      const response = await axios.get(`http://localhost:8001/versions/${versionSummary.id}`);
+      version = response.data;
+    } catch (error) {
+      console.error('Erreur chargement version:', error);
+      return;
+    }
+
     setParcelles(version.parcelles);
     setParcellePositions(version.parcelle_positions);
     
@@ -535,8 +658,7 @@ function GardenPlanner() {
           await axios.post('http://localhost:8001/versions/import', versionData);
           alert('Version importée avec succès !');
           // Recharger la liste des versions
-          const response = await axios.get('http://localhost:8001/versions');
-          setVersions(response.data);
+          await loadVersions();
         } catch (error) {
           alert('Erreur lors de l\'import : ' + error.message);
         }
@@ -778,7 +900,7 @@ function GardenPlanner() {
               value={potagerSize.rows}
               onChange={(e) => handlePotagerSizeChange('rows', e.target.value)}
               min="1"
-              max="20"
+              max={potagerMaxSize}
               style={{ width: '60px', marginRight: '10px' }}
             />
             x
@@ -787,7 +909,7 @@ function GardenPlanner() {
               value={potagerSize.cols}
               onChange={(e) => handlePotagerSizeChange('cols', e.target.value)}
               min="1"
-              max="20"
+              max={potagerMaxSize}
               style={{ width: '60px', marginLeft: '10px' }}
             />
           </div>
@@ -974,6 +1096,8 @@ function GardenPlanner() {
       {showVersionsModal && (
         <VersionsModal
           versions={versions}
+          hasMore={Boolean(versionsCursor)}
+          onLoadMore={loadMoreVersions}
           onClose={() => setShowVersionsModal(false)}
           onSelect={handleVersionSelect}
         />
@@ -3,6 +3,13 @@ import ReactDOM from 'react-dom/client';
 import './index.css';
 import App from './App';
 import reportWebVitals from './reportWebVitals';
+import axios from 'axios';
+
+// Potager choisi par l'adresse (?garden=nom), transmis à chaque appel de l'API
+const garden = new URLSearchParams(window.location.search).get('garden');
+if (garden) {
+  axios.defaults.headers.common['X-Garden'] = garden;
+}
 
 const root = ReactDOM.createRoot(document.getElementById('root'));
 root.render(